@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# scripts/benchmark_batcher.py
+"""
+Throughput vs. latency of the LSTM serving path with and without micro-batching.
+
+Runs entirely in-process (no HTTP, no database): C client threads each issue
+single-window predictions back to back, either calling the model directly
+(one forward pass per request, as /predict does by default) or through the
+MicroBatcher. Model weights are random; only timing matters here.
+
+Usage:
+    python scripts/benchmark_batcher.py --concurrency 1 8 32 64 --requests 200
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import numpy as np
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.models.lstm import DemandLSTM
+from src.models.windows import LOOKBACK_WINDOW, N_FEATURES
+from src.serving.batcher import MicroBatcher
+
+def run_clients(predict_fn, concurrency, requests_per_client):
+    latencies = [[] for _ in range(concurrency)]
+    rng = np.random.default_rng(0)
+    windows = rng.random((concurrency, LOOKBACK_WINDOW, N_FEATURES), dtype=np.float32)
+    barrier = threading.Barrier(concurrency + 1)
+
+    def client(idx):
+        barrier.wait()
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            predict_fn(windows[idx])
+            latencies[idx].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    lat = np.concatenate([np.asarray(l) for l in latencies]) * 1000
+    return {
+        "throughput": len(lat) / elapsed,
+        "p50": np.percentile(lat, 50),
+        "p99": np.percentile(lat, 99),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per client thread")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-us", type=int, default=2000)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    model = DemandLSTM(input_size=N_FEATURES, hidden_size=50)
+    model.eval()
+
+    def forward_batch(model, windows):
+        with torch.no_grad():
+            return model(torch.from_numpy(windows)).numpy()[:, 0]
+
+    def direct(window):
+        return float(forward_batch(model, window[np.newaxis])[0])
+
+    def batched(window):
+        return batcher.predict(window, model)
+
+    batcher = MicroBatcher(forward_batch, max_batch_size=args.max_batch_size, max_wait_us=args.max_wait_us)
+    batcher.start()
+
+    print(f"{'mode':<10} {'clients':>7} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    print("-" * 49)
+    try:
+        for concurrency in args.concurrency:
+            for mode, fn in (("direct", direct), ("batched", batched)):
+                r = run_clients(fn, concurrency, args.requests)
+                print(f"{mode:<10} {concurrency:>7} {r['throughput']:>10.1f} {r['p50']:>9.3f} {r['p99']:>9.3f}")
+    finally:
+        batcher.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# scripts/benchmark_ingest.py
+"""
+Ingestion throughput into the feature store: to_sql vs COPY + upsert.
+
+For each size, the script writes N minute-resolution rows into a scratch
+table three ways and reports rows/s:
+
+1. `save_data` (DataFrame.to_sql, row-by-row INSERTs), the old populate path
+2. `ingest_features` into an empty table (COPY on Postgres)
+3. `ingest_features` again over the same dates (every row hits the upsert)
+
+Runs against DATABASE_URL. The scratch table is dropped at the end.
+
+Usage:
+    python scripts/benchmark_ingest.py --rows 10000 100000 1000000
+    python scripts/benchmark_ingest.py --rows 100000 --skip-to-sql
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.db import connect, save_data
+from src.database.ingest import ingest_features
+
+SCRATCH_TABLE = "features_ingest_bench"
+
+def make_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64("2020-01-01T00:00") + np.arange(n).astype("timedelta64[m]")
+    t = np.linspace(0, 4 * np.pi, n)
+    temperature = 25 + 10 * np.sin(t) + rng.normal(0, 2, n)
+    humidity = 60 - 10 * np.cos(t) + rng.normal(0, 5, n)
+    demand = 100 + temperature * 3 + humidity * 0.5 + rng.normal(0, 5, n)
+    return pd.DataFrame({
+        "date": dates, "temperature": temperature, "humidity": humidity,
+        "demand": demand, "is_drifted": np.zeros(n, dtype=np.int64),
+    })
+
+def drop_scratch():
+    with connect(begin=True) as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}"))
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--skip-to-sql", action="store_true", help="Skip the (slow) to_sql baseline")
+    args = parser.parse_args()
+
+    results = []
+    try:
+        for n in args.rows:
+            df = make_rows(n)
+            row = {"rows": n}
+            if not args.skip_to_sql:
+                drop_scratch()
+                row["to_sql"] = n / timed(lambda: save_data(df, SCRATCH_TABLE, if_exists="append"))
+            drop_scratch()
+            row["ingest"] = n / timed(lambda: ingest_features(df, table=SCRATCH_TABLE))
+            row["upsert"] = n / timed(lambda: ingest_features(df, table=SCRATCH_TABLE))
+            results.append(row)
+    finally:
+        drop_scratch()
+
+    print(f"\n{'rows':>10} {'to_sql rows/s':>15} {'ingest rows/s':>15} {'upsert rows/s':>15} {'speedup':>8}")
+    print("-" * 67)
+    for row in results:
+        to_sql = row.get("to_sql")
+        speedup = f"{row['ingest'] / to_sql:>7.1f}x" if to_sql else f"{'-':>8}"
+        to_sql = f"{to_sql:>15,.0f}" if to_sql else f"{'-':>15}"
+        print(f"{row['rows']:>10} {to_sql} {row['ingest']:>15,.0f} {row['upsert']:>15,.0f} {speedup}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# scripts/benchmark_prefix_state.py
+"""
+Parity check and latency comparison of prefix-state inference.
+
+/predict runs the LSTM over 29 shared history rows plus one request row.
+Prefix-state serving encodes the history once per (model version,
+watermark) and then takes one step per request. This script checks that
+the shortcut gives the same answer as the full-window eager forward. It
+then times, for several request batch sizes:
+
+    full_eager    DemandLSTM on the (B, 30, 2) windows (the current path)
+    full_numpy    NumpyLSTM on the same windows
+    cached_step   one NumpyLSTM step from the cached state (steady state)
+    encode+step   re-encoding the history first (the first request of a generation)
+
+It also reports how far a multi-step /forecast rollout drifts from
+sliding 30-row windows fed the same inputs. That gap is expected and
+informational, not a failure. Exits with status 1 if parity fails.
+
+Usage:
+    python scripts/benchmark_prefix_state.py --batch-sizes 1 8 32 128 --iterations 500
+    python scripts/benchmark_prefix_state.py --parity-only
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.models.windows import LOOKBACK_WINDOW, N_FEATURES
+from benchmark_runtimes import resolve_model_path
+
+# Max |prefix path - eager| on scaled outputs: same fp32 math, different summation order
+DEFAULT_ATOL = 1e-5
+
+def check_parity(eager, stepper, atol, horizon):
+    from src.serving.inference import forward_batch
+
+    rng = np.random.default_rng(0)
+    history = rng.random((LOOKBACK_WINDOW - 1, N_FEATURES), dtype=np.float32)
+    inputs = rng.random((256, N_FEATURES), dtype=np.float32)
+    windows = np.empty((len(inputs), LOOKBACK_WINDOW, N_FEATURES), dtype=np.float32)
+    windows[:, :-1], windows[:, -1] = history, inputs
+    expected = forward_batch(eager, windows)
+
+    state = stepper.encode(history[None])
+    checks = [
+        ("encode + advance", stepper.advance(state, inputs)),
+        ("full-window numpy", forward_batch(stepper, windows)),
+        ("rollout step 1", np.array([stepper.rollout(state, inputs[i:i + 1])[0] for i in range(16)])),
+    ]
+    ok = True
+    print(f"{'check':<20} {'max abs err':>12} {'tolerance':>10}  result")
+    print("-" * 52)
+    for name, outputs in checks:
+        err = float(np.max(np.abs(outputs - expected[:len(outputs)])))
+        passed = err <= atol
+        ok = ok and passed
+        print(f"{name:<20} {err:>12.2e} {atol:>10.0e}  {'PASS' if passed else 'FAIL'}")
+
+    # Rollout vs. sliding windows: from step 2 the rollout has seen more than 30 rows
+    future = rng.random((horizon, N_FEATURES), dtype=np.float32)
+    series = np.concatenate([history, future])
+    sliding = np.array([forward_batch(eager, series[k:k + LOOKBACK_WINDOW][None])[0] for k in range(horizon)])
+    rolled = stepper.rollout(state, future)
+    gap = np.abs(rolled - sliding)
+    print(f"\nRollout vs. sliding windows over {horizon} steps (scaled units, informational): "
+          f"step 1 {gap[0]:.2e}, mean {gap.mean():.2e}, max {gap.max():.2e}")
+    return ok
+
+def time_call(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    latencies = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", help="State dict to check (default: registry CURRENT)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=1, help="Torch intra-op threads (0 keeps the default)")
+    parser.add_argument("--atol", type=float, default=DEFAULT_ATOL)
+    parser.add_argument("--horizon", type=int, default=30, help="Steps for the rollout comparison")
+    parser.add_argument("--parity-only", action="store_true")
+    args = parser.parse_args()
+
+    import torch
+    from src.models.export import load_runtime_model
+    from src.models.lstm_numpy import NumpyLSTM
+    from src.serving.inference import forward_batch
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    workdir = tempfile.mkdtemp(prefix="prefix-state-")
+    try:
+        # 1. Same weights, eager and stepped
+        model_path = resolve_model_path(args.model_path, workdir)
+        eager = load_runtime_model(model_path, "eager")
+        stepper = NumpyLSTM.from_state_dict(eager.state_dict())
+
+        # 2. Parity against the full-window eager forward
+        print("\nParity vs. eager full-window forward (256 random scaled requests)")
+        ok = check_parity(eager, stepper, args.atol, args.horizon)
+        if args.parity_only:
+            sys.exit(0 if ok else 1)
+
+        # 3. Latency per call at each request batch size
+        rng = np.random.default_rng(0)
+        history = rng.random((1, LOOKBACK_WINDOW - 1, N_FEATURES), dtype=np.float32)
+        state = stepper.encode(history)
+        print(f"\nLatency ({args.iterations} iterations, {args.threads or 'default'} torch thread(s))")
+        print(f"{'path':<13} {'batch':>6} {'p50 ms':>9} {'p99 ms':>9} {'requests/s':>11} {'speedup':>8}")
+        print("-" * 61)
+        for batch_size in args.batch_sizes:
+            inputs = rng.random((batch_size, N_FEATURES), dtype=np.float32)
+            windows = np.empty((batch_size, LOOKBACK_WINDOW, N_FEATURES), dtype=np.float32)
+            windows[:, :-1], windows[:, -1] = history[0], inputs
+            paths = {
+                "full_eager": lambda: forward_batch(eager, windows),
+                "full_numpy": lambda: forward_batch(stepper, windows),
+                "cached_step": lambda: stepper.advance(state, inputs),
+                "encode+step": lambda: stepper.advance(stepper.encode(history), inputs),
+            }
+            baseline = None
+            for name, fn in paths.items():
+                latencies = time_call(fn, args.iterations, args.warmup)
+                p50 = np.percentile(latencies, 50)
+                baseline = baseline or p50
+                print(f"{name:<13} {batch_size:>6} {p50 * 1000:>9.3f} {np.percentile(latencies, 99) * 1000:>9.3f} "
+                      f"{batch_size * args.iterations / latencies.sum():>11.0f} {baseline / p50:>7.1f}x")
+        sys.exit(0 if ok else 1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# scripts/benchmark_runtimes.py
+"""
+Parity check and latency / throughput / memory comparison of the inference runtimes.
+
+The state dict (the registry's CURRENT model, else src/models/production_model.pt,
+else random weights) is exported to every runtime in a temporary directory.
+Each runtime's outputs are then compared against eager PyTorch on the same
+windows. The script exits with status 1 if any runtime is outside its
+tolerance. Each runtime is timed in its own subprocess, so peak RSS
+reflects that runtime alone.
+
+Usage:
+    python scripts/benchmark_runtimes.py --batch-sizes 1 8 32 128 --iterations 200
+    python scripts/benchmark_runtimes.py --parity-only
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.models.windows import LOOKBACK_WINDOW, N_FEATURES
+
+# Max |runtime - eager| on scaled outputs; int8 weights cost some precision
+DEFAULT_FP32_ATOL = 1e-4
+DEFAULT_INT8_ATOL = 2e-2
+
+def resolve_model_path(model_path, workdir):
+    import torch
+    from src.models import registry
+    from src.models.lstm import DemandLSTM
+    from src.serving.inference import MODEL_PATH
+
+    if model_path is None:
+        version = registry.current_version()
+        if version is not None:
+            model_path = registry.artifact_path(version, registry.MODEL_ARTIFACT)
+        elif os.path.exists(MODEL_PATH):
+            model_path = MODEL_PATH
+
+    target = os.path.join(workdir, "model.pt")
+    if model_path is None:
+        print("⚠ No trained model found, benchmarking random weights")
+        torch.manual_seed(0)
+        torch.save(DemandLSTM(input_size=N_FEATURES, hidden_size=50).state_dict(), target)
+    else:
+        print(f"Using state dict {model_path}")
+        shutil.copyfile(model_path, target)
+    return target
+
+def check_parity(model_path, runtimes, fp32_atol, int8_atol):
+    from src.models.export import load_runtime_model
+    from src.serving.inference import forward_batch
+
+    rng = np.random.default_rng(0)
+    windows = rng.random((256, LOOKBACK_WINDOW, N_FEATURES), dtype=np.float32)
+    expected = forward_batch(load_runtime_model(model_path, "eager"), windows)
+
+    ok = True
+    print(f"{'runtime':<18} {'max abs err':>12} {'tolerance':>10}  result")
+    print("-" * 50)
+    for runtime in runtimes:
+        atol = int8_atol if runtime.endswith("int8") else fp32_atol
+        outputs = forward_batch(load_runtime_model(model_path, runtime), windows)
+        err = float(np.max(np.abs(outputs - expected)))
+        passed = err <= atol
+        ok = ok and passed
+        print(f"{runtime:<18} {err:>12.2e} {atol:>10.0e}  {'PASS' if passed else 'FAIL'}")
+    return ok
+
+def peak_rss_mb():
+    """High-water RSS of this process. ru_maxrss can carry the parent's peak across fork+exec, so prefer VmHWM."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+def run_worker(args):
+    """Child process: load one runtime, time it, print one JSON line."""
+    import torch
+    from src.models.export import load_runtime_model
+    from src.serving.inference import forward_batch
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)  # onnxruntime gets ONNX_INTRA_OP_THREADS from `benchmark`
+
+    started = time.perf_counter()
+    model = load_runtime_model(args.model_path, args.worker)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    rng = np.random.default_rng(0)
+    results = {"runtime": args.worker, "load_ms": load_ms, "batches": []}
+    for batch_size in args.batch_sizes:
+        windows = rng.random((batch_size, LOOKBACK_WINDOW, N_FEATURES), dtype=np.float32)
+        for _ in range(args.warmup):
+            forward_batch(model, windows)
+        latencies = np.empty(args.iterations)
+        for i in range(args.iterations):
+            start = time.perf_counter()
+            forward_batch(model, windows)
+            latencies[i] = time.perf_counter() - start
+        results["batches"].append({
+            "batch_size": batch_size,
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p99_ms": float(np.percentile(latencies, 99) * 1000),
+            "windows_per_s": float(batch_size * args.iterations / latencies.sum()),
+        })
+    results["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(results))
+
+def benchmark(runtime, model_path, args):
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker", runtime, "--model-path", model_path,
+        "--iterations", str(args.iterations), "--warmup", str(args.warmup), "--threads", str(args.threads),
+        "--batch-sizes", *map(str, args.batch_sizes),
+    ]
+    env = dict(os.environ)
+    if args.threads > 0:
+        env["ONNX_INTRA_OP_THREADS"] = str(args.threads)
+    output = subprocess.run(command, check=True, capture_output=True, text=True, env=env).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    from src.models.export import RUNTIMES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", help="State dict to export (default: registry CURRENT)")
+    parser.add_argument("--runtimes", nargs="+", default=list(RUNTIMES), choices=RUNTIMES)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=1, help="Intra-op threads per runtime (0 keeps defaults)")
+    parser.add_argument("--fp32-atol", type=float, default=DEFAULT_FP32_ATOL)
+    parser.add_argument("--int8-atol", type=float, default=DEFAULT_INT8_ATOL)
+    parser.add_argument("--parity-only", action="store_true")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    from src.models.export import export_model, load_runtime_model
+
+    workdir = tempfile.mkdtemp(prefix="runtimes-")
+    try:
+        # 1. Export every runtime from the same state dict
+        model_path = resolve_model_path(args.model_path, workdir)
+        exported = export_model(load_runtime_model(model_path, "eager"), model_path,
+                                [r for r in args.runtimes if r != "eager"])
+        runtimes = [r for r in args.runtimes if r == "eager" or r in exported]
+
+        # 2. Parity against eager
+        print("\nParity vs. eager (256 random scaled windows)")
+        ok = check_parity(model_path, [r for r in runtimes if r != "eager"], args.fp32_atol, args.int8_atol)
+        if args.parity_only:
+            sys.exit(0 if ok else 1)
+
+        # 3. Latency / throughput / RSS, one subprocess per runtime
+        print(f"\nLatency ({args.iterations} iterations, {args.threads or 'default'} thread(s))")
+        print(f"{'runtime':<18} {'batch':>6} {'p50 ms':>9} {'p99 ms':>9} {'windows/s':>11} {'load ms':>8} {'RSS MB':>8}")
+        print("-" * 75)
+        for runtime in runtimes:
+            r = benchmark(runtime, model_path, args)
+            for b in r["batches"]:
+                print(f"{runtime:<18} {b['batch_size']:>6} {b['p50_ms']:>9.3f} {b['p99_ms']:>9.3f} "
+                      f"{b['windows_per_s']:>11.0f} {r['load_ms']:>8.1f} {r['peak_rss_mb']:>8.1f}")
+        sys.exit(0 if ok else 1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# scripts/benchmark_startup.py
+"""
+Cold-start cost of the entry points.
+
+1. Import time: each entry module is imported in a fresh interpreter. The
+   script reports the median wall time and which heavy dependencies the
+   import pulled in.
+2. Time to first prediction: the API is started under uvicorn once per
+   MODEL_RUNTIME. The script reports the time from process spawn to the
+   first 200 from POST /predict. This needs a trained model and a
+   reachable DATABASE_URL, exactly like a real deployment.
+
+Usage:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --runtimes eager onnx --skip-imports
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ENTRY_MODULES = [
+    "src.serving.api",
+    "src.serving.async_api",
+    "src.drift.monitor",
+    "src.training.train",
+    "src.orchestration.flow",
+]
+HEAVY_MODULES = ["torch", "pandas", "sklearn", "scipy", "evidently", "onnxruntime", "pyarrow", "sqlalchemy", "prefect"]
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def time_import(module, repeats):
+    code = IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+    samples, loaded = [], []
+    for _ in range(repeats):
+        proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+        if proc.returncode != 0:
+            return None, proc.stderr.strip().splitlines()[-1]
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        loaded = result["loaded"]
+    return statistics.median(samples), loaded
+
+def time_to_first_prediction(app, runtime, port, timeout):
+    env = dict(os.environ, MODEL_RUNTIME=runtime, PYTHONWARNINGS="ignore")
+    url = f"http://127.0.0.1:{port}/predict"
+    payload = json.dumps({"temperature": 25.0, "humidity": 60.0}).encode()
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                return None, f"server exited with code {proc.returncode}"
+            request = urllib.request.Request(url, data=payload, headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request, timeout=2) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start, json.loads(response.read())["model_version"]
+            except OSError:
+                pass  # Not listening yet, or still loading (503)
+            time.sleep(0.02)
+        return None, f"no successful /predict within {timeout}s"
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=ENTRY_MODULES)
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh interpreters per module (median reported)")
+    parser.add_argument("--app", default="src.serving.api:app")
+    parser.add_argument("--runtimes", nargs="+", default=["eager", "onnx"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--skip-imports", action="store_true")
+    parser.add_argument("--skip-server", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_imports:
+        print(f"{'module':<26} {'import ms':>10}  heavy dependencies loaded")
+        print("-" * 75)
+        for module in args.modules:
+            seconds, detail = time_import(module, args.repeats)
+            if seconds is None:
+                print(f"{module:<26} {'error':>10}  {detail}")
+            else:
+                print(f"{module:<26} {seconds * 1000:>10.0f}  {', '.join(detail) or '-'}")
+
+    if not args.skip_server:
+        print(f"\nTime to first successful /predict ({args.app})")
+        print(f"{'runtime':<18} {'seconds':>8}  model version")
+        print("-" * 45)
+        for runtime in args.runtimes:
+            seconds, detail = time_to_first_prediction(args.app, runtime, args.port, args.timeout)
+            if seconds is None:
+                print(f"{runtime:<18} {'error':>8}  {detail}")
+            else:
+                print(f"{runtime:<18} {seconds:>8.2f}  {detail}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# scripts/generate_synthetic.py
+"""
+Synthetic feature data at benchmark scale, generated in fixed-memory chunks.
+
+`populate_db.py` builds two years of daily rows in one DataFrame. This
+script streams any volume instead: sub-daily frequencies, many entities,
+hundreds of millions of rows. The series follows the same model as
+populate_db. Temperature has a yearly sine season (plus a daily cycle
+below daily frequency), humidity runs roughly inverse to it, and demand is
+100 + 3 * temperature + 0.5 * humidity plus noise. Each entity gets its
+own offsets and demand scale.
+
+Work is split into chunks of at most --chunk-rows rows (a block of
+timestamps for a group of entities). Chunks are generated in --workers
+processes, and at most two per worker are in flight, so memory stays flat
+whatever the total. Every chunk draws from its own generator, seeded from
+(--seed, first entity, first timestamp). The same seed and chunk size
+therefore give identical data for any worker count.
+
+--drift START:END[:KIND[:AMOUNT]] schedules a drift segment (repeatable).
+Rows in [START, END) are shifted and flagged ``is_drifted = 1``:
+
+    temperature   temperature + AMOUNT degrees (default 8)
+    humidity      humidity + AMOUNT points (default 15)
+    concept       demand gains AMOUNT per degree on top of 3 (default 2), inputs unchanged
+
+Bounds with a time of day use '/' instead: 2023-06-01T06:00/2023-06-02T18:00/concept.
+--drift-entity-share limits drift to a seeded subset of entities.
+
+Outputs:
+    db        DATABASE_URL through `ingest_features` (COPY + upsert on Postgres)
+    sqlite    a local SQLite file (--path), same schema and code path
+    parquet   one file per chunk under --path (needs pyarrow), written by the workers
+
+With --entities 0 rows go to `features`; otherwise to `entity_features`
+with ids ``entity-00000``, ``entity-00001``, ...
+
+Usage:
+    python scripts/generate_synthetic.py --start 2020-01-01 --end 2024-01-01 --freq 15min --output sqlite --path /tmp/fs.db
+    python scripts/generate_synthetic.py --entities 1000 --periods 100000 --freq 1h --workers 8 --output parquet --path data/synthetic
+    python scripts/generate_synthetic.py --drift 2023-06-01:2023-08-01:temperature:10 --replace
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# CONFIG
+DRIFT_KINDS = {"temperature": 8.0, "humidity": 15.0, "concept": 2.0}  # Default AMOUNT per kind
+OUTPUTS = ("db", "sqlite", "parquet")
+DEFAULT_CHUNK_ROWS = 1_000_000
+DAY_US = 86_400_000_000
+
+_CONFIG = None  # Set once per process by _init_worker: the entity parameters can be large
+
+def parse_drift(spec):
+    """'START:END[:KIND[:AMOUNT]]' -> (start, end, kind, amount) with datetime64[us] bounds."""
+    parts = spec.split("/" if "/" in spec else ":")  # '/' lets the bounds carry times, which contain ':'
+    if len(parts) < 2 or len(parts) > 4:
+        raise argparse.ArgumentTypeError(f"Expected START:END[:KIND[:AMOUNT]], got '{spec}'")
+    kind = parts[2] if len(parts) > 2 else "temperature"
+    if kind not in DRIFT_KINDS:
+        raise argparse.ArgumentTypeError(f"Unknown drift kind '{kind}'. Use one of {tuple(DRIFT_KINDS)}")
+    amount = float(parts[3]) if len(parts) > 3 else DRIFT_KINDS[kind]
+    start, end = np.datetime64(parts[0], "us"), np.datetime64(parts[1], "us")
+    if end <= start:
+        raise argparse.ArgumentTypeError(f"Drift segment '{spec}' ends before it starts")
+    return start, end, kind, amount
+
+def _entity_params(seed, entities):
+    """Per-entity (temperature offset, humidity offset, demand scale, drift rank), fixed by `seed`."""
+    if not entities:
+        # The single series keeps populate_db's levels exactly
+        return {"temp_offset": np.zeros(1), "humidity_offset": np.zeros(1), "demand_scale": np.ones(1),
+                "drift_rank": np.zeros(1)}
+    rng = np.random.default_rng([seed, 0xE1])
+    return {
+        "temp_offset": rng.normal(0, 3, entities),
+        "humidity_offset": rng.normal(0, 5, entities),
+        "demand_scale": rng.uniform(0.5, 2.0, entities),
+        "drift_rank": rng.random(entities),
+    }
+
+def make_tasks(total_steps, entities, chunk_rows):
+    """(entity_start, entity_stop, step_start, step_stop) blocks of at most `chunk_rows` rows."""
+    count = max(entities, 1)
+    if total_steps >= chunk_rows:
+        return [(e, e + 1, s, min(s + chunk_rows, total_steps))
+                for e in range(count) for s in range(0, total_steps, chunk_rows)]
+    per_chunk = max(1, chunk_rows // total_steps)
+    return [(e, min(e + per_chunk, count), 0, total_steps) for e in range(0, count, per_chunk)]
+
+def _init_worker(config):
+    global _CONFIG
+    _CONFIG = config
+
+def generate_chunk(task):
+    """One chunk as a {column: array} mapping, rows ordered by entity, then date."""
+    config = _CONFIG
+    entity_start, entity_stop, step_start, step_stop = task
+    seed, entities, start, step_us = config["seed"], config["entities"], config["start"], config["step_us"]
+    params = config["params"]
+    rng = np.random.default_rng([seed, entity_start, step_start])
+    n_entities, n_steps = entity_stop - entity_start, step_stop - step_start
+    shape = (n_entities, n_steps)
+
+    # 1. Timestamps and the seasonal phase (in days since the start)
+    offsets = np.arange(step_start, step_stop, dtype=np.int64) * step_us
+    dates = start + offsets.astype("timedelta64[us]")
+    days = offsets / DAY_US
+    year = 2 * np.pi * days / 365.25
+    daily = 3 * np.sin(2 * np.pi * (days % 1 - 0.25)) if step_us < DAY_US else 0.0
+
+    # 2. Weather per entity (populate_db's model plus per-entity offsets)
+    ids = slice(entity_start, entity_stop)
+    temperature = (25 + 10 * np.sin(year) + daily)[None, :] + params["temp_offset"][ids, None] \
+        + rng.normal(0, 2, shape)
+    humidity = (60 - 10 * np.cos(year))[None, :] + params["humidity_offset"][ids, None] + rng.normal(0, 5, shape)
+    temp_gain = np.full(shape, 3.0)
+
+    # 3. Scheduled drift segments on the selected entities
+    drifted = np.zeros(shape, dtype=np.int64)
+    members = params["drift_rank"][ids] < config["drift_entity_share"]
+    for seg_start, seg_end, kind, amount in config["drift"]:
+        in_segment = (dates >= seg_start) & (dates < seg_end)
+        mask = members[:, None] & in_segment[None, :]
+        if not mask.any():
+            continue
+        if kind == "temperature":
+            temperature[mask] += amount
+        elif kind == "humidity":
+            humidity[mask] += amount
+        else:
+            temp_gain[mask] += amount
+        drifted[mask] = 1
+
+    # 4. Target
+    demand = (100 + temp_gain * temperature + 0.5 * humidity + rng.normal(0, 5, shape)) \
+        * params["demand_scale"][ids, None]
+
+    chunk = {
+        "date": np.tile(dates, n_entities),
+        "temperature": temperature.ravel(),
+        "humidity": humidity.ravel(),
+        "demand": demand.ravel(),
+        "is_drifted": drifted.ravel(),
+    }
+    if entities:
+        names = np.array([f"entity-{e:05d}" for e in range(entity_start, entity_stop)])
+        chunk["entity_id"] = np.repeat(names, n_steps)
+    return chunk
+
+def write_parquet_chunk(task):
+    """Generates one chunk and writes it to its own Parquet file. Returns (rows, drifted rows)."""
+    import pyarrow as pa  # Optional: only needed for --output parquet
+    import pyarrow.parquet as pq
+
+    chunk = generate_chunk(task)
+    columns = (["entity_id"] if "entity_id" in chunk else []) + ["date", "temperature", "humidity", "demand",
+                                                                 "is_drifted"]
+    path = os.path.join(_CONFIG["path"], f"part-{task[0]:06d}-{task[2]:012d}.parquet")
+    pq.write_table(pa.table({name: chunk[name] for name in columns}), path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return len(chunk["date"]), int(chunk["is_drifted"].sum())
+
+def run_tasks(fn, tasks, config, workers):
+    """Yields fn(task) in task order, with at most 2 * workers chunks in flight."""
+    if workers <= 1:
+        _init_worker(config)
+        for task in tasks:
+            yield fn(task)
+        return
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(config,)) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(fn, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", default="2022-01-01", help="First timestamp")
+    parser.add_argument("--end", default="2024-01-01", help="Last timestamp (inclusive), unless --periods is set")
+    parser.add_argument("--periods", type=int, help="Timestamps per entity (overrides --end)")
+    parser.add_argument("--freq", default="1D", help="Spacing of timestamps, e.g. 1D, 1h, 15min, 30s")
+    parser.add_argument("--entities", type=int, default=0, help="Number of series (0 = the single-series table)")
+    parser.add_argument("--drift", type=parse_drift, action="append", default=[],
+                        help="START:END[:KIND[:AMOUNT]] drift segment (use '/' as separator with ISO times)")
+    parser.add_argument("--drift-entity-share", type=float, default=1.0, help="Share of entities that drift")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per generated chunk")
+    parser.add_argument("--workers", type=int, default=1, help="Generator processes (0 = one per CPU)")
+    parser.add_argument("--output", choices=OUTPUTS, default="db")
+    parser.add_argument("--path", help="SQLite file or Parquet directory")
+    parser.add_argument("--replace", action="store_true", help="Empty the target table first (db/sqlite)")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    # 1. Time grid
+    step_us = int(pd.Timedelta(args.freq).value // 1000)
+    if step_us <= 0:
+        parser.error("--freq must be positive")
+    start = np.datetime64(args.start, "us")
+    if args.periods is not None:
+        total_steps = args.periods
+    else:
+        total_steps = int((np.datetime64(args.end, "us") - start).astype(np.int64) // step_us) + 1
+    if total_steps <= 0:
+        parser.error("Empty time range")
+    if args.output != "db" and not args.path:
+        parser.error(f"--output {args.output} needs --path")
+
+    workers = args.workers or os.cpu_count()
+    config = {
+        "seed": args.seed,
+        "entities": args.entities,
+        "start": start,
+        "step_us": step_us,
+        "params": _entity_params(args.seed, args.entities),
+        "drift": args.drift,
+        "drift_entity_share": args.drift_entity_share,
+        "path": args.path,
+    }
+    tasks = make_tasks(total_steps, args.entities, args.chunk_rows)
+    total_rows = total_steps * max(args.entities, 1)
+    print(f"Generating {total_rows:,} rows ({max(args.entities, 1)} series x {total_steps:,} steps of {args.freq}) "
+          f"in {len(tasks)} chunks on {workers} worker(s)...")
+
+    # 2. Generate and write
+    start_time = time.perf_counter()
+    drifted = 0
+    try:
+        if args.output == "parquet":
+            os.makedirs(args.path, exist_ok=True)
+            written = 0
+            for rows, n_drifted in run_tasks(write_parquet_chunk, tasks, config, workers):
+                written += rows
+                drifted += n_drifted
+        else:
+            if args.output == "sqlite":
+                # Must be set before src.database is imported: the engine URL is read at import
+                os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.path)}"
+            from src.database.ingest import ingest_entity_features, ingest_features
+
+            def chunks():
+                nonlocal drifted
+                for chunk in run_tasks(generate_chunk, tasks, config, workers):
+                    drifted += int(chunk["is_drifted"].sum())
+                    yield chunk
+
+            ingest = ingest_entity_features if args.entities else ingest_features
+            written = ingest(chunks(), replace=args.replace)
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        sys.exit(1)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"✓ Wrote {written:,} rows ({drifted:,} drifted) to {args.output} in {elapsed:.2f}s "
+          f"({written / max(elapsed, 1e-9):,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
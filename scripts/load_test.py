@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# scripts/load_test.py
+"""
+Asyncio load generator for the serving API.
+
+Modes:
+    closed   C concurrent clients, each sending its next request as soon as
+             the previous one returns. Throughput is whatever the API sustains.
+    open     Requests arrive at a target rate (constant or Poisson) whether
+             or not earlier ones have finished. Latency is measured from the
+             scheduled send time, so server queueing is not hidden
+             (no coordinated omission).
+    replay   Sends the requests recorded in a JSONL file. Each line is
+             {"t": seconds, "method": "POST", "path": "/predict", "json": {...}}
+             or just the /predict body. With "t" offsets the recording is
+             replayed open-loop at `--speed`; without them it is sent
+             closed-loop.
+
+Passing several --rps or --concurrency values runs one stage per value
+(a step ramp), which shows where the API saturates. Each stage reports
+throughput, p50/p95/p99/p999 latency and error classes. --output writes
+everything as JSON, tagged with the git commit; --compare diffs against
+an earlier result file.
+
+--local runs fully offline. It starts the API under uvicorn against a
+fresh SQLite stand-in populated by scripts/populate_db.py, using the
+repository's model files, and shuts it down afterwards.
+
+Usage:
+    python scripts/load_test.py --local --mode closed --concurrency 1 8 32 64 --duration 20
+    python scripts/load_test.py --mode open --rps 50 100 200 400 --duration 30 --output after.json --compare before.json
+    python scripts/load_test.py --mode replay --replay recorded_requests.jsonl --speed 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter
+from datetime import datetime, timezone
+import numpy as np
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Same input ranges as scripts/generate_traffic.py
+TEMP_MIN, TEMP_MAX = 20, 45
+HUMIDITY_MIN, HUMIDITY_MAX = 30, 90
+PERCENTILES = (50, 95, 99, 99.9)
+
+class StageResult:
+    """Latencies and error classes of one load stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = Counter()
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def summary(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        lat = np.asarray(self.latencies) * 1000
+        total = len(lat) + sum(self.errors.values())
+        latency = {"mean": float(lat.mean()) if len(lat) else None, "max": float(lat.max()) if len(lat) else None}
+        for p in PERCENTILES:
+            latency[f"p{str(p).replace('.', '')}"] = float(np.percentile(lat, p)) if len(lat) else None
+        return {
+            "stage": self.name,
+            "duration_s": elapsed,
+            "requests": total,
+            "ok": len(lat),
+            "throughput_rps": len(lat) / elapsed if elapsed > 0 else 0.0,
+            "error_rate": (total - len(lat)) / total if total else 0.0,
+            "latency_ms": latency,
+            "errors": dict(self.errors),
+        }
+
+def classify_error(exc):
+    if isinstance(exc, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(exc, httpx.ConnectError):
+        return "connect_error"
+    if isinstance(exc, (httpx.RemoteProtocolError, httpx.ReadError, httpx.WriteError)):
+        return "protocol_error"
+    return type(exc).__name__
+
+async def send(client, request, result, scheduled=None):
+    method, path, body = request
+    start = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        response = await client.request(method, path, json=body)
+    except Exception as e:
+        result.errors[classify_error(e)] += 1
+        return
+    if response.status_code == 200:
+        result.latencies.append(time.perf_counter() - start)
+    else:
+        result.errors[f"http_{response.status_code}"] += 1
+
+def random_requests(endpoint, batch_size, seed):
+    rng = np.random.default_rng(seed)
+
+    def scenario():
+        return {"temperature": float(rng.uniform(TEMP_MIN, TEMP_MAX)),
+                "humidity": float(rng.uniform(HUMIDITY_MIN, HUMIDITY_MAX))}
+
+    while True:
+        if endpoint == "/predict_batch":
+            yield "POST", endpoint, {"scenarios": [scenario() for _ in range(batch_size)]}
+        else:
+            yield "POST", endpoint, scenario()
+
+def load_replay(path):
+    """Returns [(offset_s or None, (method, path, body)), ...] from a JSONL recording."""
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if "json" in item or "path" in item:
+                request = (item.get("method", "POST"), item.get("path", "/predict"), item.get("json"))
+            else:
+                request = ("POST", "/predict", item)
+            records.append((item.get("t"), request))
+    return records
+
+async def closed_loop(client, requests, concurrency, duration, max_requests, result):
+    deadline = time.perf_counter() + duration
+    sent = 0
+
+    async def worker():
+        nonlocal sent
+        while time.perf_counter() < deadline and (max_requests is None or sent < max_requests):
+            sent += 1
+            try:
+                request = next(requests)
+            except StopIteration:
+                return
+            await send(client, request, result)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+async def open_loop(client, requests, arrivals, max_in_flight, result):
+    """`arrivals` yields send offsets in seconds from the stage start."""
+    start = time.perf_counter()
+    tasks = set()
+    for offset, request in zip(arrivals, requests):
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(tasks) >= max_in_flight:
+            # Server is this far behind the schedule; count the arrival as shed instead of queueing it
+            result.errors["in_flight_cap"] += 1
+            continue
+        task = asyncio.create_task(send(client, request, result, scheduled=start + offset))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+def rate_arrivals(rps, duration, poisson, seed):
+    rng = np.random.default_rng(seed)
+    t = 0.0
+    while True:
+        t += rng.exponential(1 / rps) if poisson else 1 / rps
+        if t >= duration:
+            return
+        yield t
+
+def print_stage(summary):
+    lat = summary["latency_ms"]
+    fmt = lambda v: f"{v:9.2f}" if v is not None else f"{'-':>9}"
+    errors = ", ".join(f"{k}={v}" for k, v in sorted(summary["errors"].items())) or "-"
+    print(f"{summary['stage']:<16} {summary['throughput_rps']:>9.1f} {fmt(lat['p50'])} {fmt(lat['p95'])} "
+          f"{fmt(lat['p99'])} {fmt(lat['p999'])} {summary['ok']:>8}  {errors}")
+
+async def run(args, base_url):
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    timeout = httpx.Timeout(args.timeout)
+    stages = []
+    print(f"{'stage':<16} {'ok req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'p999 ms':>9} {'ok':>8}  errors")
+    print("-" * 95)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        if args.warmup > 0:
+            await closed_loop(client, random_requests(args.endpoint, args.batch_size, args.seed), 4,
+                              args.warmup, None, StageResult("warmup"))
+
+        if args.mode == "closed":
+            for concurrency in args.concurrency:
+                result = StageResult(f"c={concurrency}")
+                requests = random_requests(args.endpoint, args.batch_size, args.seed)
+                await closed_loop(client, requests, concurrency, args.duration, args.requests, result)
+                result.finished = time.perf_counter()
+                stages.append(result.summary())
+                print_stage(stages[-1])
+
+        elif args.mode == "open":
+            for rps in args.rps:
+                result = StageResult(f"rps={rps:g}")
+                requests = random_requests(args.endpoint, args.batch_size, args.seed)
+                arrivals = rate_arrivals(rps, args.duration, args.poisson, args.seed)
+                await open_loop(client, requests, arrivals, args.max_in_flight, result)
+                result.finished = time.perf_counter()
+                stages.append(result.summary())
+                print_stage(stages[-1])
+
+        else:
+            records = load_replay(args.replay)
+            result = StageResult("replay")
+            if records and all(t is not None for t, _ in records):
+                first = records[0][0]
+                arrivals = ((t - first) / args.speed for t, _ in records)
+                await open_loop(client, (r for _, r in records), arrivals, args.max_in_flight, result)
+            else:
+                await closed_loop(client, iter([r for _, r in records]), args.concurrency[0],
+                                  float("inf"), None, result)
+            result.finished = time.perf_counter()
+            stages.append(result.summary())
+            print_stage(stages[-1])
+    return stages
+
+# ---- Offline stand-in --------------------------------------------------------
+
+def wait_until_ready(base_url, timeout, proc):
+    payload = json.dumps({"temperature": 25.0, "humidity": 60.0}).encode()
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API exited with code {proc.returncode}")
+        request = urllib.request.Request(f"{base_url}/predict", data=payload,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"API not ready after {timeout}s")
+
+def start_local_api(args, workdir):
+    """Populates a SQLite stand-in and starts the API on it. Returns the uvicorn process."""
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'features.db')}",
+        MODEL_REGISTRY_DIR=os.path.join(workdir, "registry"),  # Empty: serve src/models/ as-is
+        DRIFT_RETRAIN_COMMAND="",                               # Never launch retraining from a load test
+        DRIFT_REFERENCE_PROFILE_PATH=os.path.join(workdir, "drift_reference.npz"),  # Never the repo's profile
+        PYTHONWARNINGS="ignore",
+    )
+    print("Populating SQLite stand-in database...")
+    subprocess.run([sys.executable, os.path.join(ROOT, "scripts", "populate_db.py")],
+                   cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    # The API only reads the reference profile; build the stand-in's one in the workdir
+    subprocess.run([sys.executable, "-c", "from src.drift.monitor import load_reference_profile; "
+                    "load_reference_profile(rebuild=True)"],
+                   cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    log = open(os.path.join(workdir, "api.log"), "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", args.app, "--port", str(args.port), "--log-level", "warning",
+         "--workers", str(args.api_workers)],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    try:
+        wait_until_ready(f"http://127.0.0.1:{args.port}", 120, proc)
+    except Exception:
+        proc.terminate()
+        log.close()
+        with open(log.name) as f:
+            print(f.read()[-2000:])
+        raise
+    print(f"✓ Local API ready on port {args.port} ({args.app}, {args.api_workers} worker(s))")
+    return proc
+
+# ---- Results -----------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def compare(stages, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {s["stage"]: s for s in json.load(f)["stages"]}
+    print(f"\nvs. {baseline_path}")
+    print(f"{'stage':<16} {'req/s':>10} {'p50':>10} {'p99':>10} {'p999':>10}")
+    for stage in stages:
+        base = baseline.get(stage["stage"])
+        if base is None:
+            continue
+
+        def delta(new, old):
+            if new is None or old in (None, 0):
+                return f"{'-':>10}"
+            return f"{100 * (new - old) / old:>+9.1f}%"
+
+        print(f"{stage['stage']:<16} {delta(stage['throughput_rps'], base['throughput_rps'])} "
+              + " ".join(delta(stage["latency_ms"][k], base["latency_ms"][k]) for k in ("p50", "p99", "p999")))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--mode", choices=("closed", "open", "replay"), default="closed")
+    parser.add_argument("--endpoint", choices=("/predict", "/predict_batch"), default="/predict")
+    parser.add_argument("--batch-size", type=int, default=32, help="Scenarios per /predict_batch request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32],
+                        help="Closed-loop clients per stage (replay without timestamps uses the first)")
+    parser.add_argument("--rps", type=float, nargs="+", default=[50, 100, 200], help="Open-loop rate per stage")
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times instead of constant")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per stage")
+    parser.add_argument("--requests", type=int, help="Stop a closed-loop stage after this many requests")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds of unrecorded warm-up traffic")
+    parser.add_argument("--replay", help="JSONL recording for --mode replay")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed-up factor")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Open-loop cap on outstanding requests")
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--compare", help="Earlier --output file to diff against")
+    parser.add_argument("--local", action="store_true", help="Start the API against a SQLite stand-in")
+    parser.add_argument("--app", default="src.serving.api:app", help="ASGI app for --local")
+    parser.add_argument("--api-workers", type=int, default=1, help="uvicorn workers for --local")
+    parser.add_argument("--port", type=int, default=8766, help="Port for --local")
+    args = parser.parse_args()
+    if args.mode == "replay" and not args.replay:
+        parser.error("--mode replay needs --replay FILE")
+
+    workdir, proc = None, None
+    base_url = args.url
+    try:
+        if args.local:
+            workdir = tempfile.mkdtemp(prefix="loadtest-")
+            proc = start_local_api(args, workdir)
+            base_url = f"http://127.0.0.1:{args.port}"
+        print(f"Target: {base_url}{args.endpoint}  mode={args.mode}\n")
+        stages = asyncio.run(run(args, base_url))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        results = {
+            "git_commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "target": base_url + args.endpoint,
+            "local": args.local,
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "stages": stages,
+        }
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.output}")
+    if args.compare:
+        compare(stages, args.compare)
+
+if __name__ == "__main__":
+    main()
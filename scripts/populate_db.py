@@ -7,7 +7,7 @@ import os
 # Add the project root to Python path so we can import src
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from src.database.db import save_data
+from src.database.ingest import ingest_features
 
 def generate_weather_data(start_date="2022-01-01", end_date="2024-01-01"):
     """
@@ -52,7 +52,8 @@ if __name__ == "__main__":
     # Save to Postgres
     print("Pushing data to Postgres...")
     try:
-        save_data(data, "features", if_exists='replace')
+        # Truncate + COPY/upsert: keeps the table's date index, unlike to_sql(if_exists='replace')
+        ingest_features(data, replace=True)
         print(f"✓ Database successfully populated with {len(data)} historical records!")
     except Exception as e:
         print(f"✗ Error: {e}")
@@ -0,0 +1,264 @@
+# src/database/drift_history.py
+"""
+Time series of drift-monitor results.
+
+Every `detect_drift` run appends one row per drift column to the
+`drift_history` table. The row holds the column's KS statistic, p-value,
+PSI and Wasserstein distance, and whether it drifted. It also holds the
+run-level verdict, the share of drifted columns and the time bounds of
+the current window. The table is indexed on `checked_at`, so dashboards
+and `load_drift_history` read a time range without scanning the table.
+
+Storage is kept bounded by `prune_drift_history`. Rows older than
+DRIFT_HISTORY_RETENTION_DAYS are deleted. Rows older than
+DRIFT_HISTORY_DOWNSAMPLE_AFTER_DAYS are merged into one row per
+DRIFT_HISTORY_DOWNSAMPLE_S bucket, source and column. A merged row keeps
+the worst scores of its bucket (largest statistics, smallest p-value, any
+drift), so old drift episodes stay visible. `runs` counts the runs
+folded into it.
+
+Usage:
+    python -m src.database.drift_history --since 2024-06-01 --until 2024-06-08 --column temperature
+    python -m src.database.drift_history --prune
+"""
+import sys
+import os
+import argparse
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import inspect, text
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from src.database.db import DB_URL, connect, get_engine, load_rows
+
+# CONFIG
+DRIFT_HISTORY_TABLE = "drift_history"
+DRIFT_HISTORY_RETENTION_DAYS = float(os.getenv("DRIFT_HISTORY_RETENTION_DAYS", "365"))  # 0 keeps everything
+DRIFT_HISTORY_DOWNSAMPLE_AFTER_DAYS = float(os.getenv("DRIFT_HISTORY_DOWNSAMPLE_AFTER_DAYS", "7"))  # 0 never merges
+DRIFT_HISTORY_DOWNSAMPLE_S = int(os.getenv("DRIFT_HISTORY_DOWNSAMPLE_S", "3600"))
+DRIFT_HISTORY_COLUMNS = (
+    "checked_at", "source", "column_name", "ks_stat", "p_value", "psi", "wasserstein", "drifted",
+    "dataset_drift", "share_drifted_columns", "window_start", "window_end", "n_current", "n_reference", "runs",
+)
+SCORE_COLUMNS = ("ks_stat", "p_value", "psi", "wasserstein")
+
+_COLUMN_TYPES = {
+    "checked_at": "TIMESTAMP NOT NULL",  # Naive UTC
+    "source": "TEXT NOT NULL",
+    "column_name": "TEXT NOT NULL",
+    "ks_stat": "DOUBLE PRECISION",
+    "p_value": "DOUBLE PRECISION",
+    "psi": "DOUBLE PRECISION",
+    "wasserstein": "DOUBLE PRECISION",
+    "drifted": "INTEGER NOT NULL",
+    "dataset_drift": "INTEGER NOT NULL",
+    "share_drifted_columns": "DOUBLE PRECISION",
+    "window_start": "TIMESTAMP",
+    "window_end": "TIMESTAMP",
+    "n_current": "INTEGER",
+    "n_reference": "INTEGER",
+    "runs": "INTEGER NOT NULL",  # Monitor runs summarized by this row (1 until downsampled)
+}
+_TIME_COLUMNS = ("checked_at", "window_start", "window_end")
+_FLOAT_COLUMNS = SCORE_COLUMNS + ("share_drifted_columns",)
+_INT_COLUMNS = ("drifted", "dataset_drift", "n_current", "n_reference", "runs")
+
+def _db_timestamp(ts):
+    """Bind value for `ts` that compares correctly against the TIMESTAMP columns (None stays None)."""
+    if ts is None or np.isnat(np.datetime64(ts, "us")):
+        return None
+    if DB_URL.startswith("sqlite"):
+        # SQLite compares the stored text, so every timestamp is written in one layout
+        return np.datetime_as_string(np.datetime64(ts, "us"), unit="us").replace("T", " ")
+    return np.datetime64(ts, "us").astype(object)
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def ensure_drift_history_schema(conn):
+    """Creates the `drift_history` table and its `checked_at` index if they are missing."""
+    columns = ", ".join(f"{name} {_COLUMN_TYPES[name]}" for name in DRIFT_HISTORY_COLUMNS)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DRIFT_HISTORY_TABLE} ({columns})"))
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS {DRIFT_HISTORY_TABLE}_checked_at_idx ON {DRIFT_HISTORY_TABLE} (checked_at)"
+    ))
+
+def _insert(conn, rows):
+    placeholders = ", ".join(f":{name}" for name in DRIFT_HISTORY_COLUMNS)
+    conn.execute(
+        text(f"INSERT INTO {DRIFT_HISTORY_TABLE} ({', '.join(DRIFT_HISTORY_COLUMNS)}) VALUES ({placeholders})"),
+        rows,
+    )
+
+def record_drift(result, window=(None, None), checked_at=None):
+    """
+    Appends one `DriftEngine.check()` result (plus "source") as one row per column.
+
+    `window` is the (first, last) timestamp of the current window. Returns
+    the number of rows written.
+    """
+    checked_at = _db_timestamp(checked_at if checked_at is not None else _utcnow())
+    shared = {
+        "checked_at": checked_at,
+        "source": result.get("source", "features"),
+        "dataset_drift": int(bool(result["dataset_drift"])),
+        "share_drifted_columns": float(result["share_drifted_columns"]),
+        "window_start": _db_timestamp(window[0]),
+        "window_end": _db_timestamp(window[1]),
+        "n_current": int(result["n_current"]),
+        "n_reference": int(result["n_reference"]),
+        "runs": 1,
+    }
+    rows = [
+        {**shared, "column_name": col, "drifted": int(stats["drifted"]),
+         **{name: float(stats[name]) for name in SCORE_COLUMNS}}
+        for col, stats in result["columns"].items()
+    ]
+    with connect(begin=True) as conn:
+        ensure_drift_history_schema(conn)
+        _insert(conn, rows)
+    return len(rows)
+
+def _as_columns(rows):
+    columns = {}
+    for i, name in enumerate(DRIFT_HISTORY_COLUMNS):
+        values = [row[i] for row in rows]
+        if name in _TIME_COLUMNS:
+            columns[name] = np.array(values, dtype="datetime64[us]")
+        elif name in _FLOAT_COLUMNS:
+            columns[name] = np.array(values, dtype=np.float64)
+        elif name in _INT_COLUMNS:
+            columns[name] = np.array([-1 if v is None else v for v in values], dtype=np.int64)
+        else:
+            columns[name] = np.array(values, dtype=object)
+    return columns
+
+def load_drift_history(start=None, end=None, column=None, source=None):
+    """
+    History rows with `start <= checked_at < end` as a {column: array} dict, oldest first.
+
+    Bounds are naive UTC and optional. `column` and `source` filter further.
+    A missing table gives empty arrays.
+    """
+    if not inspect(get_engine()).has_table(DRIFT_HISTORY_TABLE):
+        return _as_columns([])
+    where, params = [], {}
+    for name, op, value in (("checked_at", ">=", start), ("checked_at", "<", end)):
+        if value is not None:
+            key = "start" if op == ">=" else "end"
+            where.append(f"{name} {op} :{key}")
+            params[key] = _db_timestamp(value)
+    for name, value in (("column_name", column), ("source", source)):
+        if value is not None:
+            where.append(f"{name} = :{name}")
+            params[name] = value
+    query = f"SELECT {', '.join(DRIFT_HISTORY_COLUMNS)} FROM {DRIFT_HISTORY_TABLE}"
+    if where:
+        query += f" WHERE {' AND '.join(where)}"
+    query += " ORDER BY checked_at, source, column_name"
+    return _as_columns(load_rows(query, params, warn_empty=False))
+
+def _downsample(history, bucket_s):
+    """
+    Merged rows for every bucket of `history` that holds more than one run of a (source, column).
+
+    Returns (buckets, rows): the [start, end) bounds of the buckets to
+    replace, and the rows that replace all of their contents.
+    """
+    step = np.timedelta64(bucket_s, "s")
+    starts = history["checked_at"] - (history["checked_at"] - np.datetime64(0, "us")) % step
+    groups = {}
+    for i, key in enumerate(zip(starts, history["source"], history["column_name"])):
+        groups.setdefault(key, []).append(i)
+    crowded = {key[0] for key, idx in groups.items() if len(idx) > 1}
+
+    rows = []
+    for (bucket, source, col), idx in groups.items():
+        if bucket not in crowded:
+            continue
+        idx = np.array(idx)
+        rows.append({
+            "checked_at": _db_timestamp(bucket),
+            "source": source,
+            "column_name": col,
+            "ks_stat": float(history["ks_stat"][idx].max()),
+            "p_value": float(history["p_value"][idx].min()),
+            "psi": float(history["psi"][idx].max()),
+            "wasserstein": float(history["wasserstein"][idx].max()),
+            "drifted": int(history["drifted"][idx].max()),
+            "dataset_drift": int(history["dataset_drift"][idx].max()),
+            "share_drifted_columns": float(history["share_drifted_columns"][idx].max()),
+            "window_start": _db_timestamp(history["window_start"][idx].min()),
+            "window_end": _db_timestamp(history["window_end"][idx].max()),
+            "n_current": int(history["n_current"][idx].max()),
+            "n_reference": int(history["n_reference"][idx].max()),
+            "runs": int(history["runs"][idx].sum()),
+        })
+    return [(bucket, bucket + step) for bucket in sorted(crowded)], rows
+
+def prune_drift_history(retention_days=DRIFT_HISTORY_RETENTION_DAYS,
+                        downsample_after_days=DRIFT_HISTORY_DOWNSAMPLE_AFTER_DAYS,
+                        bucket_s=DRIFT_HISTORY_DOWNSAMPLE_S, now=None):
+    """
+    Applies retention and downsampling in one transaction.
+
+    Returns (deleted, merged): rows dropped by retention, and rows that
+    downsampling replaced with their bucket summaries.
+    """
+    if not inspect(get_engine()).has_table(DRIFT_HISTORY_TABLE):
+        return 0, 0
+    now = now if now is not None else _utcnow()
+    retention_cutoff = now - timedelta(days=retention_days) if retention_days > 0 else None
+
+    buckets, merged = [], []
+    if downsample_after_days > 0:
+        # Only whole buckets before the cutoff; the current one may still receive runs
+        cutoff = np.datetime64(now - timedelta(days=downsample_after_days), "us")
+        step = np.timedelta64(bucket_s, "s")
+        cutoff -= (cutoff - np.datetime64(0, "us")) % step
+        history = load_drift_history(start=retention_cutoff, end=cutoff)
+        buckets, merged = _downsample(history, bucket_s)
+
+    with connect(begin=True) as conn:
+        deleted = 0
+        if retention_cutoff is not None:
+            deleted = conn.execute(
+                text(f"DELETE FROM {DRIFT_HISTORY_TABLE} WHERE checked_at < :cutoff"),
+                {"cutoff": _db_timestamp(retention_cutoff)},
+            ).rowcount
+        replaced = 0
+        for start, end in buckets:
+            replaced += conn.execute(
+                text(f"DELETE FROM {DRIFT_HISTORY_TABLE} WHERE checked_at >= :start AND checked_at < :end"),
+                {"start": _db_timestamp(start), "end": _db_timestamp(end)},
+            ).rowcount
+        if merged:
+            _insert(conn, merged)
+    return deleted, replaced - len(merged)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query or prune the drift history.")
+    parser.add_argument("--since", help="Start of the time range (UTC, inclusive)")
+    parser.add_argument("--until", help="End of the time range (UTC, exclusive)")
+    parser.add_argument("--column", help="Only this drift column")
+    parser.add_argument("--source", choices=["features", "served"], help="Only runs on this current-data source")
+    parser.add_argument("--prune", action="store_true", help="Apply retention and downsampling, then exit")
+    args = parser.parse_args()
+    try:
+        if args.prune:
+            deleted, merged = prune_drift_history()
+            print(f"✓ Drift history pruned: {deleted} rows past retention deleted, {merged} rows merged")
+            sys.exit(0)
+        history = load_drift_history(args.since, args.until, args.column, args.source)
+    except Exception as e:
+        print(f"✗ Drift history failed: {e}")
+        sys.exit(1)
+
+    print(f"{'checked_at':<26} {'source':<9} {'column':<12} {'KS':>6} {'p':>8} {'PSI':>7} {'W':>7} "
+          f"{'drift':>5} {'runs':>5}")
+    for i in range(len(history["checked_at"])):
+        print(f"{str(history['checked_at'][i]):<26} {history['source'][i]:<9} {history['column_name'][i]:<12} "
+              f"{history['ks_stat'][i]:>6.3f} {history['p_value'][i]:>8.4f} {history['psi'][i]:>7.3f} "
+              f"{history['wasserstein'][i]:>7.3f} {'yes' if history['drifted'][i] else 'no':>5} "
+              f"{history['runs'][i]:>5}")
+    print(f"{len(history['checked_at'])} rows")
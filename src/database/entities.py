@@ -0,0 +1,50 @@
+# src/database/entities.py
+"""
+Reads from `entity_features`, the multi-series feature table.
+
+Every query is an index range scan on the unique (entity_id, date) index
+that `ingest_entity_features` creates. The trainer loads whole series one
+shard at a time. The API keeps per-entity windows in memory
+(`src.serving.history_cache.EntityHistories`) and only fetches new rows.
+"""
+import numpy as np
+from sqlalchemy import bindparam, text
+
+from src.database.db import connect, load_rows
+from src.database.ingest import ENTITY_FEATURES_TABLE
+from src.models.windows import TRAINING_COLUMNS
+
+def list_entities():
+    """Sorted entity ids present in the table."""
+    rows = load_rows(f"SELECT DISTINCT entity_id FROM {ENTITY_FEATURES_TABLE} ORDER BY entity_id", warn_empty=False)
+    return [row[0] for row in rows]
+
+def load_entity_series(entity_ids):
+    """
+    Full history of each entity in `entity_ids`, oldest first.
+
+    Returns {entity_id: (dates, values)}, with `values` shaped
+    (rows, len(TRAINING_COLUMNS)). Entities without rows are omitted.
+    """
+    query = text(
+        f"""
+        SELECT entity_id, date, {', '.join(TRAINING_COLUMNS)} FROM {ENTITY_FEATURES_TABLE}
+        WHERE entity_id IN :ids ORDER BY entity_id, date
+        """
+    ).bindparams(bindparam("ids", expanding=True))
+    try:
+        with connect() as conn:
+            rows = conn.execute(query, {"ids": list(entity_ids)}).all()
+    except Exception as e:
+        print(f"✗ Database error loading entity series: {e}")
+        raise
+    if not rows:
+        return {}
+
+    ids = np.array([row[0] for row in rows])
+    dates = np.array([row[1] for row in rows], dtype="datetime64[us]")
+    values = np.array([row[2:] for row in rows], dtype=np.float64)
+    # Rows arrive grouped by entity: split at the boundaries instead of filtering per entity
+    bounds = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+    starts, ends = np.r_[0, bounds], np.r_[bounds, len(ids)]
+    return {str(ids[s]): (dates[s:e], values[s:e]) for s, e in zip(starts, ends)}
@@ -0,0 +1,188 @@
+# src/database/ingest.py
+"""
+Bulk ingestion into the `features` table.
+
+`save_data` goes through ``DataFrame.to_sql``, one INSERT per row, and with
+``if_exists='replace'`` it drops the table and its indexes. This module is
+the fast path for backfills and continuous batches:
+
+- Postgres: each chunk is streamed into a temporary staging table with
+  ``COPY ... FROM STDIN (FORMAT csv)`` and merged with
+  ``INSERT ... ON CONFLICT (date) DO UPDATE``.
+- SQLite (the offline stand-in): batched ``executemany`` with the same
+  upsert.
+
+Both paths create the table and a unique index on `date` when they are
+missing. Every ``ORDER BY date`` / ``WHERE date > :wm`` query in the
+trainer, monitor and API relies on that index. `replace=True` truncates
+the table instead of dropping it, so the index is kept.
+
+`ingest_entity_features` does the same for `entity_features`, the
+multi-series table, keyed on (entity_id, date).
+"""
+import csv
+import io
+import os
+import time
+import numpy as np
+from sqlalchemy import text
+
+from src.database.db import DB_URL, connect
+
+# CONFIG
+FEATURES_TABLE = "features"
+ENTITY_FEATURES_TABLE = "entity_features"
+INGEST_COLUMNS = ("date", "temperature", "humidity", "demand", "is_drifted")
+ENTITY_INGEST_COLUMNS = ("entity_id",) + INGEST_COLUMNS
+DATE_KEY = ("date",)
+ENTITY_KEY = ("entity_id", "date")
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+
+_IS_SQLITE = DB_URL.startswith("sqlite")
+_COLUMN_TYPES = {
+    "entity_id": "TEXT NOT NULL",
+    "date": "TIMESTAMP NOT NULL",
+    "temperature": "DOUBLE PRECISION",
+    "humidity": "DOUBLE PRECISION",
+    "demand": "DOUBLE PRECISION",
+    "is_drifted": "BIGINT DEFAULT 0",  # BIGINT matches what to_sql created for existing tables
+}
+
+def _columns_for(key):
+    return ENTITY_INGEST_COLUMNS if "entity_id" in key else INGEST_COLUMNS
+
+def _index_name(table, key):
+    return f"{table}_{'_'.join(key)}_uidx"
+
+def ensure_features_schema(conn, table=FEATURES_TABLE, key=DATE_KEY):
+    """
+    Creates `table` and its unique index on `key` if they are missing.
+
+    Tables created earlier by ``to_sql`` may hold duplicate keys. Those are
+    collapsed to the most recently written row before the index is built.
+    """
+    columns = ", ".join(f"{name} {_COLUMN_TYPES[name]}" for name in _columns_for(key))
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table} ({columns})"))
+
+    index = _index_name(table, key)
+    if _IS_SQLITE:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :name"), {"name": index},
+        ).first()
+        dedupe = f"DELETE FROM {table} WHERE rowid NOT IN (SELECT MAX(rowid) FROM {table} GROUP BY {', '.join(key)})"
+    else:
+        exists = conn.execute(text("SELECT to_regclass(:name)"), {"name": index}).scalar()
+        same_key = " AND ".join(f"a.{name} = b.{name}" for name in key)
+        dedupe = f"DELETE FROM {table} a USING {table} b WHERE {same_key} AND a.ctid < b.ctid"
+    if exists:
+        return
+
+    removed = conn.execute(text(dedupe)).rowcount
+    if removed:
+        print(f"⚠ Removed {removed} duplicate ({', '.join(key)}) rows from '{table}' before indexing")
+    conn.execute(text(f"CREATE UNIQUE INDEX {index} ON {table} ({', '.join(key)})"))
+    print(f"✓ Created unique ({', '.join(key)}) index on '{table}'")
+
+def _columns(chunk, key):
+    """Normalises a DataFrame or a {column: array} mapping to a dict of NumPy columns."""
+    names = _columns_for(key)
+    missing = [name for name in names if name != "is_drifted" and name not in chunk]
+    if missing:
+        raise ValueError(f"Missing columns for ingestion: {missing}")
+    n = len(chunk["date"])
+    dates = np.asarray(chunk["date"], dtype="datetime64[us]")
+    columns = {"date": np.char.replace(np.datetime_as_string(dates, unit="us"), "T", " ")}
+    if "entity_id" in names:
+        columns["entity_id"] = np.asarray(chunk["entity_id"]).astype(str)
+    for name in ("temperature", "humidity", "demand"):
+        columns[name] = np.asarray(chunk[name], dtype=np.float64)
+    drifted = chunk["is_drifted"] if "is_drifted" in chunk else np.zeros(n)
+    columns["is_drifted"] = np.asarray(drifted, dtype=np.int64)
+
+    # Keep the last row per key, so the upsert never hits the same key twice in one statement
+    order = np.lexsort([np.arange(n)] + [columns[name] for name in reversed(key)])
+    sorted_keys = [columns[name][order] for name in key]
+    is_last = np.ones(n, dtype=bool)
+    is_last[:-1] = np.logical_or.reduce([k[1:] != k[:-1] for k in sorted_keys])
+    if not is_last.all():
+        keep = np.sort(order[is_last])
+        columns = {name: values[keep] for name, values in columns.items()}
+    return columns
+
+def _chunks(data, key, chunk_rows):
+    """Yields column dicts of at most `chunk_rows` rows from one frame/mapping or an iterable of them."""
+    if hasattr(data, "keys"):
+        data = [data]
+    for chunk in data:
+        columns = _columns(chunk, key)
+        n = len(columns["date"])
+        for start in range(0, n, chunk_rows):
+            yield {name: values[start:start + chunk_rows] for name, values in columns.items()}
+
+def _upsert_sql(table, key, source):
+    names = _columns_for(key)
+    updates = ", ".join(f"{name} = excluded.{name}" for name in names if name not in key)
+    return (f"INSERT INTO {table} ({', '.join(names)}) {source} "
+            f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}")
+
+def _copy_chunk(cursor, table, key, stage, columns):
+    names = _columns_for(key)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(zip(*(columns[name].tolist() for name in names)))
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {stage} ({', '.join(names)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    cursor.execute(_upsert_sql(table, key, f"SELECT {', '.join(names)} FROM {stage}"))
+    cursor.execute(f"TRUNCATE {stage}")
+
+def _insert_chunk(conn, table, key, columns):
+    names = _columns_for(key)
+    placeholders = ", ".join(f":{name}" for name in names)
+    rows = [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))]
+    conn.execute(text(_upsert_sql(table, key, f"VALUES ({placeholders})")), rows)
+
+def ingest_features(data, replace=False, table=FEATURES_TABLE, chunk_rows=INGEST_CHUNK_ROWS):
+    """
+    Upserts rows into `table` keyed on `date`. Returns the number of rows written.
+
+    `data` is a DataFrame, a ``{column: array}`` mapping, or an iterable of
+    either (e.g. ``stream_data`` chunks or a generator of NumPy batches). It
+    needs `date`, `temperature`, `humidity` and `demand`. `is_drifted`
+    defaults to 0. A date that already exists is overwritten, and within
+    one call the last occurrence wins. Everything is written in a single
+    transaction, so readers never see a partial batch.
+    """
+    return _ingest(data, table, DATE_KEY, replace, chunk_rows)
+
+def ingest_entity_features(data, replace=False, table=ENTITY_FEATURES_TABLE, chunk_rows=INGEST_CHUNK_ROWS):
+    """Same as `ingest_features` for the multi-series table: `data` also needs `entity_id`."""
+    return _ingest(data, table, ENTITY_KEY, replace, chunk_rows)
+
+def _ingest(data, table, key, replace, chunk_rows):
+    start = time.perf_counter()
+    written = 0
+    try:
+        with connect(begin=True) as conn:
+            ensure_features_schema(conn, table, key)
+            if replace:
+                conn.execute(text(f"DELETE FROM {table}" if _IS_SQLITE else f"TRUNCATE {table}"))
+
+            if _IS_SQLITE:
+                for columns in _chunks(data, key, chunk_rows):
+                    _insert_chunk(conn, table, key, columns)
+                    written += len(columns["date"])
+            else:
+                stage = f"{table}_ingest_stage"
+                conn.execute(text(f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"))
+                cursor = conn.connection.cursor()  # Raw psycopg2 cursor: COPY is not exposed by SQLAlchemy
+                try:
+                    for columns in _chunks(data, key, chunk_rows):
+                        _copy_chunk(cursor, table, key, stage, columns)
+                        written += len(columns["date"])
+                finally:
+                    cursor.close()
+        elapsed = time.perf_counter() - start
+        print(f"✓ Ingested {written} rows into '{table}' in {elapsed:.2f}s ({written / max(elapsed, 1e-9):,.0f} rows/s)")
+        return written
+    except Exception as e:
+        print(f"✗ Database error ingesting data: {e}")
+        raise
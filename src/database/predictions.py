@@ -0,0 +1,188 @@
+# src/database/predictions.py
+"""
+Storage layout and readers of the prediction log.
+
+The API's write-behind logger (src/serving/prediction_log.py) records
+every /predict answer to one of three sinks:
+
+- "db": the `prediction_log` table, indexed on `logged_at`.
+- "jsonl": gzip-compressed JSON lines, one file per rotation.
+- "parquet": one Parquet file per rotation (needs pyarrow).
+
+Both file sinks write under PREDICTION_LOG_DIR. A file is written under a
+``.part`` name and renamed when it is rotated, so readers only ever see
+complete files. `load_predictions` reads whichever sink is configured.
+`served_errors` joins logged predictions with the demand that was later
+observed. Each prediction forecasts the row after its history watermark.
+"""
+import os
+import csv
+import io
+import glob
+import gzip
+import json
+import numpy as np
+from sqlalchemy import inspect, text
+
+from src.database.db import DB_URL, connect, get_engine, load_rows
+from src.models.windows import TARGET_INDEX
+
+# CONFIG
+PREDICTION_LOG_SINKS = ("db", "jsonl", "parquet")
+PREDICTION_LOG_SINK = os.getenv("PREDICTION_LOG_SINK", "db")
+PREDICTION_LOG_DIR = os.getenv("PREDICTION_LOG_DIR", "data/prediction_log")
+PREDICTION_LOG_TABLE = "prediction_log"
+PREDICTION_LOG_COLUMNS = (
+    "logged_at", "endpoint", "model_version", "entity_id", "temperature", "humidity", "predicted_demand", "watermark",
+)
+FILE_SUFFIXES = {"jsonl": ".jsonl.gz", "parquet": ".parquet"}
+
+_IS_SQLITE = DB_URL.startswith("sqlite")
+_COLUMN_TYPES = {
+    "logged_at": "TIMESTAMP NOT NULL",
+    "endpoint": "TEXT NOT NULL",
+    "model_version": "TEXT",
+    "entity_id": "TEXT",
+    "temperature": "DOUBLE PRECISION",
+    "humidity": "DOUBLE PRECISION",
+    "predicted_demand": "DOUBLE PRECISION",
+    "watermark": "TIMESTAMP",  # Last history row the prediction was made from (NULL for entity requests)
+}
+_TIME_COLUMNS = ("logged_at", "watermark")
+_FLOAT_COLUMNS = ("temperature", "humidity", "predicted_demand")
+
+def ensure_prediction_log_schema(conn):
+    """Creates the `prediction_log` table and its `logged_at` index if they are missing."""
+    columns = ", ".join(f"{name} {_COLUMN_TYPES[name]}" for name in PREDICTION_LOG_COLUMNS)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {PREDICTION_LOG_TABLE} ({columns})"))
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS {PREDICTION_LOG_TABLE}_logged_at_idx ON {PREDICTION_LOG_TABLE} (logged_at)"
+    ))
+
+def log_files(sink, directory=PREDICTION_LOG_DIR):
+    """Completed log files of a file sink, oldest first (names start with their UTC open time)."""
+    return sorted(glob.glob(os.path.join(directory, f"predictions-*{FILE_SUFFIXES[sink]}")))
+
+def _read_file(path, sink):
+    if sink == "parquet":
+        import pyarrow.parquet as pq  # Optional: only needed for PREDICTION_LOG_SINK=parquet
+
+        table = pq.read_table(path, columns=list(PREDICTION_LOG_COLUMNS))
+        return list(zip(*(table.column(name).to_pylist() for name in PREDICTION_LOG_COLUMNS)))
+    with gzip.open(path, "rt") as f:
+        return [tuple(record[name] for name in PREDICTION_LOG_COLUMNS) for record in map(json.loads, f)]
+
+def _as_columns(rows):
+    columns = {}
+    for i, name in enumerate(PREDICTION_LOG_COLUMNS):
+        values = [row[i] for row in rows]
+        if name in _TIME_COLUMNS:
+            columns[name] = np.array(values, dtype="datetime64[us]")
+        elif name in _FLOAT_COLUMNS:
+            columns[name] = np.array(values, dtype=np.float64)
+        else:
+            columns[name] = np.array(values, dtype=object)
+    return columns
+
+def load_predictions(limit=None, min_watermark=None, endpoint="predict", global_only=True, sink=PREDICTION_LOG_SINK):
+    """
+    Logged predictions as a {column: array} dict, oldest first.
+
+    `limit` keeps only the latest rows, and `min_watermark` only predictions
+    made from history up to at least that date. `global_only` drops entity
+    requests, whose inputs and demand belong to other series. Times are
+    datetime64[us] (naive UTC for `logged_at`). An empty log, or a missing
+    table, gives empty arrays.
+    """
+    if sink not in PREDICTION_LOG_SINKS:
+        raise ValueError(f"Unknown prediction log sink '{sink}'. Use one of {PREDICTION_LOG_SINKS}")
+    min_watermark = None if min_watermark is None else np.datetime64(min_watermark, "us")
+
+    if sink == "db":
+        if not inspect(get_engine()).has_table(PREDICTION_LOG_TABLE):
+            return _as_columns([])
+        where = ["endpoint = :endpoint"] + (["entity_id IS NULL"] if global_only else [])
+        params = {"endpoint": endpoint}
+        if min_watermark is not None:
+            where.append("watermark >= :min_watermark")
+            params["min_watermark"] = str(min_watermark).replace("T", " ") if _IS_SQLITE else min_watermark.item()
+        query = (f"SELECT {', '.join(PREDICTION_LOG_COLUMNS)} FROM {PREDICTION_LOG_TABLE} "
+                 f"WHERE {' AND '.join(where)} ORDER BY logged_at DESC")
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        rows = load_rows(query, params, warn_empty=False)[::-1]
+    else:
+        # Newest files first, stopping once `limit` matching rows are collected
+        rows = []
+        for path in reversed(log_files(sink)):
+            selected = [
+                r for r in _read_file(path, sink)
+                if r[1] == endpoint and not (global_only and r[3])
+                and (min_watermark is None or (r[7] is not None and np.datetime64(r[7], "us") >= min_watermark))
+            ]
+            rows = selected + rows
+            if limit is not None and len(rows) >= limit:
+                rows = rows[-limit:]
+                break
+    return _as_columns(rows)
+
+def served_errors(predictions, dates, values, previous_date=None):
+    """
+    Error of logged predictions against the demand observed afterwards.
+
+    `dates`/`values` are consecutive feature rows (values in TRAINING_COLUMNS
+    order). A prediction made from history up to watermark `w` is matched
+    with the row right after `w`, provided `w` is in `dates` or equals
+    `previous_date`, the date just before ``dates[0]``. Returns None when
+    nothing matched, else {"n", "rmse", "mae", "by_version": {version: {"n", "rmse"}}}.
+    """
+    watermarks = predictions["watermark"]
+    if len(watermarks) == 0 or len(dates) == 0:
+        return None
+    keys = np.asarray(dates, dtype="datetime64[us]")
+    if previous_date is not None:
+        keys = np.concatenate([np.array([previous_date], dtype="datetime64[us]"), keys])
+    offset = len(keys) - len(dates)
+
+    idx = np.searchsorted(keys, watermarks, side="right")  # One past the watermark's own row
+    matched = (idx > 0) & (idx - offset < len(dates)) & ~np.isnat(watermarks)
+    matched[matched] &= keys[idx[matched] - 1] == watermarks[matched]
+    if not matched.any():
+        return None
+
+    actual = np.asarray(values)[idx[matched] - offset, TARGET_INDEX]
+    errors = predictions["predicted_demand"][matched] - actual
+    versions = predictions["model_version"][matched]
+    by_version = {}
+    for version in np.unique(versions.astype(str)):
+        e = errors[versions.astype(str) == version]
+        by_version[version] = {"n": int(len(e)), "rmse": float(np.sqrt(np.mean(e ** 2)))}
+    return {
+        "n": int(matched.sum()),
+        "rmse": float(np.sqrt(np.mean(errors ** 2))),
+        "mae": float(np.mean(np.abs(errors))),
+        "by_version": by_version,
+    }
+
+def write_rows(rows, ensure_schema=True):
+    """Appends formatted rows (tuples in PREDICTION_LOG_COLUMNS order) to the table in one transaction."""
+    with connect(begin=True) as conn:
+        if ensure_schema:
+            ensure_prediction_log_schema(conn)
+        if _IS_SQLITE:
+            placeholders = ", ".join(f":{name}" for name in PREDICTION_LOG_COLUMNS)
+            conn.execute(
+                text(f"INSERT INTO {PREDICTION_LOG_TABLE} ({', '.join(PREDICTION_LOG_COLUMNS)}) VALUES ({placeholders})"),
+                [dict(zip(PREDICTION_LOG_COLUMNS, row)) for row in rows],
+            )
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)  # None becomes an empty unquoted field, which COPY reads as NULL
+        buffer.seek(0)
+        cursor = conn.connection.cursor()  # Raw psycopg2 cursor: COPY is not exposed by SQLAlchemy
+        try:
+            cursor.copy_expert(
+                f"COPY {PREDICTION_LOG_TABLE} ({', '.join(PREDICTION_LOG_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        finally:
+            cursor.close()
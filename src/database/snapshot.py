@@ -0,0 +1,242 @@
+# src/database/snapshot.py
+"""
+Local, append-only columnar copy of the `features` table.
+
+The trainer and the drift monitor used to pull the whole table from
+Postgres on every run. The snapshot keeps the table on local disk as two
+raw little-endian files, memory-mapped read-only by consumers:
+
+    <FEATURE_SNAPSHOT_DIR>/dates.<generation>.i64    datetime64[us], ascending
+    <FEATURE_SNAPSHOT_DIR>/values.<generation>.f64   float64, shape (rows, len(columns))
+    <FEATURE_SNAPSHOT_DIR>/meta.json                 rows, columns, watermark, generation
+
+`sync()` asks Postgres only for rows after the watermark, in keyset-paged
+chunks. Each chunk is appended and then meta.json is atomically replaced.
+Readers size their maps from meta.json, so they never see a half-written
+append. Bytes past `rows` (left by a sync that crashed) are truncated by
+the next sync; committed bytes, which readers may have mapped, never are.
+
+An upsert that rewrites an existing date cannot be seen through the
+watermark. Each sync checks both ends of the snapshot against Postgres
+with bounded, index-only queries: the first date, and the number of rows
+from the snapshot's last SNAPSHOT_CHECK_ROWS dates up to the watermark.
+A mismatch (a re-populate, or a backfill or deletes near the head)
+rebuilds the snapshot from scratch. Changes older than that tail, and
+in-place edits of old rows, need `rebuild=True`, or
+``python -m src.database.snapshot --rebuild``. A rebuild writes a new
+generation of files and switches meta.json to it once its first chunk is
+committed. The old files are then unlinked, not truncated, so a trainer
+or monitor still mapping them keeps reading its consistent copy.
+"""
+import sys
+import os
+import json
+import fcntl
+import argparse
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from src.database.db import DB_URL, load_rows
+from src.models.windows import TRAINING_COLUMNS
+
+# CONFIG
+FEATURE_SNAPSHOT_ENABLED = os.getenv("FEATURE_SNAPSHOT_ENABLED", "1") == "1"
+FEATURE_SNAPSHOT_DIR = os.getenv("FEATURE_SNAPSHOT_DIR", "data/feature_snapshot")
+SNAPSHOT_SYNC_CHUNK_ROWS = int(os.getenv("SNAPSHOT_SYNC_CHUNK_ROWS", "100000"))
+SNAPSHOT_CHECK_ROWS = int(os.getenv("SNAPSHOT_CHECK_ROWS", "10000"))  # Newest rows re-counted on every sync
+SNAPSHOT_COLUMNS = TRAINING_COLUMNS
+
+_META_FILE = "meta.json"
+_DATA_FILES = (("dates", "i64"), ("values", "f64"))
+_LOCK_FILE = ".lock"
+
+def _db_timestamp(ts):
+    """Bind value for `ts` that compares correctly against the `date` column."""
+    if DB_URL.startswith("sqlite"):
+        # SQLite compares the stored text; match the format to_sql and ingest_features write
+        return np.datetime_as_string(np.datetime64(ts, "us"), unit="us").replace("T", " ")
+    return np.datetime64(ts, "us").astype(object)
+
+class FeatureSnapshot:
+    """
+    Memory-mapped view of the snapshot in `path`.
+
+    `dates` and `values` are read-only maps sized from the last committed
+    sync. Slicing them copies nothing, and pages are loaded lazily by the
+    OS. Call `sync()` first to pull rows written to Postgres since then.
+    """
+
+    def __init__(self, path=FEATURE_SNAPSHOT_DIR, columns=SNAPSHOT_COLUMNS):
+        self.path = path
+        self.columns = list(columns)
+        self.rows = 0
+        self.watermark = None
+        self.generation = 0
+        self.dates = np.empty(0, dtype="datetime64[us]")
+        self.values = np.empty((0, len(self.columns)), dtype=np.float64)
+        self._open()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _data_file(self, stem, suffix, generation):
+        # Generation 0 keeps the original names, so existing snapshots stay valid
+        return self._file(f"{stem}.{suffix}" if generation == 0 else f"{stem}.{generation}.{suffix}")
+
+    def _remove_other_generations(self, keep):
+        """Unlinks data files of every generation except `keep` (open maps stay valid until closed)."""
+        for name in os.listdir(self.path):
+            for stem, suffix in _DATA_FILES:
+                middle = name[len(stem) + 1:-len(suffix) - 1]
+                if name == f"{stem}.{suffix}":
+                    generation = 0
+                elif name.startswith(f"{stem}.") and name.endswith(f".{suffix}") and middle.isdigit():
+                    generation = int(middle)
+                else:
+                    continue
+                if generation != keep:
+                    os.remove(self._file(name))
+
+    def _read_meta(self):
+        try:
+            with open(self._file(_META_FILE)) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        if meta.get("columns") != self.columns:
+            print(f"⚠ Snapshot columns {meta.get('columns')} differ from {self.columns}. Ignoring it.")
+            return None
+        return meta
+
+    def _open(self):
+        meta = self._read_meta()
+        self.generation = meta.get("generation", 0) if meta is not None else 0
+        if meta is None or meta["rows"] == 0:
+            self.rows, self.watermark = 0, None
+            self.dates = np.empty(0, dtype="datetime64[us]")
+            self.values = np.empty((0, len(self.columns)), dtype=np.float64)
+            return
+        self.rows = meta["rows"]
+        self.watermark = np.datetime64(meta["watermark"], "us")
+        self.dates = np.memmap(self._data_file("dates", "i64", self.generation), dtype="<i8", mode="r",
+                               shape=(self.rows,)).view("datetime64[us]")
+        self.values = np.memmap(self._data_file("values", "f64", self.generation), dtype="<f8", mode="r",
+                                shape=(self.rows, len(self.columns)))
+
+    def _write_meta(self, rows, watermark, generation):
+        meta = {
+            "rows": rows,
+            "columns": self.columns,
+            "watermark": None if watermark is None else np.datetime_as_string(watermark, unit="us"),
+            "generation": generation,
+        }
+        tmp_path = self._file(_META_FILE + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._file(_META_FILE))
+
+    def _append(self, rows, committed, generation):
+        """Appends DB rows (date, *columns) after the first `committed` rows of `generation`'s files."""
+        dates = np.array([r[0] for r in rows], dtype="datetime64[us]")
+        values = np.array([r[1:] for r in rows], dtype="<f8").reshape(-1, len(self.columns))
+        for (stem, suffix), block, width in ((_DATA_FILES[0], dates.astype("<i8"), 8),
+                                             (_DATA_FILES[1], values, 8 * len(self.columns))):
+            with open(self._data_file(stem, suffix, generation), "ab") as f:
+                if os.fstat(f.fileno()).st_size > committed * width:
+                    f.truncate(committed * width)  # Only bytes of a sync that died before committing
+                f.write(block.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        self._write_meta(committed + len(dates), dates[-1], generation)
+
+    def _consistent(self):
+        """
+        True if Postgres still starts at the snapshot's first date and holds
+        exactly the snapshot's newest SNAPSHOT_CHECK_ROWS rows up to the
+        watermark. Both are index range scans of bounded size, whatever
+        the table length.
+        """
+        tail = min(self.rows, SNAPSHOT_CHECK_ROWS)
+        first, count = load_rows(
+            """
+            SELECT (SELECT MIN(date) FROM features),
+                   (SELECT COUNT(*) FROM features WHERE date >= :since AND date <= :wm)
+            """,
+            {"since": _db_timestamp(self.dates[self.rows - tail]), "wm": _db_timestamp(self.watermark)},
+            warn_empty=False,
+        )[0]
+        return first is not None and np.datetime64(first, "us") == self.dates[0] and count == tail
+
+    def sync(self, rebuild=False):
+        """
+        Appends rows newer than the watermark. Returns the number of rows added.
+
+        One process syncs at a time (an flock on the snapshot directory).
+        The others wait and then see its result.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file(_LOCK_FILE), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._open()  # Another process may have synced while we waited
+            generation, committed, watermark = self.generation, self.rows, self.watermark
+            if self.rows and (rebuild or not self._consistent()):
+                if not rebuild:
+                    print("⚠ Feature table changed below the snapshot watermark. Rebuilding snapshot...")
+                # Fresh files: readers keep mapping the current generation until meta.json switches
+                generation, committed, watermark = generation + 1, 0, None
+                for stem, suffix in _DATA_FILES:
+                    if os.path.exists(self._data_file(stem, suffix, generation)):
+                        os.remove(self._data_file(stem, suffix, generation))  # Left by a crashed rebuild
+
+            added = 0
+            while True:
+                rows = self._fetch_after(watermark)
+                if rows:
+                    self._append(rows, committed, generation)
+                    committed += len(rows)
+                    watermark = np.datetime64(rows[-1][0], "us")
+                    added += len(rows)
+                if len(rows) < SNAPSHOT_SYNC_CHUNK_ROWS:
+                    break
+            if generation != self.generation:
+                if committed == 0:
+                    self._write_meta(0, None, generation)  # The table is now empty
+                self._remove_other_generations(keep=generation)
+            self._open()
+        return added
+
+    def _fetch_after(self, watermark):
+        select = f"SELECT date, {', '.join(self.columns)} FROM features"
+        if watermark is None:
+            return load_rows(f"{select} ORDER BY date ASC LIMIT {SNAPSHOT_SYNC_CHUNK_ROWS}", warn_empty=False)
+        return load_rows(f"{select} WHERE date > :wm ORDER BY date ASC LIMIT {SNAPSHOT_SYNC_CHUNK_ROWS}",
+                         {"wm": _db_timestamp(watermark)}, warn_empty=False)
+
+    def index_after(self, ts):
+        """Position of the first row strictly after `ts`."""
+        return int(np.searchsorted(self.dates, np.datetime64(ts, "us"), side="right"))
+
+    def __len__(self):
+        return self.rows
+
+def open_snapshot(sync=True):
+    """Returns the shared FeatureSnapshot, synced with Postgres unless `sync=False`."""
+    snapshot = FeatureSnapshot()
+    if sync:
+        added = snapshot.sync()
+        print(f"✓ Feature snapshot synced: {len(snapshot)} rows (+{added}), watermark {snapshot.watermark}")
+    return snapshot
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the local feature snapshot with Postgres.")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the snapshot and export the table again")
+    args = parser.parse_args()
+    snapshot = FeatureSnapshot()
+    try:
+        added = snapshot.sync(rebuild=args.rebuild)
+    except Exception as e:
+        print(f"✗ Snapshot sync failed: {e}")
+        sys.exit(1)
+    print(f"✓ Feature snapshot at {snapshot.path}: {len(snapshot)} rows (+{added}), watermark {snapshot.watermark}")
@@ -2,72 +2,259 @@
 import sys
 import os
 import json
-import pandas as pd
-from evidently.report import Report
-from evidently.metric_preset import DataDriftPreset
+import argparse
+import numpy as np
 
 # Add project root to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
-from src.database.db import load_data
+from src.database.db import load_rows
+from src.database.drift_history import prune_drift_history, record_drift
+from src.database.predictions import load_predictions
+from src.database.snapshot import FEATURE_SNAPSHOT_ENABLED, open_snapshot
+from src.drift.stats import DriftEngine, ReferenceProfile
+from src.models.windows import TRAINING_COLUMNS
+from src.telemetry.stages import PUSHGATEWAY_URL, StageTimer
 
 # CONFIG
 DRIFT_REPORT_PATH = "data/drift_report.json"
+DEEP_REPORT_PATH = "data/drift_report_full.json"
+REFERENCE_PROFILE_PATH = os.getenv("DRIFT_REFERENCE_PROFILE_PATH", "data/drift_reference.npz")
 REFERENCE_WINDOW_SIZE = 500  # First N records as baseline
 CURRENT_WINDOW_SIZE = 30     # Last N records for comparison
+DRIFT_COLUMNS = TRAINING_COLUMNS
+DRIFT_CURRENT_SOURCE = os.getenv("DRIFT_CURRENT_SOURCE", "features")  # "features" or "served" (the prediction log)
+SERVED_WINDOW_SIZE = int(os.getenv("DRIFT_SERVED_WINDOW_SIZE", "500"))  # Latest logged /predict requests
+# Served traffic has no observed demand yet: the model's predicted demand stands in for it
+SERVED_COLUMNS = ["predicted_demand" if col == "demand" else col for col in DRIFT_COLUMNS]
+DRIFT_HISTORY_ENABLED = os.getenv("DRIFT_HISTORY_ENABLED", "1") == "1"  # Append every run to `drift_history`
 
-def detect_drift():
+def _load_window(order, limit, snapshot=None, with_dates=False):
+    """
+    (limit, len(DRIFT_COLUMNS)) float array of the first/last `limit` rows by date.
+
+    Sliced straight out of the memory-mapped `snapshot` when one is given,
+    otherwise queried from Postgres. With `with_dates=True`, returns
+    (dates, values) in the same order.
+    """
+    if snapshot is not None:
+        if order == "ASC":
+            dates, values = snapshot.dates[:limit], snapshot.values[:limit]
+        else:
+            dates, values = snapshot.dates[::-1][:limit], snapshot.values[::-1][:limit]
+        return (np.asarray(dates), np.asarray(values)) if with_dates else np.asarray(values)
+    columns = (["date"] if with_dates else []) + DRIFT_COLUMNS
+    rows = load_rows(f"SELECT {', '.join(columns)} FROM features ORDER BY date {order} LIMIT {limit}")
+    if not with_dates:
+        return np.array(rows, dtype=np.float64).reshape(-1, len(DRIFT_COLUMNS))
+    dates = np.array([row[0] for row in rows], dtype="datetime64[us]")
+    return dates, np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, len(DRIFT_COLUMNS))
+
+def load_reference_profile(rebuild=False, snapshot=None, build_missing=True):
+    """
+    Loads the persisted reference profile, building it from the snapshot or Postgres on first use.
+
+    With `build_missing=False` (serving processes) a missing or outdated
+    profile raises FileNotFoundError instead: only the drift monitor writes it.
+    """
+    if not rebuild and os.path.exists(REFERENCE_PROFILE_PATH):
+        profile = ReferenceProfile.load(REFERENCE_PROFILE_PATH)
+        if profile.columns == DRIFT_COLUMNS:
+            return profile
+        if not build_missing:
+            raise FileNotFoundError(f"Reference profile {REFERENCE_PROFILE_PATH} has outdated columns. "
+                                    f"Run `python -m src.drift.monitor --rebuild-reference`")
+        print("⚠ Reference profile columns changed. Rebuilding...")
+    elif not build_missing:
+        raise FileNotFoundError(f"No reference profile at {REFERENCE_PROFILE_PATH}. Run `python -m src.drift.monitor`")
+
+    print("Fetching Reference Data...")
+    reference = _load_window("ASC", REFERENCE_WINDOW_SIZE, snapshot)
+    if len(reference) < REFERENCE_WINDOW_SIZE:
+        print(f"⚠ Warning: Reference data has only {len(reference)} records (need {REFERENCE_WINDOW_SIZE})")
+
+    profile = ReferenceProfile.from_data(reference, DRIFT_COLUMNS)
+    profile.save(REFERENCE_PROFILE_PATH)
+    print(f"✓ Reference profile saved to {REFERENCE_PROFILE_PATH}")
+    return profile
+
+def load_current_data(snapshot=None, source=DRIFT_CURRENT_SOURCE):
+    """
+    Current window, oldest first, in DRIFT_COLUMNS order, and its (first, last) timestamp.
+
+    "features" is the latest CURRENT_WINDOW_SIZE rows of the feature store,
+    bounded by their dates. "served" is the latest SERVED_WINDOW_SIZE
+    requests in the prediction log, with predicted demand in the demand
+    column, bounded by when they were served. It catches drift in what
+    clients actually ask for, and in what the model answers, before the
+    observed rows reach `features`.
+    """
+    if source == "served":
+        predictions = load_predictions(limit=SERVED_WINDOW_SIZE)
+        current = np.column_stack([predictions[col] for col in SERVED_COLUMNS])
+        times = predictions["logged_at"]
+        expected = SERVED_WINDOW_SIZE
+    elif source == "features":
+        times, current = _load_window("DESC", CURRENT_WINDOW_SIZE, snapshot, with_dates=True)
+        times, current = times[::-1], current[::-1]
+        expected = CURRENT_WINDOW_SIZE
+    else:
+        raise ValueError(f"Unknown drift source '{source}' (use 'features' or 'served')")
+    if len(current) < expected:
+        print(f"⚠ Warning: Current data has only {len(current)} records (need {expected})")
+    window = (times[0], times[-1]) if len(times) else (None, None)
+    return current, window
+
+def push_drift_scores(result, gateway=PUSHGATEWAY_URL):
+    """
+    Pushes the latest per-column scores and verdict to the Pushgateway.
+
+    Grouped by job "drift_monitor" and the current-data source, so runs on
+    features and on served traffic keep separate latest values and never
+    replace the stage timings pushed under the bare job.
+    """
+    if not gateway:
+        return
+    from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+
+    registry = CollectorRegistry()
+    for name in ("ks_stat", "p_value", "psi", "wasserstein"):
+        gauge = Gauge(f"drift_{name}", f"{name} of each column in the last drift check", ["column"],
+                      registry=registry)
+        for col, stats in result["columns"].items():
+            gauge.labels(col).set(stats[name])
+    drifted = Gauge("drift_column_drifted", "1 if the column drifted in the last drift check", ["column"],
+                    registry=registry)
+    for col, stats in result["columns"].items():
+        drifted.labels(col).set(int(stats["drifted"]))
+    Gauge("drift_detected", "1 if the last drift check flagged dataset drift",
+          registry=registry).set(int(result["dataset_drift"]))
+    Gauge("drift_share_drifted_columns", "Share of drifted columns in the last drift check",
+          registry=registry).set(result["share_drifted_columns"])
+    Gauge("drift_last_check_timestamp_seconds", "Unix time of the last drift check",
+          registry=registry).set_to_current_time()
+    try:
+        push_to_gateway(gateway, job="drift_monitor", registry=registry, grouping_key={"source": result["source"]})
+    except Exception as e:
+        print(f"⚠ Could not push drift scores to {gateway}: {e}")
+
+def save_drift_history(result, window):
+    """Appends the run to `drift_history`, then applies retention and downsampling. Never raises."""
+    try:
+        written = record_drift(result, window)
+        deleted, merged = prune_drift_history()
+    except Exception as e:
+        print(f"⚠ Could not record drift history: {e}")
+        return
+    print(f"✓ Drift history: {written} rows appended"
+          + (f", {deleted} expired, {merged} downsampled" if deleted or merged else ""))
+
+def run_deep_report(current, snapshot=None):
+    """Full Evidently DataDriftPreset report (slow; pandas and Evidently are imported only when requested)."""
+    import pandas as pd
+    from evidently.report import Report
+    from evidently.metric_preset import DataDriftPreset
+
+    reference_df = pd.DataFrame(_load_window("ASC", REFERENCE_WINDOW_SIZE, snapshot), columns=DRIFT_COLUMNS)
+    current_df = pd.DataFrame(current, columns=DRIFT_COLUMNS)
+    print("Running Statistical Tests (Evidently AI)...")
+    report = Report(metrics=[DataDriftPreset()])
+    report.run(reference_data=reference_df, current_data=current_df)
+    report_dict = report.as_dict()
+
+    with open(DEEP_REPORT_PATH, 'w') as f:
+        json.dump(report_dict, f)
+    print(f"Full report saved to {DEEP_REPORT_PATH}")
+    return report_dict['metrics'][0]['result']['dataset_drift']
+
+def detect_drift(deep_report=False, rebuild_reference=False, source=DRIFT_CURRENT_SOURCE):
+    """
+    Compares the current window (see `load_current_data`) against the reference profile.
+
+    By default this uses the NumPy drift engine (src/drift/stats.py). Each
+    run is appended to the `drift_history` table
+    (src/database/drift_history.py), and its latest scores are pushed to
+    PUSHGATEWAY_URL if set. DRIFT_REPORT_PATH keeps a compact copy of the
+    latest result. With `deep_report=True` an Evidently report is also
+    generated, and its verdict is the one returned. Per-stage timings are
+    printed at the end and pushed as well.
+    """
     print("Starting Drift Check...")
-    
+    timer = StageTimer("drift_monitor", track_totals=True)
+
     try:
-        # 1. Load Reference Data (The "Good" History)
-        print("Fetching Reference Data...")
-        reference_df = load_data(
-            f"SELECT temperature, humidity, demand FROM features ORDER BY date ASC LIMIT {REFERENCE_WINDOW_SIZE}"
-        )
-        
-        if len(reference_df) < REFERENCE_WINDOW_SIZE:
-            print(f"⚠ Warning: Reference data has only {len(reference_df)} records (need {REFERENCE_WINDOW_SIZE})")
-        
-        # 2. Load Current Data (The "New" Stuff)
+        os.makedirs(os.path.dirname(DRIFT_REPORT_PATH), exist_ok=True)
+
+        # 1. Bring the local feature snapshot up to date (only rows after its watermark)
+        snapshot = None
+        if FEATURE_SNAPSHOT_ENABLED:
+            with timer.stage("sync_snapshot"):
+                snapshot = open_snapshot()
+
+        # 2. Reference statistics (precomputed once, then loaded from disk)
+        with timer.stage("reference_profile"):
+            profile = load_reference_profile(rebuild=rebuild_reference, snapshot=snapshot)
+
+        # 3. Load Current Data (The "New" Stuff)
         print("Fetching Current Data...")
-        current_df = load_data(
-            f"SELECT temperature, humidity, demand FROM features ORDER BY date DESC LIMIT {CURRENT_WINDOW_SIZE}"
-        )
-        
-        if len(current_df) < CURRENT_WINDOW_SIZE:
-            print(f"⚠ Warning: Current data has only {len(current_df)} records (need {CURRENT_WINDOW_SIZE})")
-        
-        # 3. Run Evidently Report
-        print("Running Statistical Tests (Evidently AI)...")
-        report = Report(metrics=[DataDriftPreset()])
-        report.run(reference_data=reference_df, current_data=current_df)
-        
-        # 4. Parse Result
-        report_dict = report.as_dict()
-        
-        # The result structure is deeply nested, we extract the boolean flag
-        drift_detected = report_dict['metrics'][0]['result']['dataset_drift']
-        
-        # 5. Save Report (For debugging/Grafana later)
-        with open(DRIFT_REPORT_PATH, 'w') as f:
-            json.dump(report_dict, f, indent=2)
-        
+        with timer.stage("load_current"):
+            current, window = load_current_data(snapshot, source)
+        if len(current) == 0:
+            raise ValueError(f"No current data from source '{source}'")
+
+        # 4. Per-column KS / PSI / Wasserstein
+        with timer.stage("drift_stats"):
+            engine = DriftEngine(profile, len(current))
+            engine.update(current)
+            result = engine.check()
+            result["source"] = source
+        drift_detected = result["dataset_drift"]
+
+        for col, stats in result["columns"].items():
+            flag = "DRIFT" if stats["drifted"] else "ok"
+            print(f"  {col:<12} KS={stats['ks_stat']:.3f} p={stats['p_value']:.4f} "
+                  f"PSI={stats['psi']:.3f} W={stats['wasserstein']:.3f} [{flag}]")
+
+        # 5. Optional deep report
+        if deep_report:
+            with timer.stage("deep_report"):
+                drift_detected = run_deep_report(current, snapshot)
+            result["evidently_dataset_drift"] = drift_detected
+
+        # 6. Append to the drift history, expose the latest scores, keep a compact copy of this run
+        if DRIFT_HISTORY_ENABLED:
+            with timer.stage("record_history"):
+                save_drift_history(result, window)
+        with timer.stage("push_scores"):
+            push_drift_scores(result)
+        with timer.stage("write_report"):
+            with open(DRIFT_REPORT_PATH, 'w') as f:
+                json.dump(result, f, separators=(",", ":"))
+
         if drift_detected:
             print("🚨 DRIFT DETECTED! Data distribution has significantly changed.")
             return True
         else:
             print("✓ Data is stable. No retraining needed.")
             return False
-            
+
     except Exception as e:
         print(f"✗ Drift detection failed: {e}")
         raise
+    finally:
+        timer.finish()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the feature store for data drift.")
+    parser.add_argument("--deep", action="store_true", help="Also run the full Evidently report")
+    parser.add_argument("--rebuild-reference", action="store_true",
+                        help="Recompute the persisted reference profile")
+    parser.add_argument("--source", choices=["features", "served"], default=DRIFT_CURRENT_SOURCE,
+                        help="Current window: latest feature rows, or latest served requests from the prediction log")
+    args = parser.parse_args()
     try:
-        is_drifted = detect_drift()
+        is_drifted = detect_drift(deep_report=args.deep, rebuild_reference=args.rebuild_reference, source=args.source)
         # Exit with code 1 if drift detected (useful for CI/CD/Prefect)
         sys.exit(1 if is_drifted else 0)
     except Exception as e:
         print(f"✗ Error: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
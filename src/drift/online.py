@@ -0,0 +1,208 @@
+# src/drift/online.py
+"""
+Online drift monitoring on live request features.
+
+Request threads only append tuples to their own bounded deque (one shard
+per thread). They take no locks and do no math. A background thread
+periodically drains every shard into a DriftEngine window, recomputes the
+drift scores, publishes them as Prometheus gauges, and fires the retrain
+trigger when drift persists.
+
+The trigger is off unless DRIFT_RETRAIN_COMMAND is set. Every API worker
+runs its own monitor, so launches are coordinated through an flock on
+DRIFT_TRIGGER_LOCK_PATH. The holder runs the retrain, and the file
+records the last launch time, so the cooldown applies across all
+workers on the host.
+"""
+import os
+import fcntl
+import shlex
+import subprocess
+import threading
+import time
+from collections import deque
+from prometheus_client import Counter, Gauge
+
+from src.drift.stats import DriftEngine
+
+# CONFIG
+ONLINE_DRIFT_ENABLED = os.getenv("ONLINE_DRIFT_ENABLED", "1") == "1"
+ONLINE_DRIFT_WINDOW = int(os.getenv("ONLINE_DRIFT_WINDOW", "500"))        # Most recent requests compared
+ONLINE_DRIFT_MIN_SAMPLES = int(os.getenv("ONLINE_DRIFT_MIN_SAMPLES", "100"))
+ONLINE_DRIFT_INTERVAL_S = float(os.getenv("ONLINE_DRIFT_INTERVAL_S", "15"))
+SHARD_CAPACITY = int(os.getenv("ONLINE_DRIFT_SHARD_CAPACITY", "10000"))   # Per thread, oldest dropped first
+DRIFT_TRIGGER_CONSECUTIVE = int(os.getenv("DRIFT_TRIGGER_CONSECUTIVE", "3"))
+DRIFT_TRIGGER_COOLDOWN_S = float(os.getenv("DRIFT_TRIGGER_COOLDOWN_S", "3600"))
+DRIFT_RETRAIN_COMMAND = os.getenv("DRIFT_RETRAIN_COMMAND", "")  # e.g. "python -m src.orchestration.flow"; empty = off
+DRIFT_TRIGGER_LOCK_PATH = os.getenv("DRIFT_TRIGGER_LOCK_PATH", "data/drift_retrain.lock")
+
+ONLINE_KS_STAT = Gauge("online_drift_ks_stat", "KS statistic of live inputs vs. reference", ["column"])
+ONLINE_P_VALUE = Gauge("online_drift_p_value", "KS p-value of live inputs vs. reference", ["column"])
+ONLINE_PSI = Gauge("online_drift_psi", "Population stability index of live inputs", ["column"])
+ONLINE_WASSERSTEIN = Gauge("online_drift_wasserstein", "Std-normalized Wasserstein distance of live inputs", ["column"])
+ONLINE_DATASET_DRIFT = Gauge("online_drift_detected", "1 if the live input window is drifted")
+ONLINE_DRIFT_SHARE = Gauge("online_drift_share_drifted_columns", "Share of drifted input columns")
+ONLINE_WINDOW_SIZE = Gauge("online_drift_window_size", "Live observations in the drift window")
+RETRAIN_TRIGGERS = Counter("online_drift_retrain_triggers_total", "Retrain runs launched by online drift")
+
+class ShardedAccumulator:
+    """Per-thread bounded deques; `record` is a lock-free append on the caller's shard."""
+
+    def __init__(self, capacity=SHARD_CAPACITY):
+        self.capacity = capacity
+        self._local = threading.local()
+        self._shards = []
+        self._register_lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = deque(maxlen=self.capacity)
+            with self._register_lock:  # Once per thread
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def record(self, row):
+        self._shard().append(row)
+
+    def record_many(self, rows):
+        self._shard().extend(rows)
+
+    def drain(self):
+        """Pops everything recorded so far (deque.popleft is thread-safe)."""
+        with self._register_lock:
+            shards = list(self._shards)
+        rows = []
+        for shard in shards:
+            for _ in range(len(shard)):
+                try:
+                    rows.append(shard.popleft())
+                except IndexError:
+                    break
+        return rows
+
+class OnlineDriftMonitor:
+    """Windowed drift scores over live inputs, with a retrain trigger."""
+
+    def __init__(self, profile, window_size=ONLINE_DRIFT_WINDOW, retrain_command=DRIFT_RETRAIN_COMMAND):
+        self.profile = profile
+        self.columns = profile.columns
+        self.engine = DriftEngine(profile, window_size)
+        self.accumulator = ShardedAccumulator()
+        self.retrain_command = retrain_command
+        self.last_result = None
+        self._consecutive = 0
+        self._last_trigger = None
+        self._retrain_process = None
+        self._lock_file = None  # Held while our retrain runs; other workers skip their trigger
+        self._stop = threading.Event()
+        self._worker = None
+
+    def record(self, *values):
+        """Hot path: one observation, in `self.columns` order."""
+        self.accumulator.record(values)
+
+    def record_many(self, rows):
+        self.accumulator.record_many(rows)
+
+    def start(self, interval=ONLINE_DRIFT_INTERVAL_S):
+        if self._worker is not None:
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, args=(interval,), name="online-drift", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+            self._worker = None
+        self._release_trigger_lock()
+
+    def evaluate(self):
+        """Drains new observations, refreshes the scores and gauges. Returns the result or None."""
+        rows = self.accumulator.drain()
+        if rows:
+            self.engine.update(rows)
+        ONLINE_WINDOW_SIZE.set(len(self.engine.window))
+        if len(self.engine.window) < ONLINE_DRIFT_MIN_SAMPLES:
+            return None
+
+        result = self.engine.check()
+        for col, stats in result["columns"].items():
+            ONLINE_KS_STAT.labels(col).set(stats["ks_stat"])
+            ONLINE_P_VALUE.labels(col).set(stats["p_value"])
+            ONLINE_PSI.labels(col).set(stats["psi"])
+            ONLINE_WASSERSTEIN.labels(col).set(stats["wasserstein"])
+        ONLINE_DATASET_DRIFT.set(1 if result["dataset_drift"] else 0)
+        ONLINE_DRIFT_SHARE.set(result["share_drifted_columns"])
+        self.last_result = result
+
+        self._consecutive = self._consecutive + 1 if result["dataset_drift"] else 0
+        if self._consecutive >= DRIFT_TRIGGER_CONSECUTIVE:
+            self._maybe_trigger_retrain()
+        return result
+
+    def _release_trigger_lock(self):
+        if self._lock_file is not None:
+            self._lock_file.close()  # Closing drops the flock
+            self._lock_file = None
+
+    def _acquire_trigger_lock(self):
+        """
+        Takes the host-wide trigger lock without waiting. Returns False when
+        another worker holds it (its retrain is running) or the shared
+        cooldown since the last launch by any worker has not passed.
+        """
+        os.makedirs(os.path.dirname(DRIFT_TRIGGER_LOCK_PATH) or ".", exist_ok=True)
+        lock_file = open(DRIFT_TRIGGER_LOCK_PATH, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        try:
+            last_launch = float(lock_file.read().strip() or 0)
+        except ValueError:
+            last_launch = 0.0
+        if time.time() - last_launch < DRIFT_TRIGGER_COOLDOWN_S:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _maybe_trigger_retrain(self):
+        if not self.retrain_command:
+            return
+        if self._retrain_process is not None:
+            if self._retrain_process.poll() is None:
+                return  # Previous run still going
+            self._retrain_process = None
+            self._release_trigger_lock()
+        now = time.monotonic()
+        if self._last_trigger is not None and now - self._last_trigger < DRIFT_TRIGGER_COOLDOWN_S:
+            return
+        if not self._acquire_trigger_lock():
+            return
+
+        print(f"🚨 Live input drift persisted for {self._consecutive} checks. Launching: {self.retrain_command}")
+        try:
+            self._retrain_process = subprocess.Popen(shlex.split(self.retrain_command))
+            self._last_trigger = now
+            self._lock_file.seek(0)
+            self._lock_file.truncate()
+            self._lock_file.write(f"{time.time()}\n")
+            self._lock_file.flush()
+            RETRAIN_TRIGGERS.inc()
+        except Exception as e:
+            print(f"✗ Failed to launch retraining: {e}")
+            self._release_trigger_lock()
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.evaluate()
+            except Exception as e:
+                print(f"⚠ Online drift evaluation failed: {e}")
@@ -0,0 +1,189 @@
+# src/drift/stats.py
+"""
+Lightweight drift statistics in pure NumPy.
+
+A ReferenceProfile summarizes the baseline data once: a quantile sketch,
+histogram bins and counts, and the standard deviation per column. It is
+persisted, so later checks never reread the reference rows. A
+RollingWindow holds the current observations. DriftEngine compares the
+two per column with a KS test, PSI and the Wasserstein distance in well
+under a millisecond for typical window sizes.
+
+The decision rule mirrors Evidently's DataDriftPreset defaults for
+numerical columns. A column drifts when the KS p-value is below
+KS_P_VALUE_THRESHOLD. The dataset drifts when at least DRIFT_SHARE of the
+columns drift.
+"""
+import os
+import threading
+import numpy as np
+
+# CONFIG
+N_QUANTILES = 101
+N_BINS = 10
+KS_P_VALUE_THRESHOLD = 0.05
+DRIFT_SHARE = 0.5
+PSI_EPS = 1e-4
+
+_KS_TERMS = np.arange(1, 101)
+_KS_SIGNS = (-1.0) ** (_KS_TERMS - 1)
+
+def ks_p_value(d, n, m):
+    """Asymptotic two-sample KS p-value for statistic `d` with sample sizes n and m."""
+    en = np.sqrt(n * m / (n + m))
+    lam = (en + 0.12 + 0.11 / en) * d
+    if lam < 1e-3:
+        return 1.0
+    p = 2 * np.sum(_KS_SIGNS * np.exp(-2 * (_KS_TERMS * lam) ** 2))
+    return min(max(float(p), 0.0), 1.0)
+
+class ReferenceProfile:
+    """Per-column summary of the reference distribution."""
+
+    PROBS = np.linspace(0, 1, N_QUANTILES)
+
+    def __init__(self, columns, quantiles, bin_edges, bin_fractions, std, n):
+        self.columns = list(columns)
+        self.quantiles = quantiles          # (n_cols, N_QUANTILES), at PROBS
+        self.bin_edges = bin_edges          # (n_cols, N_BINS + 1)
+        self.bin_fractions = bin_fractions  # (n_cols, N_BINS)
+        self.std = std                      # (n_cols,)
+        self.n = int(n)
+
+    @classmethod
+    def from_data(cls, data, columns):
+        """Builds the profile from a (n_rows, n_cols) array of reference values."""
+        data = np.asarray(data, dtype=np.float64)
+        quantiles = np.quantile(data, cls.PROBS, axis=0).T
+        # Quantile-based bins: every bin holds ~1/N_BINS of the reference mass
+        bin_edges = np.quantile(data, np.linspace(0, 1, N_BINS + 1), axis=0).T
+        bin_fractions = np.stack([
+            _histogram(data[:, i], bin_edges[i]) for i in range(data.shape[1])
+        ])
+        return cls(columns, quantiles, bin_edges, bin_fractions, data.std(axis=0), len(data))
+
+    def select(self, columns):
+        """Profile restricted to a subset of columns (e.g. only request features)."""
+        idx = [self.columns.index(c) for c in columns]
+        return ReferenceProfile(
+            columns, self.quantiles[idx], self.bin_edges[idx],
+            self.bin_fractions[idx], self.std[idx], self.n,
+        )
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path, columns=np.array(self.columns), quantiles=self.quantiles,
+            bin_edges=self.bin_edges, bin_fractions=self.bin_fractions,
+            std=self.std, n=self.n,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(
+                f["columns"].tolist(), f["quantiles"], f["bin_edges"],
+                f["bin_fractions"], f["std"], int(f["n"]),
+            )
+
+def _histogram(values, edges):
+    """Bin fractions with open-ended outer bins, so out-of-range values still count."""
+    idx = np.searchsorted(edges[1:-1], values, side="right")
+    counts = np.bincount(idx, minlength=len(edges) - 1)
+    return counts / max(len(values), 1)
+
+class RollingWindow:
+    """Fixed-size ring buffer of the most recent observations."""
+
+    def __init__(self, size, n_cols):
+        self.size = size
+        self._buffer = np.empty((size, n_cols), dtype=np.float64)
+        self._head = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)[-self.size:]
+        n = len(values)
+        if n == 0:
+            return
+        with self._lock:
+            idx = (self._head + np.arange(n)) % self.size
+            self._buffer[idx] = values
+            self._head = (self._head + n) % self.size
+            self._count = min(self.size, self._count + n)
+
+    def values(self):
+        with self._lock:
+            if self._count < self.size:
+                return self._buffer[:self._count].copy()
+            return np.concatenate((self._buffer[self._head:], self._buffer[:self._head]))
+
+def column_stats(profile, i, current):
+    """KS statistic/p-value, PSI and Wasserstein distance of `current` vs. column i."""
+    current = np.sort(current)
+    m = len(current)
+    ref_q = profile.quantiles[i]
+    probs = ReferenceProfile.PROBS
+
+    # KS: compare ECDFs at the current points and at the reference quantiles
+    ref_cdf_at_cur = np.interp(current, ref_q, probs, left=0.0, right=1.0)
+    steps = np.arange(1, m + 1) / m
+    d_cur = np.max(np.maximum(np.abs(steps - ref_cdf_at_cur), np.abs(steps - 1 / m - ref_cdf_at_cur)))
+    cur_cdf_at_ref = np.searchsorted(current, ref_q, side="right") / m
+    d_ref = np.max(np.abs(cur_cdf_at_ref - probs))
+    ks_stat = float(max(d_cur, d_ref))
+
+    # PSI over the reference's quantile bins
+    ref_frac = np.maximum(profile.bin_fractions[i], PSI_EPS)
+    cur_frac = np.maximum(_histogram(current, profile.bin_edges[i]), PSI_EPS)
+    psi = float(np.sum((cur_frac - ref_frac) * np.log(cur_frac / ref_frac)))
+
+    # Wasserstein-1 from quantile functions, normalized by the reference std
+    # (linear-interpolated quantiles of the already sorted window)
+    cur_q = np.interp(probs * (m - 1), np.arange(m), current)
+    wasserstein = float(np.mean(np.abs(cur_q - ref_q)) / max(profile.std[i], 1e-12))
+
+    return {
+        "ks_stat": ks_stat,
+        "p_value": ks_p_value(ks_stat, profile.n, m),
+        "psi": psi,
+        "wasserstein": wasserstein,
+    }
+
+class DriftEngine:
+    """Compares a rolling current window against a persisted ReferenceProfile."""
+
+    def __init__(self, profile, window_size):
+        self.profile = profile
+        self.window = RollingWindow(window_size, len(profile.columns))
+
+    def update(self, values):
+        """Adds (n, n_cols) observations, in the profile's column order."""
+        self.window.extend(values)
+
+    def check(self, p_threshold=KS_P_VALUE_THRESHOLD, drift_share=DRIFT_SHARE):
+        current = self.window.values()
+        if len(current) == 0:
+            raise ValueError("No current observations to compare")
+
+        columns = {}
+        for i, col in enumerate(self.profile.columns):
+            stats = column_stats(self.profile, i, current[:, i])
+            stats["drifted"] = bool(stats["p_value"] < p_threshold)
+            columns[col] = stats
+
+        n_drifted = sum(c["drifted"] for c in columns.values())
+        share = n_drifted / len(columns)
+        return {
+            "dataset_drift": share >= drift_share,
+            "share_drifted_columns": share,
+            "n_current": len(current),
+            "n_reference": self.profile.n,
+            "columns": columns,
+        }
@@ -0,0 +1,139 @@
+# src/models/export.py
+"""
+Optimized inference artifacts for DemandLSTM.
+
+The trainer exports the fitted model next to its state dict in every
+runtime listed in EXPORT_RUNTIMES. The API loads the one selected by
+MODEL_RUNTIME:
+
+    eager             state dict loaded into DemandLSTM (the reference)
+    torchscript       torch.jit.script of the fp32 model
+    torchscript_int8  LSTM and Linear layers dynamically quantized to int8, then scripted
+    onnx              ONNX graph executed by onnxruntime (optional dependency)
+    numpy             weights in an .npz run by NumpyLSTM, which also steps one time step at a time
+
+torch is imported only when a torch runtime is loaded or exported, so an
+onnx or numpy deployment never pays its import time or memory.
+"""
+import os
+
+from src.models.lstm_numpy import NumpyLSTM
+from src.models.windows import LOOKBACK_WINDOW, N_FEATURES
+
+# CONFIG
+RUNTIMES = ("eager", "torchscript", "torchscript_int8", "onnx", "numpy")
+EXPORT_RUNTIMES = [
+    r.strip() for r in os.getenv("EXPORT_RUNTIMES", "torchscript,torchscript_int8,onnx,numpy").split(",") if r.strip()
+]
+ONNX_OPSET = 17
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))  # 0 keeps onnxruntime's default
+
+# Exported files sit next to the state dict: model.pt -> model.ts.pt, model.int8.ts.pt, model.onnx, model.npz
+RUNTIME_SUFFIXES = {
+    "torchscript": ".ts.pt",
+    "torchscript_int8": ".int8.ts.pt",
+    "onnx": ".onnx",
+    "numpy": ".npz",
+}
+
+def runtime_path(model_path, runtime):
+    """Path of `runtime`'s artifact for the state dict at `model_path`."""
+    if runtime == "eager":
+        return model_path
+    return os.path.splitext(model_path)[0] + RUNTIME_SUFFIXES[runtime]
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of the LSTM and Linear weights (returns a copy)."""
+    import torch
+    import torch.nn as nn
+
+    return torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+def _export_onnx(model, path):
+    import torch
+
+    example = torch.zeros(1, LOOKBACK_WINDOW, N_FEATURES)
+    torch.onnx.export(
+        model, (example,), path,
+        input_names=["windows"], output_names=["demand"],
+        dynamic_axes={"windows": {0: "batch"}, "demand": {0: "batch"}},
+        opset_version=ONNX_OPSET,
+        dynamo=False,
+    )
+
+def export_model(model, model_path, runtimes=EXPORT_RUNTIMES):
+    """
+    Writes the artifact of each runtime in `runtimes` next to `model_path`.
+
+    Returns {runtime: path} for the artifacts that were written. A runtime
+    that fails to export (e.g. the onnx package is not installed) is skipped
+    with a warning, and any stale artifact it left from an earlier run is
+    removed, so a loader never picks up weights from another model.
+    """
+    import torch
+
+    model.eval()
+    written = {}
+    for runtime in runtimes:
+        if runtime == "eager":
+            continue
+        if runtime not in RUNTIME_SUFFIXES:
+            raise ValueError(f"Unknown runtime '{runtime}'. Use one of {RUNTIMES}")
+
+        path = runtime_path(model_path, runtime)
+        tmp_path = path + ".tmp"
+        try:
+            if runtime == "onnx":
+                _export_onnx(model, tmp_path)
+            elif runtime == "numpy":
+                NumpyLSTM.from_state_dict(model.state_dict()).save(tmp_path)
+            else:
+                source = quantize_int8(model) if runtime == "torchscript_int8" else model
+                torch.jit.save(torch.jit.script(source), tmp_path)
+            os.replace(tmp_path, path)
+            written[runtime] = path
+        except Exception as e:
+            print(f"⚠ Skipping {runtime} export: {e}")
+            for stale in (tmp_path, path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+    return written
+
+class OnnxModel:
+    """onnxruntime session; takes and returns NumPy arrays instead of tensors."""
+
+    def __init__(self, path, intra_op_threads=ONNX_INTRA_OP_THREADS):
+        import onnxruntime as ort  # Optional: only needed for MODEL_RUNTIME=onnx
+
+        options = ort.SessionOptions()
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, windows):
+        return self.session.run(None, {self.input_name: windows})[0]
+
+def load_runtime_model(model_path, runtime="eager"):
+    """Loads the `runtime` artifact belonging to the state dict at `model_path`, ready for inference."""
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown runtime '{runtime}'. Use one of {RUNTIMES}")
+    path = runtime_path(model_path, runtime)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No {runtime} artifact at {path}")
+
+    if runtime == "onnx":
+        return OnnxModel(path)
+    if runtime == "numpy":
+        return NumpyLSTM.load(path)
+
+    import torch
+    from src.models.lstm import DemandLSTM
+
+    if runtime == "eager":
+        model = DemandLSTM(input_size=N_FEATURES, hidden_size=50)
+        model.load_state_dict(torch.load(path, weights_only=True))
+    else:
+        model = torch.jit.load(path)
+    model.eval()
+    return model
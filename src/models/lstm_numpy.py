@@ -0,0 +1,102 @@
+# src/models/lstm_numpy.py
+"""
+DemandLSTM's forward pass in NumPy, exposed one time step at a time.
+
+Serving feeds the same LOOKBACK_WINDOW - 1 history rows, followed by one
+request row, to the model on every call. Running the LSTM step by step
+makes the state after that shared prefix reusable. `encode` computes it
+once per (model version, history watermark), and `advance` then costs one
+step per request. `rollout` continues the same state through several
+future inputs for multi-step forecasts.
+
+The math is nn.LSTM's (gate order i, f, g, o; both biases) followed by the
+Linear head, in float32. Weights come from the state dict, and no torch
+import is needed to load them from the exported ``.npz``.
+"""
+import numpy as np
+
+def _sigmoid(x):
+    return 0.5 * (1.0 + np.tanh(0.5 * x))  # Same as 1 / (1 + e^-x), without overflow warnings
+
+class NumpyLSTM:
+    """Single-layer LSTM + Linear head from a DemandLSTM state dict."""
+
+    WEIGHT_NAMES = ("lstm.weight_ih_l0", "lstm.weight_hh_l0", "lstm.bias_ih_l0", "lstm.bias_hh_l0",
+                    "fc.weight", "fc.bias")
+
+    def __init__(self, weights):
+        self.weights = {name: np.asarray(weights[name], dtype=np.float32) for name in self.WEIGHT_NAMES}
+        self.hidden_size = H = self.weights["lstm.weight_hh_l0"].shape[1]
+        # Reorder torch's (i, f, g, o) gate blocks to (i, f, o, g): one sigmoid over 3H columns, one tanh over H
+        order = np.r_[0:2 * H, 3 * H:4 * H, 2 * H:3 * H]
+        self.w_ih = np.ascontiguousarray(self.weights["lstm.weight_ih_l0"][order].T)  # (features, 4H)
+        self.w_hh = np.ascontiguousarray(self.weights["lstm.weight_hh_l0"][order].T)  # (H, 4H)
+        self.bias = (self.weights["lstm.bias_ih_l0"] + self.weights["lstm.bias_hh_l0"])[order]
+        self.w_fc = np.ascontiguousarray(self.weights["fc.weight"].T)                  # (H, outputs)
+        self.b_fc = self.weights["fc.bias"]
+
+    @classmethod
+    def from_state_dict(cls, state_dict):
+        """Accepts torch tensors or arrays (e.g. ``model.state_dict()``)."""
+        return cls({name: (v.detach().cpu().numpy() if hasattr(v, "detach") else v)
+                    for name, v in state_dict.items() if name in cls.WEIGHT_NAMES})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({name: data[name] for name in cls.WEIGHT_NAMES})
+
+    def save(self, path):
+        with open(path, 'wb') as f:  # A file object keeps np.savez from appending ".npz" to temp names
+            np.savez(f, **self.weights)
+
+    def initial_state(self, batch_size=1):
+        zeros = np.zeros((batch_size, self.hidden_size), dtype=np.float32)
+        return zeros, zeros.copy()
+
+    def _cell(self, projected, state):
+        """One step from the input projection ``x @ w_ih + bias`` of shape (B, 4H)."""
+        h, c = state
+        H = self.hidden_size
+        gates = projected + h @ self.w_hh
+        ifo = _sigmoid(gates[:, :3 * H])
+        c = ifo[:, H:2 * H] * c + ifo[:, :H] * np.tanh(gates[:, 3 * H:])
+        h = ifo[:, 2 * H:] * np.tanh(c)
+        return h, c
+
+    def step(self, x, state):
+        """Advances (h, c) by one time step. `x` is (B, features), the state rows are (B, H) or (1, H)."""
+        return self._cell(x.astype(np.float32, copy=False) @ self.w_ih + self.bias, state)
+
+    def encode(self, sequences, state=None):
+        """Runs (B, T, features) sequences from `state` (zeros by default). Returns the final (h, c)."""
+        if state is None:
+            state = self.initial_state(len(sequences))
+        # Input projections of every time step in one product; only h @ w_hh is sequential
+        projected = sequences.astype(np.float32, copy=False) @ self.w_ih + self.bias
+        for t in range(sequences.shape[1]):
+            state = self._cell(projected[:, t, :], state)
+        return state
+
+    def head(self, h):
+        """Linear head: (B, H) hidden states to (B, outputs) predictions."""
+        return h @ self.w_fc + self.b_fc
+
+    def advance(self, state, inputs):
+        """One step from a shared (1, H) state for each row of `inputs` (N, features). Returns (N,) predictions."""
+        h, _ = self.step(inputs, state)
+        return self.head(h)[:, 0]
+
+    def rollout(self, state, inputs):
+        """Feeds `inputs` (K, features) in order from `state`. Returns the (K,) prediction after each step."""
+        projected = inputs.astype(np.float32, copy=False) @ self.w_ih + self.bias
+        hidden = np.empty((len(inputs), self.hidden_size), dtype=np.float32)
+        for k in range(len(inputs)):
+            state = self._cell(projected[k:k + 1], state)
+            hidden[k] = state[0][0]
+        return self.head(hidden)[:, 0]
+
+    def __call__(self, windows):
+        """Full-window forward, like ``DemandLSTM(windows)``: (B, T, features) to (B, outputs)."""
+        h, _ = self.encode(windows)
+        return self.head(h)
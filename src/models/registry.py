@@ -0,0 +1,144 @@
+# src/models/registry.py
+"""
+Versioned, content-addressed store for model artifacts.
+
+Layout under REGISTRY_DIR:
+    versions/<version>/<artifact files> + manifest.json
+    CURRENT      JSON pointer: {"version": ..., "history": [previous versions, newest first]}
+
+A version id is the SHA-256 of the artifact contents, so publishing
+identical files twice is a no-op. Publishing is atomic. Files are written
+into a temporary directory, fsynced, and renamed into place. The CURRENT
+pointer is then replaced with os.replace. A reader therefore sees the old
+version or the new one, never a half-written file.
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime, timezone
+
+# CONFIG
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "src/models/registry")
+VERSION_ID_LENGTH = 12
+HISTORY_LENGTH = 20   # Rollback depth
+KEEP_VERSIONS = int(os.getenv("MODEL_REGISTRY_KEEP", "10"))
+
+# Artifact names inside a version directory
+MODEL_ARTIFACT = "model.pt"
+SCALER_ARTIFACT = "scaler.json"
+LEGACY_SCALER_ARTIFACT = "scaler.pkl"  # sklearn pickle in versions published before scaler.json
+
+# Per-entity models (src/training/train_entities.py) live in their own registry with the same layout
+ENTITY_REGISTRY_DIR = os.getenv("ENTITY_REGISTRY_DIR", "src/models/entity_registry")
+ENTITY_INDEX_ARTIFACT = "entities.json"  # {entity_id: {"model": artifact, "scalers": artifact}}
+
+def content_hash(paths):
+    """Version id for a {name: path} mapping of artifact files."""
+    digest = hashlib.sha256()
+    for name in sorted(paths):
+        digest.update(name.encode())
+        with open(paths[name], 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:VERSION_ID_LENGTH]
+
+def _fsync_write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _versions_dir(registry_dir):
+    return os.path.join(registry_dir, "versions")
+
+def version_dir(version, registry_dir=REGISTRY_DIR):
+    return os.path.join(_versions_dir(registry_dir), version)
+
+def artifact_path(version, name, registry_dir=REGISTRY_DIR):
+    return os.path.join(version_dir(version, registry_dir), name)
+
+def read_pointer(registry_dir=REGISTRY_DIR):
+    path = os.path.join(registry_dir, "CURRENT")
+    if not os.path.exists(path):
+        return {"version": None, "history": []}
+    with open(path) as f:
+        return json.load(f)
+
+def current_version(registry_dir=REGISTRY_DIR):
+    return read_pointer(registry_dir)["version"]
+
+def read_manifest(version, registry_dir=REGISTRY_DIR):
+    with open(artifact_path(version, "manifest.json", registry_dir)) as f:
+        return json.load(f)
+
+def _write_pointer(pointer, registry_dir):
+    path = os.path.join(registry_dir, "CURRENT")
+    tmp_path = path + ".tmp"
+    _fsync_write(tmp_path, json.dumps(pointer).encode())
+    os.replace(tmp_path, path)
+
+def promote(version, registry_dir=REGISTRY_DIR):
+    """Points CURRENT at an already published version."""
+    if not os.path.isdir(version_dir(version, registry_dir)):
+        raise FileNotFoundError(f"Unknown model version '{version}'")
+    pointer = read_pointer(registry_dir)
+    if pointer["version"] == version:
+        return
+    history = [pointer["version"]] + pointer["history"] if pointer["version"] else pointer["history"]
+    _write_pointer({"version": version, "history": history[:HISTORY_LENGTH]}, registry_dir)
+
+def publish(paths, metadata=None, registry_dir=REGISTRY_DIR, make_current=True):
+    """
+    Copies {name: path} artifact files into the registry as a new version.
+
+    Returns the version id. With `make_current=True` (the default), the
+    new version also becomes CURRENT.
+    """
+    version = content_hash(paths)
+    target = version_dir(version, registry_dir)
+
+    if not os.path.isdir(target):
+        os.makedirs(_versions_dir(registry_dir), exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=_versions_dir(registry_dir))
+        try:
+            for name, src in paths.items():
+                with open(src, 'rb') as f:
+                    _fsync_write(os.path.join(staging, name), f.read())
+            manifest = {
+                "version": version,
+                "files": sorted(paths),
+                "published_at": datetime.now(timezone.utc).isoformat(),
+                "metadata": metadata or {},
+            }
+            _fsync_write(os.path.join(staging, "manifest.json"), json.dumps(manifest).encode())
+            os.rename(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    if make_current:
+        promote(version, registry_dir)
+    _garbage_collect(registry_dir)
+    return version
+
+def rollback(registry_dir=REGISTRY_DIR):
+    """Re-promotes the previously current version. Returns it."""
+    pointer = read_pointer(registry_dir)
+    if not pointer["history"]:
+        raise ValueError("No previous model version to roll back to")
+    previous, rest = pointer["history"][0], pointer["history"][1:]
+    _write_pointer({"version": previous, "history": rest}, registry_dir)
+    return previous
+
+def _garbage_collect(registry_dir):
+    """Deletes the oldest versions beyond KEEP_VERSIONS, except those CURRENT/history still reference."""
+    pointer = read_pointer(registry_dir)
+    referenced = {pointer["version"], *pointer["history"]}
+    root = _versions_dir(registry_dir)
+    versions = [v for v in os.listdir(root) if not v.startswith(".")]
+    versions.sort(key=lambda v: os.path.getmtime(os.path.join(root, v)), reverse=True)
+    for version in versions[KEEP_VERSIONS:]:
+        if version not in referenced:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
@@ -0,0 +1,93 @@
+# src/models/scaler.py
+"""
+Min-max scaling parameters stored as plain JSON.
+
+`FeatureScaler` uses the same math and attribute names as sklearn's
+`MinMaxScaler` (feature_range=(0, 1)): data_min_, data_max_, scale_, min_.
+Serving code is therefore unchanged. Loading the scaler needs only NumPy:
+no sklearn import and no unpickling. Legacy `scaler.pkl` files are still
+readable through `load_scaler`.
+"""
+import os
+import json
+import numpy as np
+
+from src.models.windows import TRAINING_COLUMNS
+
+class FeatureScaler:
+    """Per-column min-max scaler to [0, 1] over TRAINING_COLUMNS."""
+
+    def __init__(self, data_min=None, data_max=None, n_samples_seen=0, columns=TRAINING_COLUMNS):
+        self.columns = list(columns)
+        self.n_samples_seen_ = int(n_samples_seen)
+        if data_min is not None:
+            self._set_range(np.asarray(data_min, dtype=np.float64), np.asarray(data_max, dtype=np.float64))
+
+    def _set_range(self, data_min, data_max):
+        self.data_min_ = data_min
+        self.data_max_ = data_max
+        data_range = data_max - data_min
+        # Constant columns scale by 1 instead of dividing by zero (as sklearn does)
+        data_range = np.where(data_range < 10 * np.finfo(np.float64).eps, 1.0, data_range)
+        self.scale_ = 1.0 / data_range
+        self.min_ = -data_min * self.scale_
+
+    def fit(self, X):
+        self.n_samples_seen_ = 0
+        return self.partial_fit(X)
+
+    def partial_fit(self, X):
+        """Widens the fitted min/max with the rows of `X`."""
+        X = np.asarray(X, dtype=np.float64)
+        data_min, data_max = np.nanmin(X, axis=0), np.nanmax(X, axis=0)
+        if self.n_samples_seen_:
+            data_min = np.minimum(self.data_min_, data_min)
+            data_max = np.maximum(self.data_max_, data_max)
+        self._set_range(data_min, data_max)
+        self.n_samples_seen_ += len(X)
+        return self
+
+    def transform(self, X):
+        return X * self.scale_ + self.min_
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+    def inverse_transform(self, X):
+        return (X - self.min_) / self.scale_
+
+    def to_dict(self):
+        return {
+            "columns": self.columns,
+            "data_min": self.data_min_.tolist(),
+            "data_max": self.data_max_.tolist(),
+            "n_samples_seen": self.n_samples_seen_,
+        }
+
+    @classmethod
+    def from_dict(cls, params):
+        return cls(params["data_min"], params["data_max"], params["n_samples_seen"], params["columns"])
+
+    def save(self, path):
+        """Writes the parameters as JSON (temp file + rename, so readers never see a partial file)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def from_sklearn(cls, scaler, columns=TRAINING_COLUMNS):
+        return cls(scaler.data_min_, scaler.data_max_, scaler.n_samples_seen_, columns)
+
+def load_scaler(path):
+    """Loads a JSON scaler, or converts a legacy sklearn pickle (imports sklearn)."""
+    if path.endswith(".pkl"):
+        import pickle
+        with open(path, 'rb') as f:
+            return FeatureScaler.from_sklearn(pickle.load(f))
+    return FeatureScaler.load(path)
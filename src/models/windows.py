@@ -0,0 +1,78 @@
+# src/models/windows.py
+"""
+Single source of truth for the model's input layout.
+
+Training and serving both build `(batch, LOOKBACK_WINDOW, N_FEATURES)`
+windows through this module, so column order and window length cannot
+diverge between the two.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# CONFIG
+LOOKBACK_WINDOW = 30
+FEATURE_COLUMNS = ["temperature", "humidity"]
+TARGET_COLUMN = "demand"
+TRAINING_COLUMNS = FEATURE_COLUMNS + [TARGET_COLUMN]  # Layout of the fitted scaler
+N_FEATURES = len(FEATURE_COLUMNS)
+TARGET_INDEX = TRAINING_COLUMNS.index(TARGET_COLUMN)
+
+def sliding_windows(data, seq_length=LOOKBACK_WINDOW):
+    """
+    Returns every length-`seq_length` window of the rows of `data`.
+
+    `data` has shape (N, F). The result has shape (N - seq_length + 1,
+    seq_length, F) and is a read-only strided view of `data`, so no rows are
+    copied.
+    """
+    return sliding_window_view(data, seq_length, axis=0).transpose(0, 2, 1)
+
+def create_sequences(data, seq_length=LOOKBACK_WINDOW):
+    """
+    Splits a scaled (N, len(TRAINING_COLUMNS)) array into model inputs and targets.
+
+    X[i] holds the feature columns of rows i .. i+seq_length-1 and y[i] is
+    the target of row i+seq_length. Both are views into `data`.
+    """
+    X = sliding_windows(data[:-1, :N_FEATURES], seq_length)
+    y = data[seq_length:, TARGET_INDEX]
+    return X, y
+
+def stack_request_windows(history, inputs):
+    """
+    Builds one window per request row from a shared, already-scaled history.
+
+    `history` is (LOOKBACK_WINDOW - 1, N_FEATURES) and oldest first, and
+    `inputs` is (N, N_FEATURES). Returns a contiguous float32
+    (N, LOOKBACK_WINDOW, N_FEATURES) array.
+    """
+    windows = np.empty((len(inputs), LOOKBACK_WINDOW, N_FEATURES), dtype=np.float32)
+    windows[:, :-1, :] = history
+    windows[:, -1, :] = inputs
+    return windows
+
+class WindowDataset:
+    """
+    Lazily indexed training windows over a scaled (N, len(TRAINING_COLUMNS)) array.
+
+    Only the base array is kept in memory. Each item is cut out of it on
+    access, so the N x seq_length copy of every window is never built.
+
+    This is a map-style dataset (DataLoader only needs __len__ and
+    __getitem__). It does not subclass torch's Dataset, so serving code and
+    the drift monitor can import this module without loading torch.
+    """
+
+    def __init__(self, data, seq_length=LOOKBACK_WINDOW):
+        import torch
+
+        self.data = torch.from_numpy(np.ascontiguousarray(data, dtype=np.float32))
+        self.seq_length = seq_length
+
+    def __len__(self):
+        return max(0, len(self.data) - self.seq_length)
+
+    def __getitem__(self, idx):
+        x = self.data[idx:idx + self.seq_length, :N_FEATURES]
+        y = self.data[idx + self.seq_length, TARGET_INDEX:TARGET_INDEX + 1]
+        return x, y
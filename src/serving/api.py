@@ -1,126 +1,491 @@
 # src/serving/api.py
 import sys
 import os
-import pickle
-import torch
-import pandas as pd
+import queue
+import concurrent.futures
+import importlib.util
 import numpy as np
-from fastapi import FastAPI, HTTPException
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
+from prometheus_client import Counter
 from prometheus_fastapi_instrumentator import Instrumentator
 
+# Optional: only needed for format=arrow on /predict_batch, imported on first use
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
 # Add project root to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 
-from src.models.lstm import DemandLSTM
-from src.database.db import load_data
+from src.database.db import dispose_engine
+from src.models import registry
+from src.serving.inference import (
+    MIN_DATA_REQUIRED, MODEL_RUNTIME, STEPPER_RUNTIMES, build_windows, forward_batch, inverse_scale_demand,
+    scale_features,
+)
+from src.serving.hot_swap import ModelHolder
+from src.serving.history_cache import HistoryWindow, EntityHistories
+from src.serving.batcher import MicroBatcher, BATCHING_ENABLED, BATCH_TIMEOUT_S
+from src.serving.prediction_cache import PredictionCache, PREDICTION_CACHE_ENABLED
+from src.serving.entity_models import EntityModels
+from src.serving.prefix_state import PrefixState, PREFIX_STATE_ENABLED, forecast_inputs
+from src.serving.prediction_log import PredictionLog, PREDICTION_LOG_ENABLED
+from src.models.windows import FEATURE_COLUMNS
+from src.drift.monitor import load_reference_profile
+from src.drift.online import OnlineDriftMonitor, ONLINE_DRIFT_ENABLED
+from src.telemetry import profiler
+from src.telemetry.stages import StageTimer
 
 # CONFIG
-MODEL_PATH = "src/models/production_model.pt"
-SCALER_PATH = "src/models/scaler.pkl"
-LOOKBACK_WINDOW = 30
-MIN_DATA_REQUIRED = LOOKBACK_WINDOW - 1
 TEMP_MIN, TEMP_MAX = 15, 35
 HUMIDITY_MIN, HUMIDITY_MAX = 30, 90
+MAX_BATCH_SCENARIOS = int(os.getenv("MAX_BATCH_SCENARIOS", "10000"))
+BATCH_RESPONSE_FORMATS = ("json", "binary", "arrow")
 
 app = FastAPI(title="Drift-Aware Demand Forecaster")
 Instrumentator().instrument(app).expose(app)
 
+OUT_OF_RANGE_INPUTS = Counter(
+    "predict_inputs_out_of_range_total", "Request features outside their typical range", ["feature"]
+)
+
+PREDICT_STAGES = StageTimer("predict")
+BATCH_STAGES = StageTimer("predict_batch")
+FORECAST_STAGES = StageTimer("forecast")
+ENTITY_STAGES = StageTimer("predict_entity")
+
 # Global variables
-model = None
-scaler = None
-model_loaded = False
+models = ModelHolder()  # Served (version, model, scaler); hot-swapped from the registry
+history_cache = HistoryWindow(size=MIN_DATA_REQUIRED)
+batcher = None
+online_drift = None
+prediction_cache = PredictionCache() if PREDICTION_CACHE_ENABLED else None
+entity_models = EntityModels()  # Per-entity models from the entity registry, loaded on demand
+entity_histories = EntityHistories(size=MIN_DATA_REQUIRED)  # Per-entity history windows, loaded on demand
+prefix_state = PrefixState()  # LSTM state after the history window, per (model version, watermark)
+prediction_log = None  # Write-behind log of served predictions (PREDICTION_LOG_ENABLED)
 
-class WeatherRequest(BaseModel):
+class Scenario(BaseModel):
     temperature: float
     humidity: float
 
+class WeatherRequest(Scenario):
+    entity_id: Optional[str] = None  # Forecast with this entity's model and history instead of the global series
+
+class BatchWeatherRequest(BaseModel):
+    scenarios: List[Scenario]
+
 @app.on_event("startup")
 def load_artifacts():
-    global model, scaler, model_loaded
+    global batcher, online_drift, prediction_log
     print("Loading model artifacts...")
     try:
-        if not os.path.exists(MODEL_PATH):
-            raise FileNotFoundError(f"Model not found at {MODEL_PATH}. Run training first.")
-        if not os.path.exists(SCALER_PATH):
-            raise FileNotFoundError(f"Scaler not found at {SCALER_PATH}. Run training first.")
-        
-        with open(SCALER_PATH, 'rb') as f:
-            scaler = pickle.load(f)
-        model = DemandLSTM(input_size=2, hidden_size=50)
-        model.load_state_dict(torch.load(MODEL_PATH, weights_only=True))
-        model.eval()
-        model_loaded = True
-        print("✓ System Ready! Model artifacts loaded successfully.")
+        models.reload()
+        print(f"✓ System Ready! Model {models.bundle.version} ({models.bundle.runtime}) loaded successfully.")
     except FileNotFoundError as fe:
         print(f"✗ Start-up failed: {fe}")
-        model_loaded = False
     except Exception as e:
         print(f"✗ Start-up failed: {e}")
-        model_loaded = False
+    # Picks up newly published versions (and recovers from a failed start-up)
+    models.start_watching()
+
+    try:
+        entity_models.refresh()
+    except Exception as e:
+        print(f"⚠ Entity models not loaded: {e}")
+
+    # Warm the history window; if Postgres is unreachable the first request retries
+    try:
+        rows = history_cache.load()
+        print(f"✓ History window loaded ({rows} rows, watermark: {history_cache.high_water_mark})")
+    except Exception as e:
+        print(f"⚠ History window not loaded: {e}")
+    history_cache.start_polling()
+
+    if BATCHING_ENABLED and PREFIX_STATE_ENABLED and MODEL_RUNTIME in STEPPER_RUNTIMES:
+        # Every /predict takes the one-step prefix-state path, so a batcher would never see a request
+        print(f"⚠ Micro-batching not started: /predict steps from the prefix state on the '{MODEL_RUNTIME}' runtime. "
+              "Set PREFIX_STATE_ENABLED=0 to batch full-window forwards instead")
+    elif BATCHING_ENABLED:
+        batcher = MicroBatcher(forward_batch)
+        batcher.start()
+        print(f"✓ Micro-batching enabled (max batch {batcher.max_batch_size}, max wait {batcher.max_wait * 1e6:.0f}µs)")
+
+    if ONLINE_DRIFT_ENABLED:
+        try:
+            # Read-only: the profile is built and persisted by the drift monitor, never by the API
+            profile = load_reference_profile(build_missing=False).select(FEATURE_COLUMNS)
+            online_drift = OnlineDriftMonitor(profile)
+            online_drift.start()
+            print("✓ Online drift monitoring enabled on live request features")
+        except Exception as e:
+            print(f"⚠ Online drift monitoring disabled: {e}")
+
+    if PREDICTION_LOG_ENABLED:
+        try:
+            prediction_log = PredictionLog()
+            prediction_log.start()
+            print(f"✓ Prediction log enabled ({prediction_log.overflow} on overflow)")
+        except Exception as e:
+            print(f"⚠ Prediction log disabled: {e}")
+
+@app.on_event("shutdown")
+def stop_background_tasks():
+    models.stop_watching()
+    history_cache.stop_polling()
+    if batcher is not None:
+        batcher.stop()
+    if online_drift is not None:
+        online_drift.stop()
+    if prediction_log is not None:
+        prediction_log.stop()  # Flushes what is still queued; needs the engine, so before disposing it
+    dispose_engine()
+
+@app.post("/history/refresh")
+def refresh_history(full: bool = False):
+    """Invalidation hook for writers of the `features` table (`full` also drops the per-entity windows)."""
+    try:
+        if full:
+            entity_histories.clear()
+        added = history_cache.load() if full else history_cache.refresh()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"History refresh failed: {str(e)}")
+    return {
+        "rows_added": added,
+        "window_size": len(history_cache),
+        "high_water_mark": str(history_cache.high_water_mark),
+    }
+
+@app.get("/model")
+def model_info():
+    """Served model version and its registry manifest, if any."""
+    bundle = models.bundle
+    if bundle is None:
+        raise HTTPException(status_code=503, detail="Model not loaded. Check logs.")
+    manifest = None
+    if os.path.isdir(registry.version_dir(bundle.version)):
+        manifest = registry.read_manifest(bundle.version)
+    return {
+        "model_version": bundle.version,
+        "runtime": bundle.runtime,
+        "prefix_state": bundle.stepper is not None and PREFIX_STATE_ENABLED,  # One-step serving from cached state
+        "batching": batcher is not None,  # Micro-batcher running (never alongside the prefix-state path)
+        "registry": registry.read_pointer(),
+        "manifest": manifest,
+        "entity_models": {"version": entity_models.version, "entities": len(entity_models)},
+    }
+
+@app.post("/model/reload")
+def reload_model():
+    """Swaps in the registry's CURRENT version now instead of waiting for the watcher."""
+    try:
+        swapped = models.reload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {str(e)}")
+    return {"model_version": models.bundle.version, "swapped": swapped}
+
+@app.post("/model/rollback")
+def rollback_model():
+    """Re-promotes the previously published version and serves it."""
+    try:
+        version = models.rollback()
+    except ValueError as ve:
+        raise HTTPException(status_code=409, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Rollback failed: {str(e)}")
+    return {"model_version": version}
+
+def predict_entity(request):
+    """/predict for one series of a multi-series deployment (no batching, result cache or online drift)."""
+    try:
+        with ENTITY_STAGES.stage("model"):
+            try:
+                version, model, scaler = entity_models.get(request.entity_id)
+            except KeyError:
+                raise HTTPException(status_code=404, detail=f"No model for entity '{request.entity_id}'")
+
+        with ENTITY_STAGES.stage("history"):
+            _, history_data = entity_histories.get_versioned(request.entity_id)
+        if len(history_data) < MIN_DATA_REQUIRED:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Insufficient data: {len(history_data)}/{MIN_DATA_REQUIRED} records"
+            )
+
+        with ENTITY_STAGES.stage("scale"):
+            current_data = np.array([[request.temperature, request.humidity]])
+            windows = build_windows(scaler, history_data, current_data)
+        with ENTITY_STAGES.stage("forward"):
+            prediction_scaled = forward_batch(model, windows)[0]
+        with ENTITY_STAGES.stage("inverse_scale"):
+            final_prediction = round(float(inverse_scale_demand(scaler, prediction_scaled)), 2)
+        if prediction_log is not None:
+            prediction_log.record("predict", version, request.temperature, request.humidity, final_prediction,
+                                  entity_id=request.entity_id)
+
+        return {
+            "model_version": version,
+            "entity_id": request.entity_id,
+            "predicted_demand": final_prediction
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"✗ Error during entity prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 @app.post("/predict")
 def predict(request: WeatherRequest):
-    global model, scaler, model_loaded
-    
-    if not model_loaded:
+    if request.entity_id is not None:
+        return predict_entity(request)
+
+    # One read of the holder: this request uses a consistent (model, scaler) pair
+    bundle = models.bundle
+    if bundle is None:
         raise HTTPException(status_code=503, detail="Model not loaded. Check logs.")
     
     try:
-        # Validate input ranges
-        if not (TEMP_MIN <= request.temperature <= TEMP_MAX):
-            print(f"⚠ Temperature {request.temperature}°C outside typical range [{TEMP_MIN}-{TEMP_MAX}]")
-        if not (HUMIDITY_MIN <= request.humidity <= HUMIDITY_MAX):
-            print(f"⚠ Humidity {request.humidity}% outside typical range [{HUMIDITY_MIN}-{HUMIDITY_MAX}]")
+        # Track input ranges and feed the online drift window (cheap appends only)
+        with PREDICT_STAGES.stage("input_checks"):
+            if not (TEMP_MIN <= request.temperature <= TEMP_MAX):
+                OUT_OF_RANGE_INPUTS.labels("temperature").inc()
+            if not (HUMIDITY_MIN <= request.humidity <= HUMIDITY_MAX):
+                OUT_OF_RANGE_INPUTS.labels("humidity").inc()
+            if online_drift is not None:
+                online_drift.record(request.temperature, request.humidity)
         
-        # 1. Fetch History
-        query = f"""
-            SELECT date, temperature, humidity 
-            FROM features 
-            ORDER BY date DESC 
-            LIMIT {MIN_DATA_REQUIRED}
-        """
-        history_df = load_data(query)
+        # 1. Fetch History (oldest first, served from the in-memory window)
+        with PREDICT_STAGES.stage("history"):
+            watermark, history_data = history_cache.get_versioned()
         
         # Check if we have enough data
-        if len(history_df) < MIN_DATA_REQUIRED:
+        if len(history_data) < MIN_DATA_REQUIRED:
             raise HTTPException(
                 status_code=500, 
-                detail=f"Insufficient data: {len(history_df)}/{MIN_DATA_REQUIRED} records"
+                detail=f"Insufficient data: {len(history_data)}/{MIN_DATA_REQUIRED} records"
             )
+
+        # Same model, same history, same input cell: reuse the earlier answer
+        inputs = (request.temperature, request.humidity)
+        if prediction_cache is not None:
+            with PREDICT_STAGES.stage("cache_lookup"):
+                generation = (bundle.version, watermark)
+                cache_key, inputs = prediction_cache.quantize(*inputs)
+                cached = prediction_cache.get(generation, cache_key)
+            if cached is not None:
+                if prediction_log is not None:
+                    prediction_log.record("predict", bundle.version, request.temperature, request.humidity, cached,
+                                          watermark)
+                return {"model_version": bundle.version, "predicted_demand": cached}
         
-        # 2. Sort by date (Oldest first)
-        history_df = history_df.sort_values(by="date", ascending=True)
-        history_data = history_df[['temperature', 'humidity']].values
-        
-        # 3. Combine with current request
-        current_data = np.array([[request.temperature, request.humidity]])
-        full_window = np.vstack((history_data, current_data))
-        
-        # 4. Scale features only (model was trained on 2 features)
-        scaled_window = scaler.transform(np.hstack([
-            full_window,
-            np.zeros((LOOKBACK_WINDOW, 1))  # Placeholder for demand column
-        ]))[:, :2]  # Take only scaled temp/humidity
-        
-        # 5. Predict
-        input_tensor = torch.tensor(scaled_window, dtype=torch.float32).unsqueeze(0)
-        with torch.no_grad():
-            prediction_scaled = model(input_tensor).item()
-        
-        # 6. Inverse scale the prediction
-        # Create a dummy row with scaled values to inverse transform
-        dummy_scaled = np.array([[0.0, 0.0, prediction_scaled]])
-        dummy_original = scaler.inverse_transform(dummy_scaled)
-        final_prediction = max(0, dummy_original[0, 2])  # Demand should be non-negative
+        if bundle.stepper is not None and PREFIX_STATE_ENABLED:
+            # 2-3. One LSTM step from the state after the shared history (a step is cheaper than batching it)
+            with PREDICT_STAGES.stage("prefix_state"):
+                state = prefix_state.get(bundle, watermark, history_data)
+            with PREDICT_STAGES.stage("step"):
+                current_data = scale_features(bundle.scaler, np.array([inputs]))
+                prediction_scaled = float(bundle.stepper.advance(state, current_data)[0])
+        else:
+            # 2. Combine with current request and scale (model was trained on 2 features)
+            with PREDICT_STAGES.stage("scale"):
+                current_data = np.array([inputs])
+                window = build_windows(bundle.scaler, history_data, current_data)[0]
+
+            # 3. Predict (coalesced with concurrent requests when batching is enabled)
+            if batcher is not None:
+                try:
+                    with PREDICT_STAGES.stage("batched_forward"):  # Queue wait + shared forward pass
+                        prediction_scaled = batcher.predict(window, bundle.model, timeout=BATCH_TIMEOUT_S)
+                except queue.Full:
+                    raise HTTPException(
+                        status_code=503,
+                        detail="Inference queue full. Retry shortly.",
+                        headers={"Retry-After": "1"}
+                    )
+                except concurrent.futures.TimeoutError:
+                    raise HTTPException(
+                        status_code=503,
+                        detail=f"Inference did not finish within {BATCH_TIMEOUT_S}s. Retry shortly.",
+                        headers={"Retry-After": "1"}
+                    )
+            else:
+                with PREDICT_STAGES.stage("forward"):
+                    prediction_scaled = float(forward_batch(bundle.model, window[np.newaxis])[0])
+
+        # 4. Inverse scale the prediction (demand column only)
+        with PREDICT_STAGES.stage("inverse_scale"):
+            final_prediction = round(float(inverse_scale_demand(bundle.scaler, prediction_scaled)), 2)
+        if prediction_cache is not None:
+            prediction_cache.put(generation, cache_key, final_prediction)
+        if prediction_log is not None:
+            prediction_log.record("predict", bundle.version, request.temperature, request.humidity, final_prediction,
+                                  watermark)
         
         return {
-            "model_version": "v1",
-            "predicted_demand": round(final_prediction, 2)
+            "model_version": bundle.version,
+            "predicted_demand": final_prediction
         }
 
     except HTTPException:
         raise
     except Exception as e:
         print(f"✗ Error during prediction: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+@app.post("/predict_batch")
+def predict_batch(request: BatchWeatherRequest, format: str = "json"):
+    """
+    Forecasts N weather scenarios against the same history window in one forward pass.
+
+    `format=json` returns the predictions as a list, `format=binary` as raw
+    little-endian float32 bytes, and `format=arrow` as an Arrow IPC stream
+    with a single `predicted_demand` column. Order matches `scenarios`.
+    """
+    bundle = models.bundle
+    if bundle is None:
+        raise HTTPException(status_code=503, detail="Model not loaded. Check logs.")
+    if format not in BATCH_RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'. Use one of {BATCH_RESPONSE_FORMATS}")
+    if format == "arrow" and not HAS_PYARROW:
+        raise HTTPException(status_code=400, detail="format=arrow requires pyarrow to be installed")
+    n = len(request.scenarios)
+    if n == 0:
+        raise HTTPException(status_code=422, detail="At least one scenario is required")
+    if n > MAX_BATCH_SCENARIOS:
+        raise HTTPException(status_code=413, detail=f"Too many scenarios: {n} (max {MAX_BATCH_SCENARIOS})")
+
+    try:
+        with BATCH_STAGES.stage("input_checks"):
+            inputs = np.array([[s.temperature, s.humidity] for s in request.scenarios], dtype=np.float64)
+            OUT_OF_RANGE_INPUTS.labels("temperature").inc(
+                np.count_nonzero((inputs[:, 0] < TEMP_MIN) | (inputs[:, 0] > TEMP_MAX)))
+            OUT_OF_RANGE_INPUTS.labels("humidity").inc(
+                np.count_nonzero((inputs[:, 1] < HUMIDITY_MIN) | (inputs[:, 1] > HUMIDITY_MAX)))
+        # Batch scenarios are hypothetical, so they are not fed into the live drift window
+
+        # 1. Fetch the shared history window once
+        with BATCH_STAGES.stage("history"):
+            watermark, history_data = history_cache.get_versioned()
+        if len(history_data) < MIN_DATA_REQUIRED:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Insufficient data: {len(history_data)}/{MIN_DATA_REQUIRED} records"
+            )
+
+        if bundle.stepper is not None and PREFIX_STATE_ENABLED:
+            # 2-3. N single steps from the shared post-history state, as one matrix product
+            with BATCH_STAGES.stage("prefix_state"):
+                state = prefix_state.get(bundle, watermark, history_data)
+            with BATCH_STAGES.stage("step"):
+                outputs = bundle.stepper.advance(state, scale_features(bundle.scaler, inputs))
+        else:
+            # 2. Build all N windows by broadcasting the scaled history
+            with BATCH_STAGES.stage("scale"):
+                windows = build_windows(bundle.scaler, history_data, inputs)
+
+            # 3. One forward pass
+            with BATCH_STAGES.stage("forward"):
+                outputs = forward_batch(bundle.model, windows)
+
+        # 4. One vectorized inverse scale
+        with BATCH_STAGES.stage("inverse_scale"):
+            # float64 so the JSON rounds like /predict; binary and arrow narrow to float32 below
+            predictions = inverse_scale_demand(bundle.scaler, outputs.astype(np.float64))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"✗ Error during batch prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
+    headers = {"X-Model-Version": bundle.version}
+    if format == "binary":
+        return Response(predictions.astype("<f4").tobytes(), media_type="application/octet-stream", headers=headers)
+    if format == "arrow":
+        import pyarrow as pa
+
+        table = pa.table({"predicted_demand": predictions.astype(np.float32)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue().to_pybytes(), media_type="application/vnd.apache.arrow.stream", headers=headers)
+    return {
+        "model_version": bundle.version,
+        "predicted_demand": np.round(predictions, 2).tolist()
+    }
+
+@app.post("/forecast")
+def forecast(request: BatchWeatherRequest, horizon: int = 1):
+    """
+    Forecasts `horizon` consecutive steps after the history window.
+
+    `scenarios` holds the weather for each future step, or a single
+    scenario used for all of them. The LSTM continues from the cached
+    post-history state through the inputs in order. Step 1 equals
+    /predict. Later steps condition on the whole history plus the earlier
+    forecast inputs rather than on a sliding LOOKBACK_WINDOW, so they can
+    differ slightly from chaining /predict calls over shifted windows.
+    """
+    bundle = models.bundle
+    if bundle is None:
+        raise HTTPException(status_code=503, detail="Model not loaded. Check logs.")
+    if bundle.stepper is None:
+        raise HTTPException(
+            status_code=501, detail=f"Forecasting needs the eager or numpy runtime, not '{bundle.runtime}'"
+        )
+    try:
+        inputs = forecast_inputs([[s.temperature, s.humidity] for s in request.scenarios], horizon)
+    except ValueError as ve:
+        raise HTTPException(status_code=422, detail=str(ve))
+
+    try:
+        with FORECAST_STAGES.stage("history"):
+            watermark, history_data = history_cache.get_versioned()
+        if len(history_data) < MIN_DATA_REQUIRED:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Insufficient data: {len(history_data)}/{MIN_DATA_REQUIRED} records"
+            )
+        with FORECAST_STAGES.stage("prefix_state"):
+            state = prefix_state.get(bundle, watermark, history_data)
+        with FORECAST_STAGES.stage("rollout"):
+            outputs = bundle.stepper.rollout(state, scale_features(bundle.scaler, inputs))
+        with FORECAST_STAGES.stage("inverse_scale"):
+            predictions = inverse_scale_demand(bundle.scaler, outputs.astype(np.float64))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"✗ Error during forecast: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Forecast failed: {str(e)}")
+
+    return {
+        "model_version": bundle.version,
+        "horizon": horizon,
+        "predicted_demand": np.round(predictions, 2).tolist()
+    }
+
+@app.get("/drift/online")
+def online_drift_status():
+    """Latest drift scores of live request features vs. the reference profile."""
+    if online_drift is None:
+        raise HTTPException(status_code=404, detail="Online drift monitoring is disabled.")
+    return {
+        "window_size": len(online_drift.engine.window),
+        "result": online_drift.last_result,
+    }
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+def debug_profile(seconds: float = 10, interval_ms: float = profiler.PROFILE_SAMPLE_INTERVAL_MS):
+    """
+    Samples every thread's Python stack for `seconds` and returns collapsed stacks.
+
+    Disabled unless PROFILING_ENABLED=1. Pipe the output into flamegraph.pl
+    or load it into speedscope.
+    """
+    if not profiler.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled. Set PROFILING_ENABLED=1.")
+    try:
+        return profiler.profile(seconds, interval_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
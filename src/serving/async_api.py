@@ -0,0 +1,414 @@
+# src/serving/async_api.py
+"""
+Async variant of the serving app.
+
+Run with: uvicorn src.serving.async_api:app --port 8000
+
+Differences from src/serving/api.py:
+- The event loop never blocks. History rows come from an asyncpg pool into
+  the in-memory HistoryWindow, and model compute runs on a dedicated,
+  bounded thread pool with a configurable number of Torch intra-op threads.
+- Admission control: once MAX_PENDING_REQUESTS requests are waiting for
+  compute, new requests are rejected right away with 429 and Retry-After.
+  Under a burst the API sheds load instead of letting latency grow without
+  bound.
+"""
+import sys
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import numpy as np
+import asyncpg
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from prometheus_client import Counter, Gauge
+from prometheus_fastapi_instrumentator import Instrumentator
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+
+from src.database.db import DB_URL
+from src.serving.inference import (
+    MIN_DATA_REQUIRED, build_windows, forward_batch, inverse_scale_demand, scale_features,
+)
+from src.serving.hot_swap import ModelHolder
+from src.serving.history_cache import HistoryWindow, EntityHistories, HISTORY_POLL_INTERVAL_S
+from src.serving.prediction_cache import PredictionCache, PREDICTION_CACHE_ENABLED
+from src.serving.entity_models import EntityModels
+from src.serving.prefix_state import PrefixState, PREFIX_STATE_ENABLED, forecast_inputs
+from src.serving.prediction_log import PredictionLog, PREDICTION_LOG_ENABLED
+from src.telemetry import profiler
+from src.telemetry.stages import StageTimer
+
+# CONFIG
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+TORCH_INTRA_OP_THREADS = int(os.getenv("TORCH_INTRA_OP_THREADS", "1"))
+MAX_PENDING_REQUESTS = int(os.getenv("MAX_PENDING_REQUESTS", "64"))
+RETRY_AFTER_S = os.getenv("RETRY_AFTER_S", "1")
+ASYNC_DB_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", "1"))
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", "5"))
+MAX_BATCH_SCENARIOS = int(os.getenv("MAX_BATCH_SCENARIOS", "10000"))
+
+PENDING_REQUESTS = Gauge("async_pending_inference_requests", "Requests admitted and waiting for compute")
+REJECTED_REQUESTS = Counter("async_rejected_requests_total", "Requests shed with 429 because the compute queue was full")
+PREDICT_STAGES = StageTimer("predict")
+BATCH_STAGES = StageTimer("predict_batch")
+FORECAST_STAGES = StageTimer("forecast")
+ENTITY_STAGES = StageTimer("predict_entity")
+
+app = FastAPI(title="Drift-Aware Demand Forecaster (async)")
+Instrumentator().instrument(app).expose(app)
+
+# Global variables
+models = ModelHolder()
+history_cache = HistoryWindow(size=MIN_DATA_REQUIRED)
+prediction_cache = PredictionCache() if PREDICTION_CACHE_ENABLED else None
+entity_models = EntityModels()
+entity_histories = EntityHistories(size=MIN_DATA_REQUIRED)
+prefix_state = PrefixState()
+prediction_log = None
+db_pool = None
+executor = None
+poll_task = None
+pending = 0
+
+class Scenario(BaseModel):
+    temperature: float
+    humidity: float
+
+class WeatherRequest(Scenario):
+    entity_id: Optional[str] = None
+
+class BatchWeatherRequest(BaseModel):
+    scenarios: List[Scenario]
+
+def _init_compute_thread():
+    # torch is only loaded by torch runtimes; an onnx deployment never imports it
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(TORCH_INTRA_OP_THREADS)
+
+def _asyncpg_dsn(url):
+    # asyncpg speaks plain postgresql:// URLs, not SQLAlchemy driver variants
+    scheme, rest = url.split("://", 1)
+    return "postgresql://" + rest if scheme.startswith("postgresql") else url
+
+_history_refreshes = {}  # window -> in-flight refresh, shared by every coroutine that needs one
+
+async def refresh_history(window=None):
+    """
+    Pulls rows newer than `window`'s watermark (the global history by
+    default) through the asyncpg pool.
+
+    Single-flight per window: while one fetch is running, other callers
+    (the poller, stale requests) await the same task instead of fetching
+    from the same watermark again. A call after it finishes starts a new
+    fetch from the updated watermark.
+    """
+    window = window if window is not None else history_cache
+    task = _history_refreshes.get(window)
+    if task is None or task.done():
+        task = _history_refreshes[window] = asyncio.ensure_future(_fetch_new_history(window))
+        task.add_done_callback(lambda _: _history_refreshes.pop(window, None))
+    # Shielded: a cancelled request must not cancel the fetch other callers are waiting on
+    return await asyncio.shield(task)
+
+async def _fetch_new_history(window):
+    conditions, args = [], []
+    if window.entity_id is not None:
+        args.append(window.entity_id)
+        conditions.append(f"entity_id = ${len(args)}")
+    if window.high_water_mark is not None:
+        args.append(window.high_water_mark)
+        conditions.append(f"date > ${len(args)}")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = await db_pool.fetch(
+        f"SELECT date, temperature, humidity FROM {window.table} {where} ORDER BY date DESC LIMIT {window.size}",
+        *args,
+    )
+    rows = rows[::-1]  # Oldest first
+    added = 0
+    if rows:
+        # extend() also skips rows at or below the watermark, should a fetch ever overlap
+        added = window.extend([r["date"] for r in rows], [[r["temperature"], r["humidity"]] for r in rows])
+    window.mark_refreshed()
+    return added
+
+async def _poll_history():
+    while True:
+        await asyncio.sleep(HISTORY_POLL_INTERVAL_S)
+        try:
+            added = await refresh_history()
+            if added:
+                print(f"✓ History window advanced by {added} rows (watermark: {history_cache.high_water_mark})")
+        except Exception as e:
+            print(f"⚠ History refresh failed: {e}")
+
+async def get_history(window=None):
+    """Returns (watermark, oldest-first history) of `window` (the global history by default) for one request."""
+    window = window if window is not None else history_cache
+    if window.is_stale():
+        try:
+            await refresh_history(window)
+        except Exception as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"History unavailable: {str(e)}",
+                headers={"Retry-After": RETRY_AFTER_S}
+            )
+    watermark, history_data = window.versioned_snapshot()
+    if len(history_data) < MIN_DATA_REQUIRED:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Insufficient data: {len(history_data)}/{MIN_DATA_REQUIRED} records"
+        )
+    return watermark, history_data
+
+async def run_inference(fn, *args):
+    """Runs `fn(*args)` (a forward pass or LSTM steps) on the compute pool, shedding load when it is saturated."""
+    global pending
+    if pending >= MAX_PENDING_REQUESTS:
+        REJECTED_REQUESTS.inc()
+        raise HTTPException(
+            status_code=429,
+            detail="Server busy. Retry shortly.",
+            headers={"Retry-After": RETRY_AFTER_S}
+        )
+    # Single-threaded event loop: the counter needs no lock
+    pending += 1
+    PENDING_REQUESTS.set(pending)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, fn, *args)
+    finally:
+        pending -= 1
+        PENDING_REQUESTS.set(pending)
+
+@app.on_event("startup")
+async def startup():
+    global db_pool, executor, poll_task, prediction_log
+    print("Loading model artifacts...")
+    try:
+        models.reload()
+        print(f"✓ System Ready! Model {models.bundle.version} ({models.bundle.runtime}) loaded successfully.")
+    except Exception as e:
+        print(f"✗ Start-up failed: {e}")
+    models.start_watching()
+    try:
+        entity_models.refresh()
+    except Exception as e:
+        print(f"⚠ Entity models not loaded: {e}")
+
+    _init_compute_thread()
+    executor = ThreadPoolExecutor(
+        max_workers=INFERENCE_WORKERS,
+        thread_name_prefix="inference",
+        initializer=_init_compute_thread,
+    )
+
+    try:
+        db_pool = await asyncpg.create_pool(
+            _asyncpg_dsn(DB_URL), min_size=ASYNC_DB_POOL_MIN, max_size=ASYNC_DB_POOL_MAX
+        )
+        rows = await refresh_history()
+        print(f"✓ History window loaded ({rows} rows, watermark: {history_cache.high_water_mark})")
+    except Exception as e:
+        print(f"⚠ History window not loaded: {e}")
+    if db_pool is not None and HISTORY_POLL_INTERVAL_S > 0:
+        poll_task = asyncio.create_task(_poll_history())
+
+    if PREDICTION_LOG_ENABLED:
+        try:
+            prediction_log = PredictionLog()  # Writes through the sync engine from its own thread
+            prediction_log.start()
+            print(f"✓ Prediction log enabled ({prediction_log.overflow} on overflow)")
+        except Exception as e:
+            print(f"⚠ Prediction log disabled: {e}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    models.stop_watching()
+    if poll_task is not None:
+        poll_task.cancel()
+    if db_pool is not None:
+        await db_pool.close()
+    if executor is not None:
+        executor.shutdown(wait=False)
+    if prediction_log is not None:
+        await asyncio.get_running_loop().run_in_executor(None, prediction_log.stop)  # Flushes what is queued
+
+async def predict_entity(request):
+    """/predict for one entity: its model (loaded off the event loop on a cache miss) and its own history."""
+    loop = asyncio.get_running_loop()
+    with ENTITY_STAGES.stage("model"):
+        try:
+            version, model, scaler = await loop.run_in_executor(None, entity_models.get, request.entity_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"No model for entity '{request.entity_id}'")
+    with ENTITY_STAGES.stage("history"):
+        _, history_data = await get_history(entity_histories.window(request.entity_id))
+    with ENTITY_STAGES.stage("scale"):
+        windows = build_windows(scaler, history_data, np.array([[request.temperature, request.humidity]]))
+
+    try:
+        with ENTITY_STAGES.stage("forward"):
+            prediction_scaled = (await run_inference(forward_batch, model, windows))[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"✗ Error during entity prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+    with ENTITY_STAGES.stage("inverse_scale"):
+        final_prediction = round(float(inverse_scale_demand(scaler, prediction_scaled)), 2)
+    if prediction_log is not None:
+        prediction_log.record("predict", version, request.temperature, request.humidity, final_prediction,
+                              entity_id=request.entity_id)
+    return {
+        "model_version": version,
+        "entity_id": request.entity_id,
+        "predicted_demand": final_prediction
+    }
+
+@app.post("/predict")
+async def predict(request: WeatherRequest):
+    if request.entity_id is not None:
+        return await predict_entity(request)
+    bundle = models.bundle
+    if bundle is None:
+        raise HTTPException(status_code=503, detail="Model not loaded. Check logs.")
+
+    with PREDICT_STAGES.stage("history"):
+        watermark, history_data = await get_history()
+
+    inputs = (request.temperature, request.humidity)
+    if prediction_cache is not None:
+        with PREDICT_STAGES.stage("cache_lookup"):
+            generation = (bundle.version, watermark)
+            cache_key, inputs = prediction_cache.quantize(*inputs)
+            cached = prediction_cache.get(generation, cache_key)
+        if cached is not None:
+            if prediction_log is not None:
+                prediction_log.record("predict", bundle.version, request.temperature, request.humidity, cached, watermark)
+            return {"model_version": bundle.version, "predicted_demand": cached}
+
+    try:
+        if bundle.stepper is not None and PREFIX_STATE_ENABLED:
+            # One LSTM step from the cached post-history state: microseconds, so it runs on the loop
+            with PREDICT_STAGES.stage("prefix_state"):
+                state = prefix_state.get(bundle, watermark, history_data)
+            with PREDICT_STAGES.stage("step"):
+                current_data = scale_features(bundle.scaler, np.array([inputs]))
+                prediction_scaled = bundle.stepper.advance(state, current_data)[0]
+        else:
+            with PREDICT_STAGES.stage("scale"):
+                current_data = np.array([inputs])
+                windows = build_windows(bundle.scaler, history_data, current_data)
+            with PREDICT_STAGES.stage("forward"):  # Includes the wait for a compute thread
+                prediction_scaled = (await run_inference(forward_batch, bundle.model, windows))[0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"✗ Error during prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+    with PREDICT_STAGES.stage("inverse_scale"):
+        final_prediction = round(float(inverse_scale_demand(bundle.scaler, prediction_scaled)), 2)
+    if prediction_cache is not None:
+        prediction_cache.put(generation, cache_key, final_prediction)
+    if prediction_log is not None:
+        prediction_log.record("predict", bundle.version, request.temperature, request.humidity, final_prediction, watermark)
+    return {
+        "model_version": bundle.version,
+        "predicted_demand": final_prediction
+    }
+
+@app.post("/predict_batch")
+async def predict_batch(request: BatchWeatherRequest):
+    bundle = models.bundle
+    if bundle is None:
+        raise HTTPException(status_code=503, detail="Model not loaded. Check logs.")
+    n = len(request.scenarios)
+    if n == 0:
+        raise HTTPException(status_code=422, detail="At least one scenario is required")
+    if n > MAX_BATCH_SCENARIOS:
+        raise HTTPException(status_code=413, detail=f"Too many scenarios: {n} (max {MAX_BATCH_SCENARIOS})")
+
+    with BATCH_STAGES.stage("history"):
+        watermark, history_data = await get_history()
+    inputs = np.array([[s.temperature, s.humidity] for s in request.scenarios], dtype=np.float64)
+
+    try:
+        if bundle.stepper is not None and PREFIX_STATE_ENABLED:
+            with BATCH_STAGES.stage("prefix_state"):
+                state = prefix_state.get(bundle, watermark, history_data)
+            with BATCH_STAGES.stage("step"):  # N rows can take milliseconds: off the loop like a forward pass
+                outputs = await run_inference(bundle.stepper.advance, state, scale_features(bundle.scaler, inputs))
+        else:
+            with BATCH_STAGES.stage("scale"):
+                windows = build_windows(bundle.scaler, history_data, inputs)
+            with BATCH_STAGES.stage("forward"):
+                outputs = await run_inference(forward_batch, bundle.model, windows)
+        with BATCH_STAGES.stage("inverse_scale"):
+            # float64 first: rounding float32 values leaves noise like 207.8800048828125 in the JSON
+            predictions = inverse_scale_demand(bundle.scaler, outputs.astype(np.float64))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"✗ Error during batch prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
+    return {
+        "model_version": bundle.version,
+        "predicted_demand": np.round(predictions, 2).tolist()
+    }
+
+@app.post("/forecast")
+async def forecast(request: BatchWeatherRequest, horizon: int = 1):
+    """`horizon` consecutive steps from the cached post-history state (see api.py for the semantics)."""
+    bundle = models.bundle
+    if bundle is None:
+        raise HTTPException(status_code=503, detail="Model not loaded. Check logs.")
+    if bundle.stepper is None:
+        raise HTTPException(
+            status_code=501, detail=f"Forecasting needs the eager or numpy runtime, not '{bundle.runtime}'"
+        )
+    try:
+        inputs = forecast_inputs([[s.temperature, s.humidity] for s in request.scenarios], horizon)
+    except ValueError as ve:
+        raise HTTPException(status_code=422, detail=str(ve))
+
+    with FORECAST_STAGES.stage("history"):
+        watermark, history_data = await get_history()
+    try:
+        with FORECAST_STAGES.stage("prefix_state"):
+            state = prefix_state.get(bundle, watermark, history_data)
+        with FORECAST_STAGES.stage("rollout"):
+            outputs = await run_inference(bundle.stepper.rollout, state, scale_features(bundle.scaler, inputs))
+        with FORECAST_STAGES.stage("inverse_scale"):
+            predictions = inverse_scale_demand(bundle.scaler, outputs.astype(np.float64))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"✗ Error during forecast: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Forecast failed: {str(e)}")
+
+    return {
+        "model_version": bundle.version,
+        "horizon": horizon,
+        "predicted_demand": np.round(predictions, 2).tolist()
+    }
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(seconds: float = 10, interval_ms: float = profiler.PROFILE_SAMPLE_INTERVAL_MS):
+    """Collapsed-stack sampling profile of all threads (requires PROFILING_ENABLED=1)."""
+    if not profiler.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled. Set PROFILING_ENABLED=1.")
+    loop = asyncio.get_running_loop()
+    try:
+        # Sample off the event loop (and off the inference pool) so the loop shows up in the profile
+        return await loop.run_in_executor(None, profiler.profile, seconds, interval_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -0,0 +1,129 @@
+# src/serving/batcher.py
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from prometheus_client import Gauge, Histogram
+
+# CONFIG
+BATCHING_ENABLED = os.getenv("BATCHING_ENABLED", "0") == "1"
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_US = int(os.getenv("BATCH_MAX_WAIT_US", "2000"))
+BATCH_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", "1024"))
+BATCH_TIMEOUT_S = float(os.getenv("BATCH_TIMEOUT_S", "5"))
+
+BATCHER_QUEUE_DEPTH = Gauge("batcher_queue_depth", "Windows waiting for the micro-batcher")
+BATCHER_BATCH_SIZE = Histogram(
+    "batcher_batch_size",
+    "Number of windows per batched forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+BATCHER_QUEUE_WAIT_SECONDS = Histogram(
+    "batcher_queue_wait_seconds",
+    "Time a window spent queued before its batch ran",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+class MicroBatcher:
+    """
+    Dynamic batcher for single-window inference requests.
+
+    Callers submit one ``(seq_len, n_features)`` window each, together with
+    the model it was scaled for. A worker thread takes the first queued
+    window, then keeps collecting until it has ``max_batch_size`` windows or
+    ``max_wait_us`` microseconds have passed. It stacks the windows of each
+    model into one ``(B, seq_len, n_features)`` array, calls ``forward_fn``
+    once per model, and resolves each caller's future with its row of the
+    output. Grouping by model keeps a hot-swap from mixing one version's
+    scaler with another's weights.
+
+    ``forward_fn(model, windows)`` takes a float32 array of shape
+    ``(B, seq_len, n_features)`` and returns an array of ``B`` predictions.
+    """
+
+    def __init__(self, forward_fn, max_batch_size=BATCH_MAX_SIZE,
+                 max_wait_us=BATCH_MAX_WAIT_US, max_queue_size=BATCH_QUEUE_SIZE):
+        self.forward_fn = forward_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_us / 1e6
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._worker = None
+        BATCHER_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+    def start(self):
+        if self._worker is not None:
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+            self._worker = None
+        # Fail anything still queued instead of leaving callers hanging
+        while True:
+            try:
+                _, _, future, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError("Micro-batcher stopped"))
+
+    def submit(self, window, model):
+        """Queues one window. Raises ``queue.Full`` when the queue is at capacity."""
+        future = Future()
+        self._queue.put_nowait((window, model, future, time.perf_counter()))
+        return future
+
+    def predict(self, window, model, timeout=BATCH_TIMEOUT_S):
+        """Blocking convenience wrapper around `submit`."""
+        return self.submit(window, model).result(timeout=timeout)
+
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    # Drain whatever is already queued without waiting further
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            groups = {}
+            for item in batch:
+                BATCHER_QUEUE_WAIT_SECONDS.observe(started - item[3])
+                groups.setdefault(id(item[1]), []).append(item)
+
+            for group in groups.values():
+                BATCHER_BATCH_SIZE.observe(len(group))
+                try:
+                    windows = np.stack([window for window, _, _, _ in group]).astype(np.float32, copy=False)
+                    outputs = np.asarray(self.forward_fn(group[0][1], windows)).reshape(len(group), -1)[:, 0]
+                except Exception as e:
+                    for _, _, future, _ in group:
+                        future.set_exception(e)
+                    continue
+
+                for (_, _, future, _), output in zip(group, outputs):
+                    future.set_result(float(output))
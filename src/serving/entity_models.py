@@ -0,0 +1,127 @@
+# src/serving/entity_models.py
+import os
+import sys
+import json
+import threading
+import time
+from collections import OrderedDict
+from prometheus_client import Counter, Gauge
+
+from src.models import registry
+from src.models.export import load_runtime_model
+from src.models.scaler import FeatureScaler
+
+# CONFIG
+ENTITY_MODEL_CACHE_BYTES = int(os.getenv("ENTITY_MODEL_CACHE_BYTES", str(256 * 1024 * 1024)))  # Params + scalers
+ENTITY_MODEL_CACHE_SIZE = int(os.getenv("ENTITY_MODEL_CACHE_SIZE", "64"))  # Secondary cap on loaded artifacts
+ENTITY_INDEX_CHECK_INTERVAL_S = float(os.getenv("ENTITY_INDEX_CHECK_INTERVAL_S", "10"))
+
+ENTITY_MODEL_LOADS = Counter("entity_model_loads_total", "Per-entity model artifacts loaded from the registry")
+ENTITY_MODEL_EVICTIONS = Counter("entity_model_evictions_total", "Per-entity models evicted from the LRU")
+ENTITY_MODELS_LOADED = Gauge("entity_models_loaded", "Per-entity model artifacts currently in memory")
+ENTITY_MODEL_BYTES = Gauge("entity_model_cache_bytes", "Parameter and scaler bytes of the per-entity models in memory")
+
+def _param_bytes(model):
+    return sum(p.numel() * p.element_size() for p in model.parameters())
+
+def _scaler_bytes(entity, scaler):
+    """Approximate footprint of one entity's scaler: its arrays plus the dict entry and attribute dict."""
+    arrays = sum(v.nbytes + sys.getsizeof(v) for v in vars(scaler).values() if hasattr(v, "nbytes"))
+    return arrays + sys.getsizeof(entity) + sys.getsizeof(scaler) + sys.getsizeof(vars(scaler))
+
+def _entry_bytes(model, scalers):
+    return _param_bytes(model) + sum(_scaler_bytes(entity, scaler) for entity, scaler in scalers.items())
+
+class EntityModels:
+    """
+    Serves per-entity (model, scaler) pairs from the entity registry.
+
+    Only the `entities.json` index of the current version is held
+    permanently. Model artifacts (one per shard, or one per entity) load on
+    first use and sit in an LRU, each with the scalers of the entities it
+    serves. Least recently used entries are evicted until the summed
+    parameter and scaler bytes fit in `max_bytes` and at most `max_models`
+    entries remain; the entry just loaded is always kept, even when it
+    alone exceeds the budget. A newly published version is
+    noticed within ENTITY_INDEX_CHECK_INTERVAL_S on the request path: the
+    index is swapped and the LRU emptied, so every later request uses the
+    new version.
+    """
+
+    def __init__(self, registry_dir=registry.ENTITY_REGISTRY_DIR, max_models=ENTITY_MODEL_CACHE_SIZE,
+                 max_bytes=ENTITY_MODEL_CACHE_BYTES):
+        self.registry_dir = registry_dir
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.version = None
+        self._index = {}
+        self._models = OrderedDict()  # artifact -> (model, {entity: FeatureScaler}, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._checked_at = float("-inf")
+        ENTITY_MODELS_LOADED.set_function(lambda: len(self._models))
+
+    def refresh(self):
+        """Switches to the registry's CURRENT version if it changed."""
+        self._checked_at = time.monotonic()
+        version = registry.current_version(self.registry_dir)
+        if version == self.version:
+            return
+        index = {}
+        if version is not None:
+            with open(registry.artifact_path(version, registry.ENTITY_INDEX_ARTIFACT, self.registry_dir)) as f:
+                index = json.load(f)
+        with self._lock:
+            self.version, self._index = version, index
+            self._models.clear()
+            self._bytes = 0
+        ENTITY_MODEL_BYTES.set(0)
+        if version is not None:
+            print(f"✓ Entity models: serving version {version} ({len(index)} entities)")
+
+    def get(self, entity_id):
+        """
+        Returns (version, model, scaler) for `entity_id`.
+
+        Raises KeyError for an entity the current version has no model for.
+        """
+        if time.monotonic() - self._checked_at >= ENTITY_INDEX_CHECK_INTERVAL_S:
+            self.refresh()
+        with self._lock:
+            version, entry = self.version, self._index.get(entity_id)
+            if entry is None:
+                raise KeyError(entity_id)
+            cached = self._models.get(entry["model"])
+            if cached is not None:
+                self._models.move_to_end(entry["model"])
+                return version, cached[0], cached[1][entity_id]
+
+        # Cold: load outside the request lock; one loader at a time so a burst loads each artifact once
+        with self._load_lock:
+            with self._lock:
+                cached = self._models.get(entry["model"]) if self.version == version else None
+            if cached is None:
+                cached = self._load(version, entry)
+        return version, cached[0], cached[1][entity_id]
+
+    def _load(self, version, entry):
+        model = load_runtime_model(registry.artifact_path(version, entry["model"], self.registry_dir), "eager")
+        with open(registry.artifact_path(version, entry["scalers"], self.registry_dir)) as f:
+            scalers = {entity: FeatureScaler.from_dict(params) for entity, params in json.load(f).items()}
+        ENTITY_MODEL_LOADS.inc()
+        with self._lock:
+            if self.version != version:
+                return model, scalers  # A newer version was swapped in meanwhile; serve this one uncached
+            nbytes = _entry_bytes(model, scalers)
+            self._models[entry["model"]] = (model, scalers, nbytes)
+            self._bytes += nbytes
+            while len(self._models) > 1 and (len(self._models) > self.max_models or self._bytes > self.max_bytes):
+                _, (_, _, evicted) = self._models.popitem(last=False)
+                self._bytes -= evicted
+                ENTITY_MODEL_EVICTIONS.inc()
+            ENTITY_MODEL_BYTES.set(self._bytes)
+        return model, scalers
+
+    def __len__(self):
+        return len(self._index)
@@ -0,0 +1,261 @@
+# src/serving/history_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+from src.database.db import load_rows
+from src.database.ingest import ENTITY_FEATURES_TABLE
+from src.models.windows import FEATURE_COLUMNS
+
+# CONFIG
+HISTORY_COLUMNS = tuple(FEATURE_COLUMNS)
+HISTORY_POLL_INTERVAL_S = float(os.getenv("HISTORY_POLL_INTERVAL_S", "5"))
+HISTORY_MAX_STALENESS_S = float(os.getenv("HISTORY_MAX_STALENESS_S", "60"))
+ENTITY_HISTORY_CACHE_SIZE = int(os.getenv("ENTITY_HISTORY_CACHE_SIZE", "10000"))  # Per-entity windows kept
+ENTITY_HISTORY_MAX_STALENESS_S = float(os.getenv("ENTITY_HISTORY_MAX_STALENESS_S", "5"))
+
+class HistoryWindow:
+    """
+    In-memory ring buffer holding the most recent ``size`` feature rows.
+
+    The buffer is loaded once from ``table`` (only the rows of ``entity_id``
+    when one is given) and then refreshed incrementally by fetching only
+    rows newer than the high-water-mark ``date``. Readers get an
+    oldest-first copy of the window without touching the database, unless
+    the last successful refresh is older than ``max_staleness`` seconds,
+    in which case the read refreshes first.
+
+    Refreshes are single-flight: the poller, stale readers and
+    /history/refresh share one sync, and callers that queued behind it
+    reuse its result instead of fetching from the same watermark again.
+    """
+
+    def __init__(self, size, columns=HISTORY_COLUMNS, max_staleness=HISTORY_MAX_STALENESS_S, table="features",
+                 entity_id=None):
+        self.size = size
+        self.columns = list(columns)
+        self.max_staleness = max_staleness
+        self.table = table
+        self.entity_id = entity_id
+        self.high_water_mark = None
+        self.last_refresh = None
+
+        self._buffer = np.empty((size, len(self.columns)), dtype=np.float64)
+        self._head = 0   # Next slot to write (also the oldest row once full)
+        self._count = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # Serializes fetch + extend against the watermark
+        self._refreshes = 0  # Completed syncs; lets a queued refresh see that one just ran
+        self._stop = threading.Event()
+        self._poller = None
+
+    def __len__(self):
+        return self._count
+
+    # ---- Buffer operations -------------------------------------------------
+
+    def extend(self, dates, values):
+        """
+        Appends rows (oldest first) and advances the high-water-mark.
+
+        Rows at or below the current watermark are already buffered and are
+        skipped, so overlapping fetches never duplicate history. Returns the
+        number of rows added.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return 0
+
+        with self._lock:
+            if self.high_water_mark is not None:
+                keep = [i for i, date in enumerate(dates) if date > self.high_water_mark]
+                if len(keep) < len(dates):
+                    dates, values = [dates[i] for i in keep], values[keep]
+                if len(values) == 0:
+                    return 0
+            added = len(values)
+            # Only the newest `size` rows can survive in the ring anyway
+            values = values[-self.size:]
+            n = len(values)
+            end = self._head + n
+            if end <= self.size:
+                self._buffer[self._head:end] = values
+            else:
+                split = self.size - self._head
+                self._buffer[self._head:] = values[:split]
+                self._buffer[:n - split] = values[split:]
+            self._head = end % self.size
+            self._count = min(self.size, self._count + n)
+            self.high_water_mark = dates[-1]
+        return added
+
+    def snapshot(self):
+        """Returns an oldest-first copy of the buffered rows."""
+        return self.versioned_snapshot()[1]
+
+    def versioned_snapshot(self):
+        """Returns (high_water_mark, oldest-first copy), read under one lock so the two always match."""
+        with self._lock:
+            if self._count < self.size:
+                return self.high_water_mark, self._buffer[:self._count].copy()
+            return self.high_water_mark, np.concatenate((self._buffer[self._head:], self._buffer[:self._head]))
+
+    def _replace(self, rows):
+        """Swaps in a window built from (date, *columns) rows; readers see the old or the new one, never a mix."""
+        rows = rows[-self.size:]
+        buffer = np.empty((self.size, len(self.columns)), dtype=np.float64)
+        if rows:
+            buffer[:len(rows)] = np.asarray([row[1:] for row in rows], dtype=np.float64)
+        with self._lock:
+            self._buffer = buffer
+            self._head = len(rows) % self.size
+            self._count = len(rows)
+            self.high_water_mark = rows[-1][0] if rows else None
+
+    def _extend_rows(self, rows):
+        """Appends (date, *columns) rows, oldest first. Returns the number of rows added."""
+        if not rows:
+            return 0
+        return self.extend([row[0] for row in rows], [row[1:] for row in rows])
+
+    # ---- Database sync -----------------------------------------------------
+
+    def _fetch(self, since=None):
+        conditions, params = [], {}
+        if self.entity_id is not None:
+            conditions.append("entity_id = :entity_id")
+            params["entity_id"] = self.entity_id
+        if since is not None:
+            conditions.append("date > :since")
+            params["since"] = since
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT date, {', '.join(self.columns)}
+            FROM {self.table}
+            {where}
+            ORDER BY date DESC
+            LIMIT {self.size}
+        """
+        rows = load_rows(query, params=params or None, warn_empty=since is None and self.entity_id is None)
+        return rows[::-1]  # Oldest first
+
+    def load(self):
+        """Full (re)load of the window from Postgres."""
+        with self._refresh_lock:
+            return self._load()
+
+    def _load(self):
+        self._replace(self._fetch())
+        self.mark_refreshed()
+        return len(self)
+
+    def refresh(self):
+        """Fetches rows newer than the high-water-mark. Returns rows added."""
+        requested = self._refreshes
+        with self._refresh_lock:
+            if self._refreshes != requested and not self.is_stale():
+                return 0  # A sync finished while this call waited; its rows are already in
+            if self.high_water_mark is None:
+                before = len(self)
+                return self._load() - before
+
+            # Watermark re-read under the refresh lock, so no other sync can advance it mid-fetch
+            added = self._extend_rows(self._fetch(since=self.high_water_mark))
+            self.mark_refreshed()
+            return added
+
+    def mark_refreshed(self):
+        """Records a successful sync (for callers that fetch rows themselves)."""
+        self.last_refresh = time.monotonic()
+        self._refreshes += 1
+
+    def invalidate(self):
+        """Forces the next read to resync with the database."""
+        self.last_refresh = None
+
+    def is_stale(self):
+        if self.last_refresh is None:
+            return True
+        return time.monotonic() - self.last_refresh > self.max_staleness
+
+    def get(self):
+        """Returns the current window, refreshing first if it is too stale."""
+        return self.get_versioned()[1]
+
+    def get_versioned(self):
+        """Like `get`, but returns (high_water_mark, window)."""
+        if self.is_stale():
+            self.refresh()
+        return self.versioned_snapshot()
+
+    # ---- Background polling ------------------------------------------------
+
+    def start_polling(self, interval=HISTORY_POLL_INTERVAL_S):
+        if self._poller is not None or interval <= 0:
+            return
+        self._stop.clear()
+        self._poller = threading.Thread(
+            target=self._poll_loop, args=(interval,), name="history-poller", daemon=True
+        )
+        self._poller.start()
+
+    def stop_polling(self):
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join(timeout=5)
+            self._poller = None
+
+    def _poll_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                added = self.refresh()
+                if added:
+                    print(f"✓ History window advanced by {added} rows (watermark: {self.high_water_mark})")
+            except Exception as e:
+                # Keep serving the last good window; `get` enforces the staleness bound
+                print(f"⚠ History refresh failed: {e}")
+
+class EntityHistories:
+    """
+    One HistoryWindow per entity of ``entity_features``, in an LRU of at
+    most ``max_entities`` windows.
+
+    A window loads on the entity's first request and afterwards only
+    fetches rows past its own watermark, on the request path, once it is
+    older than ``max_staleness`` seconds. There is no background poller:
+    with many entities, only the ones being served pay for refreshes.
+    """
+
+    def __init__(self, size, max_entities=ENTITY_HISTORY_CACHE_SIZE, max_staleness=ENTITY_HISTORY_MAX_STALENESS_S):
+        self.size = size
+        self.max_entities = max_entities
+        self.max_staleness = max_staleness
+        self._windows = OrderedDict()  # entity_id -> HistoryWindow
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._windows)
+
+    def window(self, entity_id):
+        """The entity's window (created empty and stale on first use, so the next read loads it)."""
+        with self._lock:
+            window = self._windows.get(entity_id)
+            if window is not None:
+                self._windows.move_to_end(entity_id)
+                return window
+            window = HistoryWindow(self.size, max_staleness=self.max_staleness, table=ENTITY_FEATURES_TABLE,
+                                   entity_id=entity_id)
+            self._windows[entity_id] = window
+            while len(self._windows) > self.max_entities:
+                self._windows.popitem(last=False)
+            return window
+
+    def get_versioned(self, entity_id):
+        """(high_water_mark, oldest-first window) of one entity, refreshed first if stale."""
+        return self.window(entity_id).get_versioned()
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
@@ -0,0 +1,79 @@
+# src/serving/hot_swap.py
+import os
+import threading
+from prometheus_client import Gauge
+
+from src.models import registry
+from src.serving.inference import load_bundle
+
+# CONFIG
+MODEL_WATCH_INTERVAL_S = float(os.getenv("MODEL_WATCH_INTERVAL_S", "10"))
+
+MODEL_INFO = Gauge("model_version_info", "Currently served model version (value is always 1)", ["version"])
+
+class ModelHolder:
+    """
+    Holds the served ModelBundle and swaps it atomically.
+
+    Requests read `holder.bundle` once and use that (version, model, scaler)
+    triple for the whole request. A swap only rebinds the reference, so
+    in-flight requests finish on the bundle they started with and new
+    requests pick up the new one. There is no lock on the read path.
+    """
+
+    def __init__(self):
+        self.bundle = None
+        self._swap_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def swap(self, bundle):
+        with self._swap_lock:
+            old = self.bundle
+            self.bundle = bundle
+            if old is not None and old.version != bundle.version:
+                MODEL_INFO.remove(old.version)
+            MODEL_INFO.labels(bundle.version).set(1)
+        return old
+
+    def reload(self, version=None):
+        """Loads `version` (default: registry CURRENT) off the request path, then swaps it in."""
+        bundle = load_bundle(version)
+        current = self.bundle
+        if current is not None and current.version == bundle.version:
+            return False
+        self.swap(bundle)
+        old_version = current.version if current is not None else None
+        print(f"✓ Model swapped: {old_version} → {bundle.version}")
+        return True
+
+    def rollback(self):
+        """Points the registry back at the previous version and serves it."""
+        previous = registry.rollback()
+        self.reload(previous)
+        return previous
+
+    # ---- Registry watcher --------------------------------------------------
+
+    def start_watching(self, interval=MODEL_WATCH_INTERVAL_S):
+        if self._watcher is not None or interval <= 0:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                version = registry.current_version()
+                if version is not None and (self.bundle is None or version != self.bundle.version):
+                    self.reload(version)
+            except Exception as e:
+                # Keep serving the current bundle; a bad publish must not take the API down
+                print(f"⚠ Model reload failed: {e}")
@@ -0,0 +1,129 @@
+# src/serving/inference.py
+import os
+from collections import namedtuple
+import numpy as np
+
+from src.models import registry
+from src.models.export import RUNTIMES, OnnxModel, load_runtime_model, runtime_path
+from src.models.lstm_numpy import NumpyLSTM
+from src.models.scaler import load_scaler
+from src.models.windows import LOOKBACK_WINDOW, N_FEATURES, TARGET_INDEX, stack_request_windows
+
+# CONFIG
+MODEL_PATH = "src/models/production_model.pt"
+SCALER_PATH = "src/models/scaler.json"
+LEGACY_SCALER_PATH = "src/models/scaler.pkl"  # sklearn pickle written by older trainers
+MIN_DATA_REQUIRED = LOOKBACK_WINDOW - 1
+MODEL_RUNTIME = os.getenv("MODEL_RUNTIME", "eager")  # eager | torchscript | torchscript_int8 | onnx | numpy
+STEPPER_RUNTIMES = ("eager", "numpy")  # Runtimes whose fp32 LSTM the prefix-state stepper reproduces
+
+if MODEL_RUNTIME not in RUNTIMES:
+    raise ValueError(f"MODEL_RUNTIME must be one of {RUNTIMES}, got '{MODEL_RUNTIME}'")
+
+def load_model_artifacts(model_path=MODEL_PATH, scaler_path=SCALER_PATH, runtime=MODEL_RUNTIME):
+    """
+    Loads the production (model, scaler) pair, with the model in `runtime`.
+
+    Versions exported before a runtime was available only have the eager
+    state dict; those fall back to eager with a warning. Returns
+    (model, scaler, runtime actually loaded).
+    """
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found at {model_path}. Run training first.")
+    if not os.path.exists(scaler_path):
+        raise FileNotFoundError(f"Scaler not found at {scaler_path}. Run training first.")
+
+    scaler = load_scaler(scaler_path)
+    try:
+        model = load_runtime_model(model_path, runtime)
+    except FileNotFoundError as e:
+        if runtime == "eager":
+            raise
+        print(f"⚠ {e}. Falling back to the eager model.")
+        model, runtime = load_runtime_model(model_path, "eager"), "eager"
+    return model, scaler, runtime
+
+# Immutable (model, scaler) pair served together; swapped as one reference.
+# `stepper` is the same weights as a NumpyLSTM (None if unavailable), used for prefix-state inference.
+ModelBundle = namedtuple("ModelBundle", ["version", "model", "scaler", "runtime", "stepper"])
+
+def load_stepper(model_path, model, runtime):
+    """
+    NumpyLSTM with the fp32 weights of the model at `model_path`, or None.
+
+    Uses the exported ``.npz`` when present, otherwise the state dict of an
+    already loaded eager model. Only the eager and numpy runtimes get one,
+    since the stepper computes the same fp32 LSTM. Any other runtime (onnx,
+    torchscript, torchscript_int8) was chosen explicitly. Stepping would
+    silently serve something other than that runtime, so it keeps the
+    full-window path.
+    """
+    if runtime not in STEPPER_RUNTIMES:
+        return None
+    if isinstance(model, NumpyLSTM):
+        return model
+    npz_path = runtime_path(model_path, "numpy")
+    if os.path.exists(npz_path):
+        return NumpyLSTM.load(npz_path)
+    if hasattr(model, "state_dict") and "lstm.weight_ih_l0" in model.state_dict():
+        return NumpyLSTM.from_state_dict(model.state_dict())
+    return None
+
+def _existing(path, legacy_path):
+    """`path`, or `legacy_path` if only the older artifact exists."""
+    return legacy_path if not os.path.exists(path) and os.path.exists(legacy_path) else path
+
+def load_bundle(version=None):
+    """
+    Loads a model version from the artifact registry.
+
+    Without an explicit `version`, this loads the registry's CURRENT
+    version. If the registry is empty, it falls back to the legacy
+    MODEL_PATH/SCALER_PATH files and labels them with their content hash.
+    """
+    version = version or registry.current_version()
+    if version is None:
+        scaler_path = _existing(SCALER_PATH, LEGACY_SCALER_PATH)
+        model, scaler, runtime = load_model_artifacts(MODEL_PATH, scaler_path)
+        legacy_version = registry.content_hash({
+            registry.MODEL_ARTIFACT: MODEL_PATH, os.path.basename(scaler_path): scaler_path
+        })
+        return ModelBundle(legacy_version, model, scaler, runtime, load_stepper(MODEL_PATH, model, runtime))
+
+    model_path = registry.artifact_path(version, registry.MODEL_ARTIFACT)
+    model, scaler, runtime = load_model_artifacts(
+        model_path,
+        _existing(
+            registry.artifact_path(version, registry.SCALER_ARTIFACT),
+            registry.artifact_path(version, registry.LEGACY_SCALER_ARTIFACT),
+        ),
+    )
+    return ModelBundle(version, model, scaler, runtime, load_stepper(model_path, model, runtime))
+
+# Column layout of the fitted scaler: TRAINING_COLUMNS (features first, then demand)
+def scale_features(scaler, x):
+    """MinMax-scales (..., N_FEATURES) raw feature values with the fitted scaler's parameters."""
+    return x * scaler.scale_[:N_FEATURES] + scaler.min_[:N_FEATURES]
+
+def inverse_scale_demand(scaler, y):
+    """Maps scaled demand predictions back to original units (non-negative)."""
+    return np.maximum(0, (y - scaler.min_[TARGET_INDEX]) / scaler.scale_[TARGET_INDEX])
+
+def build_windows(scaler, history, inputs):
+    """
+    Builds scaled model inputs for N requests sharing one history.
+
+    `history` is the oldest-first (MIN_DATA_REQUIRED, N_FEATURES) raw window
+    and `inputs` the (N, N_FEATURES) raw request rows. Returns a
+    (N, LOOKBACK_WINDOW, N_FEATURES) float32 array.
+    """
+    return stack_request_windows(scale_features(scaler, history), scale_features(scaler, inputs))
+
+def forward_batch(model, windows):
+    """Runs the model on a (B, LOOKBACK_WINDOW, N_FEATURES) float32 array of scaled windows."""
+    if isinstance(model, (OnnxModel, NumpyLSTM)):
+        return model(windows)[:, 0]
+    import torch  # Already loaded with the model; a cached sys.modules lookup here
+
+    with torch.no_grad():
+        return model(torch.from_numpy(windows)).numpy()[:, 0]
@@ -0,0 +1,89 @@
+# src/serving/prediction_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from prometheus_client import Counter, Gauge
+
+# CONFIG
+PREDICTION_CACHE_ENABLED = os.getenv("PREDICTION_CACHE_ENABLED", "0") == "1"
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", "300"))
+PREDICTION_CACHE_TEMP_STEP = float(os.getenv("PREDICTION_CACHE_TEMP_STEP", "0.1"))          # °C
+PREDICTION_CACHE_HUMIDITY_STEP = float(os.getenv("PREDICTION_CACHE_HUMIDITY_STEP", "0.5"))  # %
+
+CACHE_LOOKUPS = Counter("prediction_cache_lookups_total", "Prediction cache lookups by outcome", ["result"])
+CACHE_INVALIDATIONS = Counter(
+    "prediction_cache_invalidations_total", "Cache flushes caused by new history rows or a model swap"
+)
+CACHE_ENTRIES = Gauge("prediction_cache_entries", "Predictions currently cached")
+
+class PredictionCache:
+    """
+    Bounded LRU + TTL cache of /predict results.
+
+    Inputs are snapped to a grid (``temp_step`` / ``humidity_step``) and the
+    model runs on the grid point, so every request in a cell gets the same
+    answer however the cache is populated. Entries belong to one
+    *generation*, the (model version, history watermark) pair they were
+    computed against. A lookup from a different generation empties the
+    cache, so new feature rows and model swaps invalidate it without any
+    explicit hook.
+    """
+
+    def __init__(self, max_size=PREDICTION_CACHE_SIZE, ttl_s=PREDICTION_CACHE_TTL_S,
+                 temp_step=PREDICTION_CACHE_TEMP_STEP, humidity_step=PREDICTION_CACHE_HUMIDITY_STEP):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.steps = (temp_step, humidity_step)
+        self._entries = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+        self._hits = CACHE_LOOKUPS.labels("hit")
+        self._misses = CACHE_LOOKUPS.labels("miss")
+        self._expired = CACHE_LOOKUPS.labels("expired")
+        CACHE_ENTRIES.set_function(lambda: len(self._entries))
+
+    def quantize(self, *values):
+        """Returns (cache key, grid-point values) for one request's raw inputs."""
+        key = tuple(round(v / step) if step > 0 else v for v, step in zip(values, self.steps))
+        grid = tuple(k * step if step > 0 else k for k, step in zip(key, self.steps))
+        return key, grid
+
+    def get(self, generation, key):
+        """Returns the cached prediction, or None. Moves the cache to `generation` if it changed."""
+        with self._lock:
+            if generation != self._generation:
+                if self._entries:
+                    CACHE_INVALIDATIONS.inc()
+                self._entries.clear()
+                self._generation = generation
+                self._misses.inc()
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses.inc()
+                return None
+            value, expires_at = entry
+            if self.ttl_s > 0 and time.monotonic() > expires_at:
+                del self._entries[key]
+                self._expired.inc()
+                return None
+            self._entries.move_to_end(key)
+        self._hits.inc()
+        return value
+
+    def put(self, generation, key, value):
+        """Stores `value` unless the cache has already moved on to a newer generation."""
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl_s)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation = None
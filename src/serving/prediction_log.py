@@ -0,0 +1,303 @@
+# src/serving/prediction_log.py
+import os
+import gzip
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+from src.database.predictions import (
+    FILE_SUFFIXES, PREDICTION_LOG_COLUMNS, PREDICTION_LOG_DIR, PREDICTION_LOG_SINK, PREDICTION_LOG_SINKS, write_rows,
+)
+
+# CONFIG
+PREDICTION_LOG_ENABLED = os.getenv("PREDICTION_LOG_ENABLED", "0") == "1"
+PREDICTION_LOG_QUEUE_SIZE = int(os.getenv("PREDICTION_LOG_QUEUE_SIZE", "100000"))
+PREDICTION_LOG_BATCH_SIZE = int(os.getenv("PREDICTION_LOG_BATCH_SIZE", "1000"))
+PREDICTION_LOG_FLUSH_INTERVAL_S = float(os.getenv("PREDICTION_LOG_FLUSH_INTERVAL_S", "1"))
+PREDICTION_LOG_OVERFLOW = os.getenv("PREDICTION_LOG_OVERFLOW", "drop_newest")  # drop_newest | drop_oldest | block
+PREDICTION_LOG_BLOCK_TIMEOUT_S = float(os.getenv("PREDICTION_LOG_BLOCK_TIMEOUT_S", "0.01"))
+PREDICTION_LOG_MAX_RETRIES = int(os.getenv("PREDICTION_LOG_MAX_RETRIES", "3"))
+PREDICTION_LOG_ROTATE_ROWS = int(os.getenv("PREDICTION_LOG_ROTATE_ROWS", "1000000"))
+PREDICTION_LOG_ROTATE_S = float(os.getenv("PREDICTION_LOG_ROTATE_S", "300"))
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest", "block")
+
+LOG_QUEUE_DEPTH = Gauge("prediction_log_queue_depth", "Predictions waiting to be written")
+LOG_LAG = Gauge("prediction_log_lag_seconds", "Age of the oldest prediction still waiting to be written")
+LOG_LAST_FLUSH = Gauge("prediction_log_last_flush_timestamp_seconds", "Unix time of the last successful flush")
+LOG_WRITTEN = Counter("prediction_log_written_total", "Predictions written to the log sink")
+LOG_DROPPED = Counter("prediction_log_dropped_total", "Predictions not logged", ["reason"])
+LOG_FLUSH_SECONDS = Histogram(
+    "prediction_log_flush_seconds",
+    "Time to write one batch to the sink",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+def _timestamp(value):
+    """'YYYY-MM-DD HH:MM:SS.ffffff' (the layout `ingest` writes) from a datetime, Timestamp or string; None stays None."""
+    if value is None:
+        return None
+    return str(np.datetime64(value, "us")).replace("T", " ")
+
+def _format(record):
+    logged_at, *rest, watermark = record
+    logged_at = datetime.fromtimestamp(logged_at, timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+    return (logged_at, *rest, _timestamp(watermark))
+
+class DatabaseSink:
+    """Appends each batch to the `prediction_log` table (COPY on Postgres, executemany on SQLite)."""
+
+    retryable = True  # One transaction per batch: a failed write leaves nothing behind
+
+    def __init__(self):
+        self._schema_ready = False
+
+    def write(self, rows):
+        write_rows(rows, ensure_schema=not self._schema_ready)
+        self._schema_ready = True
+
+    def tick(self):
+        pass
+
+    def close(self):
+        pass
+
+class FileSink:
+    """
+    Rotating gzip JSONL or Parquet files under `directory`.
+
+    The open file is named ``<final name>.part`` and renamed once it holds
+    `rotate_rows` rows, is `rotate_s` seconds old, or the sink is closed.
+    JSONL batches are flushed as complete gzip blocks, so a crash loses
+    at most the batch being written. A failed write may have left part of
+    the batch in the file, so it is not retried: the file is abandoned
+    under its ``.part`` name and the next batch starts a fresh one.
+    """
+
+    retryable = False
+
+    def __init__(self, fmt, directory=PREDICTION_LOG_DIR, rotate_rows=PREDICTION_LOG_ROTATE_ROWS,
+                 rotate_s=PREDICTION_LOG_ROTATE_S):
+        if fmt not in FILE_SUFFIXES:
+            raise ValueError(f"Unknown file format '{fmt}'. Use one of {tuple(FILE_SUFFIXES)}")
+        self.fmt = fmt
+        self.directory = directory
+        self.rotate_rows = rotate_rows
+        self.rotate_s = rotate_s
+        self._file = None
+        self._path = None
+        self._rows = 0
+        self._opened_at = 0.0
+        self._sequence = 0
+        if fmt == "parquet":
+            import pyarrow  # noqa: F401  Fail at startup rather than on every batch
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        self._sequence += 1
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        name = f"predictions-{stamp}-{os.getpid()}-{self._sequence:04d}{FILE_SUFFIXES[self.fmt]}"
+        self._path = os.path.join(self.directory, name)
+        if self.fmt == "jsonl":
+            self._file = gzip.open(self._path + ".part", "wt", encoding="utf-8")
+        else:
+            import pyarrow as pa  # Optional: only needed for PREDICTION_LOG_SINK=parquet
+            import pyarrow.parquet as pq
+
+            schema = pa.schema([
+                (column, pa.float64() if column in ("temperature", "humidity", "predicted_demand") else pa.string())
+                for column in PREDICTION_LOG_COLUMNS
+            ])
+            self._file = pq.ParquetWriter(self._path + ".part", schema)
+        self._rows = 0
+        self._opened_at = time.monotonic()
+
+    def write(self, rows):
+        if self._file is None:
+            self._open()
+        try:
+            self._write(rows)
+        except Exception:
+            self._abandon()
+            raise
+        self._rows += len(rows)
+        if self._rows >= self.rotate_rows:
+            self.close()
+        else:
+            self.tick()
+
+    def _write(self, rows):
+        if self.fmt == "jsonl":
+            self._file.writelines(json.dumps(dict(zip(PREDICTION_LOG_COLUMNS, row))) + "\n" for row in rows)
+            self._file.flush()
+        else:
+            import pyarrow as pa
+
+            columns = {name: [row[i] for row in rows] for i, name in enumerate(PREDICTION_LOG_COLUMNS)}
+            self._file.write_table(pa.table(columns, schema=self._file.schema))  # One row group per batch
+
+    def _abandon(self):
+        """Drops the open file without publishing it, so no reader sees a half-written batch."""
+        file, self._file = self._file, None
+        try:
+            file.close()
+        except Exception:
+            pass
+        print(f"⚠ Abandoned prediction log file {self._path}.part after a failed write")
+
+    def tick(self):
+        """Rotates the open file once it is `rotate_s` old, so quiet periods still publish their rows."""
+        if self._file is not None and time.monotonic() - self._opened_at >= self.rotate_s:
+            self.close()
+
+    def close(self):
+        """Finishes the open file and publishes it under its final name."""
+        if self._file is None:
+            return
+        self._file.close()
+        os.replace(self._path + ".part", self._path)
+        self._file = None
+
+def make_sink(name=PREDICTION_LOG_SINK):
+    if name not in PREDICTION_LOG_SINKS:
+        raise ValueError(f"Unknown prediction log sink '{name}'. Use one of {PREDICTION_LOG_SINKS}")
+    return DatabaseSink() if name == "db" else FileSink(name)
+
+class PredictionLog:
+    """
+    Write-behind log of served predictions.
+
+    `record` only timestamps a tuple and puts it on a bounded queue. A
+    background thread drains the queue in batches of up to `batch_size`,
+    or whatever arrived within `flush_interval` of the first queued
+    record, and writes each batch to the sink in one call. When the queue
+    is full, the `overflow` policy applies:
+
+    - drop_newest: the new record is dropped (request latency never changes).
+    - drop_oldest: the oldest queued record makes room for it.
+    - block: the request waits up to PREDICTION_LOG_BLOCK_TIMEOUT_S, then drops.
+
+    A failed write to a retryable sink is retried PREDICTION_LOG_MAX_RETRIES
+    times with backoff before the batch is dropped; other sinks drop it at
+    once. `stop` waits for the writer thread, then drains and writes
+    everything still queued and closes the sink.
+    """
+
+    def __init__(self, sink=None, max_queue_size=PREDICTION_LOG_QUEUE_SIZE, batch_size=PREDICTION_LOG_BATCH_SIZE,
+                 flush_interval=PREDICTION_LOG_FLUSH_INTERVAL_S, overflow=PREDICTION_LOG_OVERFLOW):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'. Use one of {OVERFLOW_POLICIES}")
+        self.sink = sink if sink is not None else make_sink()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._worker = None
+        LOG_QUEUE_DEPTH.set_function(self._queue.qsize)
+        LOG_LAG.set_function(self._lag)
+
+    def _lag(self):
+        try:
+            return max(0.0, time.time() - self._queue.queue[0][0])
+        except IndexError:
+            return 0.0
+
+    def record(self, endpoint, model_version, temperature, humidity, predicted_demand, watermark=None, entity_id=None):
+        """Hot path: queues one served prediction. Never raises."""
+        item = (time.time(), endpoint, model_version, entity_id, temperature, humidity, predicted_demand, watermark)
+        try:
+            self._queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow == "drop_oldest":
+            try:
+                self._queue.get_nowait()
+                LOG_DROPPED.labels("overflow").inc()
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+        elif self.overflow == "block":
+            try:
+                self._queue.put(item, timeout=PREDICTION_LOG_BLOCK_TIMEOUT_S)
+                return
+            except queue.Full:
+                pass
+        LOG_DROPPED.labels("overflow").inc()
+
+    def start(self):
+        if self._worker is not None:
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout=10):
+        """Stops the writer and flushes what is still queued, unless the writer is still busy after `timeout`."""
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join(timeout=timeout)
+            if self._worker.is_alive():
+                # The sink is not thread-safe: leave the queue and the open file to the writer
+                print(f"⚠ Prediction log writer busy after {timeout}s, {self._queue.qsize()} records not flushed")
+                return
+            self._worker = None
+        while True:
+            batch = self._take(block=False)
+            if not batch:
+                break
+            self._flush(batch)
+        self.sink.close()
+
+    def _take(self, block=True):
+        """Up to `batch_size` records: waits for the first, then for at most `flush_interval` more."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait()]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + (self.flush_interval if block else 0)
+        while len(batch) < self.batch_size:
+            try:
+                remaining = deadline - time.monotonic()
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch):
+        rows = [_format(record) for record in batch]
+        retries = PREDICTION_LOG_MAX_RETRIES if self.sink.retryable else 0
+        for attempt in range(retries + 1):
+            try:
+                with LOG_FLUSH_SECONDS.time():
+                    self.sink.write(rows)
+                LOG_WRITTEN.inc(len(rows))
+                LOG_LAST_FLUSH.set(time.time())
+                return True
+            except Exception as e:
+                if attempt == retries:
+                    print(f"✗ Prediction log write failed, dropping {len(rows)} records: {e}")
+                    break
+                print(f"⚠ Prediction log write failed (attempt {attempt + 1}): {e}")
+                time.sleep(min(0.5 * 2 ** attempt, 5))
+        LOG_DROPPED.labels("write_error").inc(len(rows))
+        return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._take()
+            if batch:
+                self._flush(batch)
+            try:
+                self.sink.tick()
+            except Exception as e:
+                print(f"⚠ Prediction log rotation failed: {e}")
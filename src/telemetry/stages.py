@@ -0,0 +1,96 @@
+# src/telemetry/stages.py
+"""
+Per-stage wall-clock timing for the serving path and the batch jobs.
+
+Every stage is observed into one Prometheus histogram,
+``pipeline_stage_seconds{pipeline, stage}``. Long-running processes (the
+API) are scraped as usual. Short-lived jobs (trainer, drift monitor,
+Prefect flow) keep per-run totals, print a breakdown at the end, and push
+them to a Prometheus Pushgateway when PUSHGATEWAY_URL is set.
+"""
+import os
+import time
+from prometheus_client import Histogram
+
+# CONFIG
+PUSHGATEWAY_URL = os.getenv("PUSHGATEWAY_URL", "")  # e.g. pushgateway:9091; empty disables pushing
+
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds",
+    "Wall time spent in one stage of a pipeline",
+    ["pipeline", "stage"],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+             0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+
+class _Stage:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+class StageTimer:
+    """
+    Times named stages of one pipeline: ``with timer.stage("forward"): ...``
+
+    Safe to share between request threads. With `track_totals=True` (batch
+    jobs, one run per timer), it also accumulates per-stage seconds for
+    `report` and `push`.
+    """
+
+    def __init__(self, pipeline, track_totals=False):
+        self.pipeline = pipeline
+        self.totals = {} if track_totals else None
+        self._children = {}  # Pre-resolved histogram children; skips the labels() lookup per request
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def observe(self, name, seconds):
+        child = self._children.get(name)
+        if child is None:
+            child = self._children[name] = STAGE_SECONDS.labels(self.pipeline, name)
+        child.observe(seconds)
+        if self.totals is not None:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    def report(self):
+        """Prints the per-stage breakdown of this run."""
+        if not self.totals:
+            return
+        total = sum(self.totals.values())
+        print(f"Stage timings ({self.pipeline}, {total:.2f}s):")
+        for name, seconds in self.totals.items():
+            print(f"  {name:<20} {seconds:>9.3f}s {100 * seconds / total if total else 0:>5.1f}%")
+
+    def push(self, gateway=PUSHGATEWAY_URL):
+        """Pushes this run's per-stage totals to the Pushgateway (job = pipeline name)."""
+        if not gateway or not self.totals:
+            return
+        from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+
+        registry = CollectorRegistry()
+        last = Gauge("pipeline_stage_last_run_seconds", "Per-stage wall time of the last run", ["stage"],
+                     registry=registry)
+        for name, seconds in self.totals.items():
+            last.labels(name).set(seconds)
+        Gauge("pipeline_last_run_timestamp_seconds", "Unix time the last run finished",
+              registry=registry).set_to_current_time()
+        try:
+            push_to_gateway(gateway, job=self.pipeline, registry=registry)
+        except Exception as e:
+            # Metrics are best-effort; never fail a training or drift run over them
+            print(f"⚠ Could not push stage timings to {gateway}: {e}")
+
+    def finish(self):
+        self.report()
+        self.push()
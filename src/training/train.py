@@ -1,105 +1,459 @@
 # src/training/train.py
 import sys
 import os
-import pickle
+import time
+import json
+import argparse
+import pandas as pd
 import numpy as np
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.metrics import mean_squared_error
+from torch.utils.data import ConcatDataset, DataLoader, Subset
 
 # Fix paths
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from src.database.db import load_data
+from src.database.predictions import load_predictions, served_errors
+from src.database.snapshot import FEATURE_SNAPSHOT_ENABLED, open_snapshot
+from src.models import registry
+from src.models.export import export_model, runtime_path
 from src.models.lstm import DemandLSTM
+from src.models.scaler import FeatureScaler, load_scaler
+from src.models.windows import LOOKBACK_WINDOW, N_FEATURES, TRAINING_COLUMNS, WindowDataset
+from src.telemetry.stages import StageTimer
 
 # CONFIG
-LOOKBACK_WINDOW = 30
-EPOCHS = 20
-BATCH_SIZE = 32
+EPOCHS = int(os.getenv("TRAIN_EPOCHS", "20"))
+BATCH_SIZE = int(os.getenv("TRAIN_BATCH_SIZE", "32"))
+LEARNING_RATE = float(os.getenv("TRAIN_LEARNING_RATE", "0.01"))
+TRAIN_MODE = os.getenv("TRAIN_MODE", "minibatch")  # "minibatch" or "fullbatch"
+NUM_WORKERS = int(os.getenv("TRAIN_NUM_WORKERS", "2"))
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))  # 0 keeps torch's default
+VALIDATION_SPLIT = float(os.getenv("TRAIN_VALIDATION_SPLIT", "0.1"))
+EARLY_STOPPING_PATIENCE = int(os.getenv("TRAIN_EARLY_STOPPING_PATIENCE", "3"))
+MAX_TRAIN_SECONDS = float(os.getenv("TRAIN_MAX_SECONDS", "0"))  # 0 disables the time budget
+CHECKPOINT_EVERY = int(os.getenv("TRAIN_CHECKPOINT_EVERY", "1"))
 MODEL_PATH = "src/models/production_model.pt"
-SCALER_PATH = "src/models/scaler.pkl"
+SCALER_PATH = "src/models/scaler.json"
+LEGACY_SCALER_PATH = "src/models/scaler.pkl"  # sklearn pickle written by older versions
+CHECKPOINT_PATH = "src/models/checkpoints/train_checkpoint.pt"
+TRAIN_STATE_PATH = "src/models/train_state.json"
 MIN_DATA_REQUIRED = LOOKBACK_WINDOW + 1  # Need at least this many samples
 
-def create_sequences(data, seq_length):
-    xs, ys = [], []
-    for i in range(len(data) - seq_length):
-        x_window = data[i:(i + seq_length)]
-        y_target = data[i + seq_length, -1]
-        xs.append(x_window)
-        ys.append(y_target)
-    return np.array(xs), np.array(ys)
+# Incremental (warm-start) retraining
+INCREMENTAL_EPOCHS = int(os.getenv("INCREMENTAL_EPOCHS", "5"))
+INCREMENTAL_LEARNING_RATE = float(os.getenv("INCREMENTAL_LEARNING_RATE", "0.001"))
+REPLAY_BLOCKS = int(os.getenv("REPLAY_BLOCKS", "8"))
+REPLAY_BLOCK_SIZE = int(os.getenv("REPLAY_BLOCK_SIZE", str(4 * LOOKBACK_WINDOW)))
+SERVED_FEEDBACK_ENABLED = os.getenv("TRAIN_SERVED_FEEDBACK", "1") == "1"  # Score logged predictions against actuals
 
-def train_model():
+def make_loaders(segments, mode=TRAIN_MODE):
+    """
+    Chronological train/validation split over lazily indexed windows.
+
+    `segments` is a list of scaled arrays, each made of consecutive rows.
+    Windows never cross segment boundaries. The last segment must be the
+    newest data: its most recent VALIDATION_SPLIT of windows form the
+    validation set, so early stopping measures how well the model
+    forecasts the newest data.
+    """
+    datasets = [WindowDataset(seg, LOOKBACK_WINDOW) for seg in segments]
+    newest = datasets[-1]
+    if len(newest) == 0:
+        raise ValueError("No sequences created. Check LOOKBACK_WINDOW vs data size.")
+
+    n_val = int(len(newest) * VALIDATION_SPLIT)
+    n_newest_train = len(newest) - n_val
+    train_parts = [ds for ds in datasets[:-1] if len(ds) > 0] + [Subset(newest, range(n_newest_train))]
+    train_ds = ConcatDataset(train_parts)
+    val_ds = Subset(newest, range(n_newest_train, len(newest))) if n_val > 0 else None
+    n_train = len(train_ds)
+
+    if mode == "fullbatch":
+        batch_size, shuffle, workers = n_train, False, 0
+    elif mode == "minibatch":
+        batch_size, shuffle, workers = BATCH_SIZE, True, NUM_WORKERS
+    else:
+        raise ValueError(f"Unknown TRAIN_MODE '{mode}' (use 'minibatch' or 'fullbatch')")
+
+    train_loader = DataLoader(
+        train_ds, batch_size=batch_size, shuffle=shuffle,
+        num_workers=workers, persistent_workers=workers > 0,
+    )
+    val_loader = None
+    if val_ds is not None:
+        val_loader = DataLoader(val_ds, batch_size=max(BATCH_SIZE, 1024), shuffle=False)
+    print(f"Created {n_train + n_val} sequences ({n_train} train / {n_val} validation, mode={mode})")
+    return train_loader, val_loader
+
+def evaluate(model, loader, criterion):
+    """Mean loss over a loader, weighted by batch size."""
+    model.eval()
+    total, count = 0.0, 0
+    with torch.no_grad():
+        for X, y in loader:
+            total += criterion(model(X), y).item() * len(X)
+            count += len(X)
+    model.train()
+    return total / max(count, 1)
+
+def _save_checkpoint(state, path=CHECKPOINT_PATH):
+    # Write-then-rename so an interrupted save never corrupts the last good checkpoint
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+def _load_checkpoint(run_id, path=CHECKPOINT_PATH):
+    """Returns the checkpoint for this exact training run, or None."""
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        state = torch.load(path, weights_only=True)
+    except Exception as e:
+        print(f"⚠ Ignoring unreadable checkpoint: {e}")
+        return None
+    if state.get("run_id") != run_id:
+        print("⚠ Ignoring checkpoint from a different dataset/configuration")
+        return None
+    return state
+
+def fit(model, train_loader, val_loader, run_id, epochs=EPOCHS, lr=LEARNING_RATE, checkpoint_path=CHECKPOINT_PATH):
+    """
+    Trains `model` in place with early stopping and periodic checkpoints.
+
+    `run_id` identifies the dataset and configuration. A checkpoint left
+    behind by an interrupted run with the same id is resumed, and any
+    other checkpoint is ignored (`checkpoint_path=None` disables
+    checkpointing). The best-validation weights are restored
+    before returning. Returns the RMSE on validation, or on train when
+    there is no validation split.
+    """
+    criterion = nn.MSELoss()
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+
+    start_epoch, best_loss, best_state, stale_epochs = 0, float("inf"), None, 0
+    checkpoint = _load_checkpoint(run_id, checkpoint_path)
+    if checkpoint is not None:
+        model.load_state_dict(checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        start_epoch = checkpoint["epoch"]
+        best_loss = checkpoint["best_loss"]
+        best_state = checkpoint["best_state"]
+        stale_epochs = checkpoint["stale_epochs"]
+        print(f"✓ Resuming from checkpoint at epoch {start_epoch}/{epochs}")
+
+    started = time.monotonic()
+    model.train()
+    for epoch in range(start_epoch, epochs):
+        running, seen = 0.0, 0
+        for X, y in train_loader:
+            optimizer.zero_grad()
+            loss = criterion(model(X), y)
+            loss.backward()
+            optimizer.step()
+            running += loss.item() * len(X)
+            seen += len(X)
+        train_loss = running / max(seen, 1)
+        val_loss = evaluate(model, val_loader, criterion) if val_loader is not None else train_loss
+
+        if val_loss < best_loss:
+            best_loss = val_loss
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+            stale_epochs = 0
+        else:
+            stale_epochs += 1
+
+        print(f"  Epoch {epoch+1}/{epochs}, Train Loss: {train_loss:.6f}, Val Loss: {val_loss:.6f}")
+
+        if checkpoint_path is not None and CHECKPOINT_EVERY > 0 and (epoch + 1) % CHECKPOINT_EVERY == 0:
+            _save_checkpoint({
+                "run_id": run_id,
+                "epoch": epoch + 1,
+                "model": model.state_dict(),
+                "optimizer": optimizer.state_dict(),
+                "best_loss": best_loss,
+                "best_state": best_state,
+                "stale_epochs": stale_epochs,
+            }, checkpoint_path)
+
+        if EARLY_STOPPING_PATIENCE > 0 and stale_epochs >= EARLY_STOPPING_PATIENCE:
+            print(f"  Early stopping: no validation improvement for {stale_epochs} epochs")
+            break
+        if MAX_TRAIN_SECONDS > 0 and time.monotonic() - started > MAX_TRAIN_SECONDS:
+            print(f"  Stopping: training time budget of {MAX_TRAIN_SECONDS:.0f}s reached")
+            break
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    return float(np.sqrt(best_loss))
+
+def load_train_state():
+    """Returns the metadata of the last successful training run, or None."""
+    if not os.path.exists(TRAIN_STATE_PATH):
+        return None
+    with open(TRAIN_STATE_PATH) as f:
+        return json.load(f)
+
+def save_artifacts(model, scaler, watermark, rmse, mode, served=None):
+    """
+    Saves model, scaler and the training watermark once training succeeded.
+
+    Alongside the state dict, the model is exported to the optimized
+    runtimes in EXPORT_RUNTIMES (TorchScript, int8 TorchScript, ONNX).
+
+    Each file is written next to its target and renamed into place, so a
+    concurrent reader never sees a partial file. The pair is then published
+    to the model registry as a new version, which serving processes pick up
+    without restarting.
+    """
+    tmp_model = MODEL_PATH + ".tmp"
+    torch.save(model.state_dict(), tmp_model)
+    os.replace(tmp_model, MODEL_PATH)
+    scaler.save(SCALER_PATH)
+    exported = export_model(model, MODEL_PATH)
+
+    state = {
+        "watermark": pd.Timestamp(watermark).isoformat(),
+        "rmse": rmse,
+        "mode": mode,
+        "trained_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "runtimes": ["eager", *exported],
+    }
+    if served is not None:
+        state["served"] = served  # How the previously served models did on traffic now observed
+    artifacts = {registry.MODEL_ARTIFACT: MODEL_PATH, registry.SCALER_ARTIFACT: SCALER_PATH}
+    for runtime, path in exported.items():
+        artifacts[os.path.basename(runtime_path(registry.MODEL_ARTIFACT, runtime))] = path
+    version = registry.publish(artifacts, metadata=state)
+    state["version"] = version
+    tmp_path = TRAIN_STATE_PATH + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, TRAIN_STATE_PATH)
+
+    if os.path.exists(CHECKPOINT_PATH):
+        os.remove(CHECKPOINT_PATH)
+    print(f"✓ Model saved to {MODEL_PATH}, scaler saved to {SCALER_PATH} (watermark: {state['watermark']})")
+    print(f"✓ Published model version {version} to {registry.REGISTRY_DIR}")
+
+def _load_replay_blocks(watermark):
+    """Samples REPLAY_BLOCKS random runs of consecutive rows from before `watermark`."""
+    if REPLAY_BLOCKS <= 0:
+        return []
+    bounds = load_data(
+        "SELECT MIN(date) AS first_date FROM features WHERE date <= :wm",
+        {"wm": watermark}, warn_empty=False,
+    )
+    first_date = bounds["first_date"].iloc[0] if not bounds.empty else None
+    if first_date is None or pd.isna(first_date):
+        return []
+
+    # Uniform random start dates; each block is read with an index range scan
+    first, last = pd.Timestamp(first_date).value, pd.Timestamp(watermark).value
+    starts = np.sort(np.random.randint(first, max(last, first + 1), size=REPLAY_BLOCKS, dtype=np.int64))
+    blocks = []
+    for start in starts:
+        block = load_data(
+            f"""
+            SELECT {', '.join(TRAINING_COLUMNS)} FROM features
+            WHERE date >= :start AND date <= :wm
+            ORDER BY date ASC
+            LIMIT {REPLAY_BLOCK_SIZE}
+            """,
+            {"start": pd.Timestamp(start).to_pydatetime(), "wm": watermark},
+            warn_empty=False,
+        )
+        if len(block) > LOOKBACK_WINDOW:
+            blocks.append(block[TRAINING_COLUMNS].values)
+    return blocks
+
+def _load_all_rows():
+    """(dates, values) of the whole table, oldest first; values follow TRAINING_COLUMNS."""
+    if FEATURE_SNAPSHOT_ENABLED:
+        snapshot = open_snapshot()  # Only rows after the snapshot watermark cross the wire
+        return snapshot.dates, snapshot.values
+    df = load_data(f"SELECT date, {', '.join(TRAINING_COLUMNS)} FROM features ORDER BY date ASC")
+    return df["date"].values, df[TRAINING_COLUMNS].values
+
+def _snapshot_replay_blocks(history):
+    """Same sampling as `_load_replay_blocks`, as zero-copy slices of the snapshot rows before the watermark."""
+    if REPLAY_BLOCKS <= 0 or len(history) == 0:
+        return []
+    starts = np.sort(np.random.randint(0, len(history), size=REPLAY_BLOCKS))
+    blocks = [history[start:start + REPLAY_BLOCK_SIZE] for start in starts]
+    return [block for block in blocks if len(block) > LOOKBACK_WINDOW]
+
+def _load_incremental_rows(watermark):
+    """
+    Rows needed to fine-tune from `watermark`.
+
+    Returns (new dates, new rows, context rows, replay blocks). The context
+    is the LOOKBACK_WINDOW rows up to the watermark.
+    """
+    if FEATURE_SNAPSHOT_ENABLED:
+        snapshot = open_snapshot()
+        start = snapshot.index_after(watermark)
+        context = snapshot.values[max(0, start - LOOKBACK_WINDOW):start]
+        replay = _snapshot_replay_blocks(snapshot.values[:start])
+        return snapshot.dates[start:], snapshot.values[start:], context, replay
+
+    new_df = load_data(
+        f"SELECT date, {', '.join(TRAINING_COLUMNS)} FROM features WHERE date > :wm ORDER BY date ASC",
+        {"wm": watermark}, warn_empty=False,
+    )
+    if new_df.empty:
+        return new_df["date"].values, new_df[TRAINING_COLUMNS].values, None, []
+    context_df = load_data(
+        f"""
+        SELECT date, {', '.join(TRAINING_COLUMNS)} FROM features
+        WHERE date <= :wm ORDER BY date DESC LIMIT {LOOKBACK_WINDOW}
+        """,
+        {"wm": watermark}, warn_empty=False,
+    ).sort_values(by="date", ascending=True)
+    context = context_df[TRAINING_COLUMNS].values
+    return new_df["date"].values, new_df[TRAINING_COLUMNS].values, context, _load_replay_blocks(watermark)
+
+def _served_feedback(dates, values, previous_date=None):
+    """
+    Error of logged /predict answers whose demand has since been observed in `dates`/`values`.
+
+    Returns the `served_errors` summary, or None when feedback is disabled,
+    nothing matched, or the prediction log cannot be read.
+    """
+    if not SERVED_FEEDBACK_ENABLED:
+        return None
+    try:
+        predictions = load_predictions(min_watermark=previous_date if previous_date is not None else dates[0])
+        report = served_errors(predictions, dates, values, previous_date)
+    except Exception as e:
+        print(f"⚠ Served-prediction feedback skipped: {e}")
+        return None
+    if report is not None:
+        print(f"Served predictions with observed demand: {report['n']} "
+              f"(RMSE {report['rmse']:.2f}, MAE {report['mae']:.2f})")
+    return report
+
+def train_incremental(state, timer):
+    """
+    Fine-tunes the production model on rows newer than the last watermark.
+
+    The new rows are prefixed with the LOOKBACK_WINDOW rows before the
+    watermark, so the first new rows still get full windows. Random blocks
+    of older history are mixed in as replay to limit forgetting. The
+    scaler is updated with `partial_fit`, which only widens its min/max.
+    """
+    watermark = pd.Timestamp(state["watermark"]).to_pydatetime()
+
+    # 1. Load only what is new, plus context and replay
+    with timer.stage("load_data"):
+        new_dates, new_rows, context, replay = _load_incremental_rows(watermark)
+        if len(new_rows) == 0:
+            print(f"✓ No new rows since {state['watermark']}. Keeping current model.")
+            return state["rmse"]
+        recent = np.concatenate([context, new_rows])
+    print(f"Loaded {len(new_rows)} new rows (+{len(context)} context, {sum(len(b) for b in replay)} replay)")
+
+    with timer.stage("served_feedback"):
+        served = _served_feedback(new_dates, new_rows, previous_date=watermark)
+
+    if len(recent) < MIN_DATA_REQUIRED:
+        raise ValueError(f"Insufficient data: {len(recent)} samples (need {MIN_DATA_REQUIRED})")
+
+    # 2. Update scaler statistics with the new rows only
+    with timer.stage("scale"):
+        scaler = load_scaler(SCALER_PATH if os.path.exists(SCALER_PATH) else LEGACY_SCALER_PATH)
+        scaler.partial_fit(new_rows)
+        segments = [scaler.transform(seg).astype(np.float32) for seg in replay + [recent]]
+
+    # 3. Warm start from the production weights
+    with timer.stage("build_loaders"):
+        model = DemandLSTM(input_size=N_FEATURES, hidden_size=50)
+        model.load_state_dict(torch.load(MODEL_PATH, weights_only=True))
+        train_loader, val_loader = make_loaders(segments)
+
+    with timer.stage("fit"):
+        run_id = f"incremental:{state['watermark']}:{new_dates[-1]}:{TRAIN_MODE}:{BATCH_SIZE}"
+        rmse = fit(model, train_loader, val_loader, run_id,
+                   epochs=INCREMENTAL_EPOCHS, lr=INCREMENTAL_LEARNING_RATE)
+
+    # 4. Save and advance the watermark
+    with timer.stage("save_artifacts"):
+        save_artifacts(model, scaler, new_dates[-1], rmse, mode="incremental", served=served)
+    print(f"✓ Incremental Retraining Complete. New RMSE: {rmse:.4f}")
+    return rmse
+
+def train_model(incremental=False):
+    """
+    Retrains the production model.
+
+    With `incremental=True`, fine-tunes from the current weights on rows
+    newer than the last training watermark. This falls back to a full
+    rebuild when no previous model, scaler or watermark exists. Per-stage
+    timings are printed at the end and pushed to PUSHGATEWAY_URL if set.
+    """
     print("Starting Retraining...")
-    
+    timer = StageTimer("train", track_totals=True)
+
     try:
+        if TORCH_NUM_THREADS > 0:
+            torch.set_num_threads(TORCH_NUM_THREADS)
+
+        if incremental:
+            state = load_train_state()
+            has_scaler = os.path.exists(SCALER_PATH) or os.path.exists(LEGACY_SCALER_PATH)
+            if state is not None and os.path.exists(MODEL_PATH) and has_scaler:
+                return train_incremental(state, timer)
+            print("⚠ No previous training watermark found. Falling back to full retraining.")
+
         # 1. Load ALL data (including the new drifted data)
-        df = load_data("SELECT temperature, humidity, demand FROM features ORDER BY date ASC")
-        
-        if len(df) < MIN_DATA_REQUIRED:
-            raise ValueError(f"Insufficient data: {len(df)} samples (need {MIN_DATA_REQUIRED})")
-        
-        print(f"Loaded {len(df)} training samples")
-        
+        with timer.stage("load_data"):
+            dates, data = _load_all_rows()
+
+        if len(data) < MIN_DATA_REQUIRED:
+            raise ValueError(f"Insufficient data: {len(data)} samples (need {MIN_DATA_REQUIRED})")
+
+        print(f"Loaded {len(data)} training samples")
+
+        with timer.stage("served_feedback"):
+            served = _served_feedback(dates, data)
+
         # 2. Scale
-        scaler = MinMaxScaler()
-        data_scaled = scaler.fit_transform(df.values)
-        
-        # Save scaler for inference
-        with open(SCALER_PATH, 'wb') as f:
-            pickle.dump(scaler, f)
-        print(f"Scaler fitted and saved to {SCALER_PATH}")
-        
-        # 3. Create Sequences
-        X_all, y_all = create_sequences(data_scaled, LOOKBACK_WINDOW)
-        
-        if len(X_all) == 0:
-            raise ValueError("No sequences created. Check LOOKBACK_WINDOW vs data size.")
-        
-        X_train = X_all[:, :, :2]  # Extract only temp/humidity
-        y_train = y_all
-        
-        print(f"Created {len(X_train)} sequences")
-        
+        with timer.stage("scale"):
+            scaler = FeatureScaler()
+            data_scaled = scaler.fit_transform(data).astype(np.float32)
+
+        # 3. Create lazily indexed sequences (no per-window copies)
+        with timer.stage("build_loaders"):
+            train_loader, val_loader = make_loaders([data_scaled])
+
         # 4. Train
-        X_tensor = torch.from_numpy(X_train).float()
-        y_tensor = torch.from_numpy(y_train).float().view(-1, 1)
-        
-        model = DemandLSTM(input_size=2, hidden_size=50)
-        criterion = nn.MSELoss()
-        optimizer = optim.Adam(model.parameters(), lr=0.01)
-        
-        model.train()
-        for epoch in range(EPOCHS):
-            optimizer.zero_grad()
-            output = model(X_tensor)
-            loss = criterion(output, y_tensor)
-            loss.backward()
-            optimizer.step()
-            
-            if (epoch + 1) % 5 == 0:
-                print(f"  Epoch {epoch+1}/{EPOCHS}, Loss: {loss.item():.6f}")
-        
-        # 5. Calculate Final RMSE
-        final_loss = loss.item()
-        rmse = np.sqrt(final_loss)
-        
-        # 6. Save
-        torch.save(model.state_dict(), MODEL_PATH)
+        with timer.stage("fit"):
+            run_id = f"{len(data)}:{scaler.data_min_.tolist()}:{scaler.data_max_.tolist()}:{TRAIN_MODE}:{BATCH_SIZE}"
+            model = DemandLSTM(input_size=N_FEATURES, hidden_size=50)
+            rmse = fit(model, train_loader, val_loader, run_id)
+
+        # 5. Save model, scaler and watermark together, only once training succeeded
+        with timer.stage("save_artifacts"):
+            save_artifacts(model, scaler, dates[-1], rmse, mode="full", served=served)
         print(f"✓ Retraining Complete. New RMSE: {rmse:.4f}")
-        print(f"✓ Model saved to {MODEL_PATH}")
-        
+
         return rmse
-        
+
     except Exception as e:
         print(f"✗ Training failed: {e}")
         raise
+    finally:
+        timer.finish()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrain the demand forecasting model.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Fine-tune on rows newer than the last training watermark")
+    args = parser.parse_args()
     try:
-        train_model()
+        train_model(incremental=args.incremental)
     except Exception as e:
         print(f"✗ Training script failed: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,208 @@
+# src/training/train_entities.py
+"""
+Trains forecasting models for many series (stores, regions) from `entity_features`.
+
+Entities are assigned to ENTITY_SHARDS shards by a stable hash of their id.
+Shards are trained in parallel by a process pool, and each worker reads
+its own shard from the database. Every entity gets its own min/max scaler,
+so series at very different scales can share a model. ENTITY_MODEL_SCOPE
+picks the granularity:
+
+- "shard": one DemandLSTM per shard, trained on the windows of all its
+  entities. Many small series then make one well-fed batched model.
+- "entity": one DemandLSTM per entity, trained one after another inside
+  its shard's worker.
+
+All shards are published together as one version of the entity registry
+(same layout and atomic CURRENT pointer as the main registry). The
+`entities.json` index maps each entity to its model and scaler artifacts.
+The API serves them through an LRU of loaded models.
+"""
+import sys
+import os
+import json
+import time
+import zlib
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
+from src.database.entities import list_entities, load_entity_series
+from src.models import registry
+from src.telemetry.stages import StageTimer
+
+# CONFIG
+ENTITY_SHARDS = int(os.getenv("ENTITY_SHARDS", "8"))
+ENTITY_MODEL_SCOPE = os.getenv("ENTITY_MODEL_SCOPE", "shard")  # "shard" or "entity"
+ENTITY_TRAIN_WORKERS = int(os.getenv("ENTITY_TRAIN_WORKERS", "0"))  # 0 = one per CPU (capped at ENTITY_SHARDS)
+ENTITY_TORCH_THREADS = int(os.getenv("ENTITY_TORCH_THREADS", "1"))  # Per worker; workers already run in parallel
+
+def shard_of(entity_id, shards=ENTITY_SHARDS):
+    """Stable shard for an entity id (the same in every process and run)."""
+    return zlib.crc32(str(entity_id).encode()) % shards
+
+def _make_entity_loaders(segments):
+    """
+    Train/validation loaders over per-entity scaled segments.
+
+    Windows never cross entities. The newest VALIDATION_SPLIT of each
+    entity's windows are held out, so early stopping measures how well
+    the model forecasts every series' most recent data.
+    """
+    from torch.utils.data import ConcatDataset, DataLoader, Subset
+    from src.models.windows import LOOKBACK_WINDOW, WindowDataset
+    from src.training.train import BATCH_SIZE, VALIDATION_SPLIT
+
+    train_parts, val_parts = [], []
+    for segment in segments:
+        ds = WindowDataset(segment, LOOKBACK_WINDOW)
+        n_val = int(len(ds) * VALIDATION_SPLIT)
+        train_parts.append(Subset(ds, range(len(ds) - n_val)))
+        if n_val > 0:
+            val_parts.append(Subset(ds, range(len(ds) - n_val, len(ds))))
+
+    # Workers stay at 0: this already runs inside a pool process
+    train_loader = DataLoader(ConcatDataset(train_parts), batch_size=BATCH_SIZE, shuffle=True)
+    val_loader = None
+    if val_parts:
+        val_loader = DataLoader(ConcatDataset(val_parts), batch_size=max(BATCH_SIZE, 1024), shuffle=False)
+    return train_loader, val_loader
+
+def _train_one(segments, run_id):
+    from src.models.lstm import DemandLSTM
+    from src.models.windows import N_FEATURES
+    from src.training.train import fit
+
+    model = DemandLSTM(input_size=N_FEATURES, hidden_size=50)
+    train_loader, val_loader = _make_entity_loaders(segments)
+    rmse = fit(model, train_loader, val_loader, run_id, checkpoint_path=None)
+    return model, rmse
+
+def train_shard(shard, entity_ids, out_dir, scope=ENTITY_MODEL_SCOPE):
+    """
+    Trains one shard (runs in a pool worker). Writes its artifacts into `out_dir`.
+
+    Returns {"shard", "index": {entity: {"model", "scalers"}}, "rmse": {artifact: rmse},
+    "skipped": [entities with too little history], "seconds"}.
+    """
+    import torch
+    from src.models.scaler import FeatureScaler
+    from src.training.train import MIN_DATA_REQUIRED
+
+    started = time.perf_counter()
+    torch.set_num_threads(ENTITY_TORCH_THREADS)
+    series = load_entity_series(entity_ids)
+
+    scalers, segments, skipped = {}, {}, []
+    for entity in entity_ids:
+        if entity not in series or len(series[entity][1]) < MIN_DATA_REQUIRED:
+            skipped.append(entity)
+            continue
+        values = series[entity][1]
+        scalers[entity] = FeatureScaler().fit(values)
+        segments[entity] = scalers[entity].transform(values).astype(np.float32)
+
+    if scope == "shard":
+        groups = [(f"shard-{shard:04d}", list(segments))] if segments else []
+    elif scope == "entity":
+        groups = [(f"shard-{shard:04d}-{i:05d}", [entity]) for i, entity in enumerate(segments)]
+    else:
+        raise ValueError(f"Unknown ENTITY_MODEL_SCOPE '{scope}' (use 'shard' or 'entity')")
+
+    index, rmse = {}, {}
+    for name, entities in groups:
+        model, rmse[name] = _train_one([segments[e] for e in entities], run_id=f"{name}:{scope}")
+        torch.save(model.state_dict(), os.path.join(out_dir, f"{name}.pt"))
+        with open(os.path.join(out_dir, f"{name}.scalers.json"), 'w') as f:
+            json.dump({e: scalers[e].to_dict() for e in entities}, f)
+        for entity in entities:
+            index[entity] = {"model": f"{name}.pt", "scalers": f"{name}.scalers.json"}
+
+    return {"shard": shard, "index": index, "rmse": rmse, "skipped": skipped,
+            "seconds": time.perf_counter() - started}
+
+def _init_worker():
+    # Quiet per-epoch output from concurrent shards; the parent prints a per-shard summary
+    sys.stdout = open(os.devnull, 'w')
+
+def train_entities(scope=ENTITY_MODEL_SCOPE, shards=ENTITY_SHARDS, workers=ENTITY_TRAIN_WORKERS):
+    """
+    Trains every entity in `entity_features` and publishes the result as one entity-registry version.
+
+    Returns the published version id.
+    """
+    print(f"Starting multi-series training (scope={scope}, shards={shards})...")
+    timer = StageTimer("train_entities", track_totals=True)
+    out_dir = tempfile.mkdtemp(prefix="entity-train-")
+
+    try:
+        # 1. Partition entities into stable shards
+        with timer.stage("list_entities"):
+            by_shard = {}
+            for entity in list_entities():
+                by_shard.setdefault(shard_of(entity, shards), []).append(entity)
+        if not by_shard:
+            raise ValueError("No entities found in entity_features")
+        n_entities = sum(len(ids) for ids in by_shard.values())
+        workers = min(workers or os.cpu_count() or 1, len(by_shard))
+        print(f"Found {n_entities} entities in {len(by_shard)} shards; training with {workers} worker processes")
+
+        # 2. Fan out: one task per shard (spawn: no torch/DB state inherited from this process)
+        index, rmse, skipped = {}, {}, []
+        with timer.stage("train_shards"):
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+                futures = {pool.submit(train_shard, shard, ids, out_dir, scope): shard
+                           for shard, ids in sorted(by_shard.items())}
+                for future in as_completed(futures):
+                    result = future.result()
+                    index.update(result["index"])
+                    rmse.update(result["rmse"])
+                    skipped.extend(result["skipped"])
+                    print(f"  ✓ Shard {result['shard']}: {len(result['index'])} entities, "
+                          f"{len(result['rmse'])} models in {result['seconds']:.1f}s")
+        if skipped:
+            print(f"⚠ Skipped {len(skipped)} entities with too little history")
+        if not index:
+            raise ValueError("No entity had enough history to train")
+
+        # 3. Publish every shard together as one version
+        with timer.stage("publish"):
+            with open(os.path.join(out_dir, registry.ENTITY_INDEX_ARTIFACT), 'w') as f:
+                json.dump(index, f)
+            artifacts = {name: os.path.join(out_dir, name) for name in os.listdir(out_dir)}
+            metadata = {
+                "scope": scope,
+                "shards": shards,
+                "entities": len(index),
+                "models": len(rmse),
+                "skipped": len(skipped),
+                "mean_rmse": float(np.mean(list(rmse.values()))),
+            }
+            version = registry.publish(artifacts, metadata=metadata, registry_dir=registry.ENTITY_REGISTRY_DIR)
+        print(f"✓ Published entity model version {version} ({len(index)} entities, {len(rmse)} models, "
+              f"mean RMSE {metadata['mean_rmse']:.4f}) to {registry.ENTITY_REGISTRY_DIR}")
+        return version
+
+    except Exception as e:
+        print(f"✗ Multi-series training failed: {e}")
+        raise
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        timer.finish()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train per-entity demand models from entity_features.")
+    parser.add_argument("--scope", choices=["shard", "entity"], default=ENTITY_MODEL_SCOPE)
+    parser.add_argument("--shards", type=int, default=ENTITY_SHARDS)
+    parser.add_argument("--workers", type=int, default=ENTITY_TRAIN_WORKERS)
+    args = parser.parse_args()
+    try:
+        train_entities(scope=args.scope, shards=args.shards, workers=args.workers)
+    except Exception as e:
+        print(f"✗ Multi-series training script failed: {e}")
+        sys.exit(1)
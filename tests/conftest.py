@@ -0,0 +1,8 @@
+# tests/conftest.py
+import os
+import sys
+
+# Project root for `src.*`, scripts/ for the benchmark modules whose tolerances the tests share
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
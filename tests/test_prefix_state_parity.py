@@ -0,0 +1,49 @@
+# tests/test_prefix_state_parity.py
+"""Prefix-state inference matches the full-window eager forward within benchmark_prefix_state.py's tolerance."""
+import numpy as np
+import pytest
+
+from src.models.windows import LOOKBACK_WINDOW, N_FEATURES
+from benchmark_prefix_state import DEFAULT_ATOL
+
+@pytest.fixture(scope="module")
+def models():
+    torch = pytest.importorskip("torch")
+    from src.models.lstm import DemandLSTM
+    from src.models.lstm_numpy import NumpyLSTM
+
+    torch.manual_seed(0)
+    eager = DemandLSTM(input_size=N_FEATURES, hidden_size=50).eval()
+    return eager, NumpyLSTM.from_state_dict(eager.state_dict())
+
+@pytest.fixture(scope="module")
+def case(models):
+    from src.serving.inference import forward_batch
+
+    eager, _ = models
+    rng = np.random.default_rng(0)
+    history = rng.random((LOOKBACK_WINDOW - 1, N_FEATURES), dtype=np.float32)
+    inputs = rng.random((256, N_FEATURES), dtype=np.float32)
+    windows = np.empty((len(inputs), LOOKBACK_WINDOW, N_FEATURES), dtype=np.float32)
+    windows[:, :-1], windows[:, -1] = history, inputs
+    return history, inputs, windows, forward_batch(eager, windows)
+
+def test_encode_then_step_matches_full_window(models, case):
+    _, stepper = models
+    history, inputs, _, expected = case
+    outputs = stepper.advance(stepper.encode(history[None]), inputs)
+    assert float(np.max(np.abs(outputs - expected))) <= DEFAULT_ATOL
+
+def test_numpy_full_window_matches_eager(models, case):
+    from src.serving.inference import forward_batch
+
+    _, stepper = models
+    _, _, windows, expected = case
+    assert float(np.max(np.abs(forward_batch(stepper, windows) - expected))) <= DEFAULT_ATOL
+
+def test_rollout_first_step_matches_predict(models, case):
+    _, stepper = models
+    history, inputs, _, expected = case
+    state = stepper.encode(history[None])
+    first_steps = np.array([stepper.rollout(state, inputs[i:i + 1])[0] for i in range(16)])
+    assert float(np.max(np.abs(first_steps - expected[:16]))) <= DEFAULT_ATOL
@@ -0,0 +1,38 @@
+# tests/test_runtime_parity.py
+"""Every exported runtime matches eager PyTorch within the tolerances of benchmark_runtimes.py."""
+import numpy as np
+import pytest
+
+from src.models.windows import LOOKBACK_WINDOW, N_FEATURES
+from benchmark_runtimes import DEFAULT_FP32_ATOL, DEFAULT_INT8_ATOL
+
+EXPORTED_RUNTIMES = ["torchscript", "torchscript_int8", "onnx", "numpy"]
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    torch = pytest.importorskip("torch")
+    from src.models.export import export_model
+    from src.models.lstm import DemandLSTM
+
+    torch.manual_seed(0)
+    model = DemandLSTM(input_size=N_FEATURES, hidden_size=50)
+    model_path = str(tmp_path_factory.mktemp("runtimes") / "model.pt")
+    torch.save(model.state_dict(), model_path)
+    return model_path, export_model(model, model_path, runtimes=EXPORTED_RUNTIMES)
+
+@pytest.mark.parametrize("runtime", EXPORTED_RUNTIMES)
+def test_runtime_matches_eager(exported, runtime):
+    from src.models.export import load_runtime_model
+    from src.serving.inference import forward_batch
+
+    model_path, written = exported
+    if runtime not in written:
+        pytest.skip(f"{runtime} export unavailable here")
+
+    windows = np.random.default_rng(0).random((256, LOOKBACK_WINDOW, N_FEATURES), dtype=np.float32)
+    expected = forward_batch(load_runtime_model(model_path, "eager"), windows)
+    outputs = forward_batch(load_runtime_model(model_path, runtime), windows)
+
+    atol = DEFAULT_INT8_ATOL if runtime.endswith("int8") else DEFAULT_FP32_ATOL
+    assert outputs.shape == expected.shape
+    assert float(np.max(np.abs(outputs - expected))) <= atol